@@ -1,7 +1,17 @@
-from flask import Blueprint, render_template, request, redirect, session
+from flask import Blueprint, render_template, request, redirect, session, jsonify, Response, stream_with_context
 from datetime import datetime, date, timedelta
 import traceback
-from urllib.parse import quote_plus, quote
+from urllib.parse import quote_plus, quote, urlencode
+
+import availability
+import flight_cancellation
+import orders
+import report_rollups
+import reports
+import scheduling
+import seatmap
+from flights import invalidate_route_search
+from airways import airway_index, is_long_duration, LONG_FLIGHT_MIN
 
 admin_bp = Blueprint("admin", __name__)  
 
@@ -10,7 +20,6 @@ admin_bp = Blueprint("admin", __name__)
 # =========================
 PLANE_BUFFER_MIN = 0
 CREW_BUFFER_MIN = 0
-DEFAULT_BASE = "TLV"
 
 
 def _require_admin():
@@ -116,186 +125,220 @@ def admin_logout():
     return redirect("/")
 
 
-@admin_bp.route("/flights")
-def admin_flights():
+# גודל עמוד בלוח הטיסות (HTML ו-JSON)
+FLIGHT_BOARD_PAGE_SIZE = 50
+FLIGHT_BOARD_MAX_PAGE_SIZE = 200
+
+# סינון לפי סטטוס מנהל על שורות Flight עצמן, לפני החיבור למוני המושבים
+_BOARD_STATUS_FILTERS = {
+    "cancelled": "f.status = 'cancelled'",
+    "completed": "f.status <> 'cancelled' AND f.departure_dt <= NOW()",
+    "full": (
+        "f.status <> 'cancelled' AND f.departure_dt > NOW() AND NOT EXISTS ("
+        "SELECT 1 FROM FlightClassAvailability x WHERE x.flight_id = f.flight_id AND x.available_seats > 0)"
+    ),
+    "active": (
+        "f.status <> 'cancelled' AND f.departure_dt > NOW() AND EXISTS ("
+        "SELECT 1 FROM FlightClassAvailability x WHERE x.flight_id = f.flight_id AND x.available_seats > 0)"
+    ),
+}
+
+
+def _board_filters():
+    return {
+        "origin": request.args.get("origin", "").strip(),
+        "destination": request.args.get("destination", "").strip(),
+        "departure_date": request.args.get("departure_date", "").strip(),
+        "status": request.args.get("status", "").strip().lower(),
+    }
+
+
+def _parse_board_cursor(value):
     '''
-    מציגה למנהל לוח טיסות, עם סטטוס (התקיימה, פעילה, בוטלה, מלאה) ועם נתונים כמו שדות מקור ויעד
+    "<departure_dt ISO>_<flight_id>" -> (datetime, flight_id); None אם ריק או לא תקין
     '''
-    guard = _require_admin()
-    if guard:
-        return guard
+    try:
+        dt, flight_id = value.rsplit("_", 1)
+        return datetime.fromisoformat(dt), int(flight_id)
+    except (AttributeError, ValueError):
+        return None
 
-    origin = request.args.get("origin", "").strip()
-    destination = request.args.get("destination", "").strip()
-    dep_date = request.args.get("departure_date", "").strip()
-    status = request.args.get("status", "").strip().lower()
-    created = request.args.get("created", "").strip()
 
-    from main import db_cur
+def _flight_board_page(cursor, filters, after, limit):
+    '''
+    עמוד אחד של לוח הטיסות, ממוין לפי (departure_dt, flight_id), שמתחיל אחרי after
+    הסינון (כולל סטטוס) והדפדוף נעשים על Flight, ורק הטיסות של העמוד מצורפות למוני המושבים
+    מחזירה (flights, next_cursor) - next_cursor הוא None בעמוד האחרון
+    '''
+    where = ["1=1"]
+    params = []
+
+    if filters["origin"]:
+        where.append("f.origin_airport=%s")
+        params.append(filters["origin"])
 
-    query = """
+    if filters["destination"]:
+        where.append("f.destination_airport=%s")
+        params.append(filters["destination"])
+
+    if filters["departure_date"]:
+        where.append("f.departure_date=%s")
+        params.append(filters["departure_date"])
+
+    if filters["status"] in _BOARD_STATUS_FILTERS:
+        where.append(_BOARD_STATUS_FILTERS[filters["status"]])
+
+    if after:
+        where.append("(f.departure_dt > %s OR (f.departure_dt = %s AND f.flight_id > %s))")
+        params += [after[0], after[0], after[1]]
+
+    query = f"""
         SELECT
             f.flight_id,
             f.origin_airport,
             f.destination_airport,
             f.departure_date,
             f.departure_time,
+            f.departure_dt,
             f.status AS db_status,
 
-            -- seats info
-            SUM(CASE WHEN LOWER(fs.status) = 'available' THEN 1 ELSE 0 END) AS available_seats,
-            COUNT(fs.flight_seat_id) AS total_seats,
+            -- seats info (maintained counters, at most one row per class)
+            COALESCE(SUM(ca.available_seats), 0) AS available_seats,
+            COALESCE(SUM(ca.available_seats + ca.booked_seats), 0) AS total_seats,
 
             -- computed status for manager UI
             CASE
-              WHEN LOWER(f.status) = 'cancelled' THEN 'cancelled'
-              WHEN TIMESTAMP(f.departure_date, f.departure_time) <= NOW() THEN 'completed'
-              WHEN SUM(CASE WHEN LOWER(fs.status) = 'available' THEN 1 ELSE 0 END) = 0 THEN 'full'
+              WHEN f.status = 'cancelled' THEN 'cancelled'
+              WHEN f.departure_dt <= NOW() THEN 'completed'
+              WHEN COALESCE(SUM(ca.available_seats), 0) = 0 THEN 'full'
               ELSE 'active'
             END AS manager_status
 
-        FROM Flight f
-        LEFT JOIN FlightSeat fs
-          ON fs.flight_id = f.flight_id
-
-        WHERE 1=1
-    """
-    params = []
-
-    if origin:
-        query += " AND f.origin_airport=%s"
-        params.append(origin)
-
-    if destination:
-        query += " AND f.destination_airport=%s"
-        params.append(destination)
-
-    if dep_date:
-        query += " AND f.departure_date=%s"
-        params.append(dep_date)
+        FROM (
+            SELECT f.flight_id, f.origin_airport, f.destination_airport,
+                   f.departure_date, f.departure_time, f.departure_dt, f.status
+            FROM Flight f
+            WHERE {" AND ".join(where)}
+            ORDER BY f.departure_dt, f.flight_id
+            LIMIT %s
+        ) f
+        LEFT JOIN FlightClassAvailability ca
+          ON ca.flight_id = f.flight_id
 
-    query += """
         GROUP BY
             f.flight_id,
             f.origin_airport,
             f.destination_airport,
             f.departure_date,
             f.departure_time,
+            f.departure_dt,
             f.status
+        ORDER BY f.departure_dt, f.flight_id
     """
-    if status in ("active", "full", "completed", "cancelled"):
-        if status == "cancelled":
-            query += " HAVING manager_status = 'cancelled'"
-        elif status == "completed":
-            query += " HAVING manager_status = 'completed'"
-        elif status == "full":
-            query += " HAVING manager_status = 'full'"
-        elif status == "active":
-            query += " HAVING manager_status = 'active'"
-
-    query += " ORDER BY f.departure_date, f.departure_time"
+    # שורה אחת יותר מהעמוד - כדי לדעת אם יש עמוד הבא
+    cursor.execute(query, tuple(params) + (limit + 1,))
+    flights = cursor.fetchall()
+
+    next_cursor = None
+    if len(flights) > limit:
+        flights = flights[:limit]
+        last = flights[-1]
+        next_cursor = f"{last['departure_dt'].isoformat()}_{last['flight_id']}"
+    return flights, next_cursor
+
+
+@admin_bp.route("/flights")
+def admin_flights():
+    '''
+    מציגה למנהל לוח טיסות, עם סטטוס (התקיימה, פעילה, בוטלה, מלאה) ועם נתונים כמו שדות מקור ויעד
+    הלוח מחולק לעמודים של FLIGHT_BOARD_PAGE_SIZE טיסות (after = הסמן של סוף העמוד הקודם)
+    '''
+    guard = _require_admin()
+    if guard:
+        return guard
+
+    filters = _board_filters()
+    after = _parse_board_cursor(request.args.get("after", ""))
+    created = request.args.get("created", "").strip()
+
+    from main import db_cur
 
     with db_cur() as cursor:
-        cursor.execute(query, tuple(params))
-        flights = cursor.fetchall()
+        flights, next_cursor = _flight_board_page(cursor, filters, after, FLIGHT_BOARD_PAGE_SIZE)
+
+    active_filters = {k: v for k, v in filters.items() if v}
+    next_url = None
+    if next_cursor:
+        next_url = "/admin/flights?" + urlencode({**active_filters, "after": next_cursor})
 
     return render_template(
         "admin_flights.html",
         flights=flights,
         created=created,
-        filters={
-            "origin": origin,
-            "destination": destination,
-            "departure_date": dep_date,
-            "status": status,
-        },
+        filters=filters,
+        next_url=next_url,
+        first_url=("/admin/flights?" + urlencode(active_filters)) if after else None,
     )
 
-def _normalize_time(t):
-    '''
-    מנרמלת נתוני זמן מכמה פורמטים, כך שיהיה אפשר לבצע השוואות בין זמנים
-    '''
-    if isinstance(t, timedelta):
-        return (datetime.min + t).time()
-    return t
-
 
-def _flight_end_expr():
+@admin_bp.route("/flights/page")
+def admin_flights_page():
     '''
-    יוצרת ביטוי לחישוב זמן הנתחיתה של טיסה
+    עמוד של לוח הטיסות כ-JSON (לגלילה אינסופית): אותם פילטרים כמו /admin/flights, after ו-limit
     '''
-    return "DATE_ADD(TIMESTAMP(f.departure_date, f.departure_time), INTERVAL a.duration MINUTE)"
+    guard = _require_admin()
+    if guard:
+        return guard
 
+    filters = _board_filters()
+    raw_after = request.args.get("after", "").strip()
+    after = _parse_board_cursor(raw_after)
+    errors = []
+    if raw_after and after is None:
+        errors.append("Invalid cursor")
+    try:
+        limit = int(request.args.get("limit", FLIGHT_BOARD_PAGE_SIZE))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= FLIGHT_BOARD_MAX_PAGE_SIZE:
+        errors.append(f"limit must be between 1 and {FLIGHT_BOARD_MAX_PAGE_SIZE}")
+    if filters["status"] and filters["status"] not in _BOARD_STATUS_FILTERS:
+        errors.append("Invalid status")
+
+    if errors:
+        return jsonify({"errors": errors}), 400
 
-def _overlap_exists_no_buffer(cursor, start_dt: datetime, end_dt: datetime, where_sql: str, params: tuple):
-    '''
-    בודקת חפיפה בין מטוסים/אנשי צוות ללא התחשבות במרווח ביטחון
-    '''
-    cursor.execute(
-        f"""
-        SELECT 1
-        FROM Flight f
-        JOIN Airway a
-          ON a.origin_airport = f.origin_airport
-         AND a.destination_airport = f.destination_airport
-        WHERE LOWER(f.status) <> 'cancelled'
-          AND ({where_sql})
-          AND (
-            TIMESTAMP(f.departure_date, f.departure_time) < %s
-            AND {_flight_end_expr()} > %s
-          )
-        LIMIT 1
-        """,
-        params + (end_dt, start_dt),
-    )
-    return cursor.fetchone() is not None
-
+    from main import db_cur
 
-def _last_location_plane(cursor, plane_id: int, new_start_dt: datetime):
-    '''
-    מחזירה את מקום הנחיתה האחרון של מטוס, כדי לוודא זמינות לטיסה הבאה
-    '''
-    cursor.execute(
-        """
-        SELECT f3.destination_airport AS last_dest
-        FROM Flight f3
-        JOIN Airway a3
-          ON a3.origin_airport = f3.origin_airport
-         AND a3.destination_airport = f3.destination_airport
-        WHERE f3.plane_id = %s
-          AND LOWER(f3.status) <> 'cancelled'
-          AND DATE_ADD(TIMESTAMP(f3.departure_date, f3.departure_time), INTERVAL a3.duration MINUTE) <= %s
-        ORDER BY DATE_ADD(TIMESTAMP(f3.departure_date, f3.departure_time), INTERVAL a3.duration MINUTE) DESC
-        LIMIT 1
-        """,
-        (plane_id, new_start_dt),
-    )
-    row = cursor.fetchone()
-    return row["last_dest"] if row else None
+    with db_cur() as cursor:
+        flights, next_cursor = _flight_board_page(cursor, filters, after, limit)
+
+    return jsonify({
+        "flights": [
+            {
+                "flight_id": f["flight_id"],
+                "origin_airport": f["origin_airport"],
+                "destination_airport": f["destination_airport"],
+                "departure_date": f["departure_date"].isoformat(),
+                "departure_time": _normalize_time(f["departure_time"]).strftime("%H:%M"),
+                "status": f["manager_status"],
+                "db_status": f["db_status"],
+                "available_seats": int(f["available_seats"]),
+                "total_seats": int(f["total_seats"]),
+            }
+            for f in flights
+        ],
+        "next": next_cursor,
+    })
 
 
-def _last_location_worker(cursor, worker_id: int, new_start_dt: datetime):
+def _normalize_time(t):
     '''
-    מאתרת את שדה התעופה האחרון בו עובד נמצא, כדי לוודא זמינות לטיסה הבאה
+    מנרמלת נתוני זמן מכמה פורמטים, כך שיהיה אפשר לבצע השוואות בין זמנים
     '''
-    cursor.execute(
-        """
-        SELECT f3.destination_airport AS last_dest
-        FROM FlightCrewPlacement fcp3
-        JOIN Flight f3 ON f3.flight_id = fcp3.flight_id
-        JOIN Airway a3
-          ON a3.origin_airport = f3.origin_airport
-         AND a3.destination_airport = f3.destination_airport
-        WHERE fcp3.id = %s
-          AND LOWER(f3.status) <> 'cancelled'
-          AND DATE_ADD(TIMESTAMP(f3.departure_date, f3.departure_time), INTERVAL a3.duration MINUTE) <= %s
-        ORDER BY DATE_ADD(TIMESTAMP(f3.departure_date, f3.departure_time), INTERVAL a3.duration MINUTE) DESC
-        LIMIT 1
-        """,
-        (worker_id, new_start_dt),
-    )
-    row = cursor.fetchone()
-    return row["last_dest"] if row else None
+    if isinstance(t, timedelta):
+        return (datetime.min + t).time()
+    return t
 
 
 def _plane_is_big(cursor, plane_id: int) -> bool:
@@ -310,7 +353,7 @@ def _crew_needed_for_plane(is_big_plane: bool):
     '''
     מחזירה את מס' הטייסים והדיילים הדרושים, לפי גודל המטוס
     '''
-    return (3, 6) if is_big_plane else (2, 3)
+    return scheduling.crew_needed(is_big_plane)
 
 
 def _fetch_step2_lists(cursor, is_long: bool, new_start_dt: datetime, new_end_dt: datetime, origin: str):
@@ -324,197 +367,11 @@ def _fetch_step2_lists(cursor, is_long: bool, new_start_dt: datetime, new_end_dt
         * else                 -> last_loc must equal origin
     - long flights: pilots/attendants require AirCrew.long_flight_training = 1
     - long flights: only Big planes are shown
-    """
-
-    # =========================
-    # Planes
-    # =========================
-    cursor.execute(
-        """
-        SELECT
-          p.plane_id,
-          p.manufacturer,
-          p.purchase_date,
-          CASE WHEN bp.plane_id IS NOT NULL THEN 1 ELSE 0 END AS is_big,
-
-          (
-            SELECT f3.destination_airport
-            FROM Flight f3
-            JOIN Airway a3
-              ON a3.origin_airport = f3.origin_airport
-             AND a3.destination_airport = f3.destination_airport
-            WHERE f3.plane_id = p.plane_id
-              AND LOWER(f3.status) <> 'cancelled'
-              AND DATE_ADD(TIMESTAMP(f3.departure_date, f3.departure_time), INTERVAL a3.duration MINUTE) <= %s
-            ORDER BY DATE_ADD(TIMESTAMP(f3.departure_date, f3.departure_time), INTERVAL a3.duration MINUTE) DESC
-            LIMIT 1
-          ) AS last_loc
-
-        FROM Plane p
-        LEFT JOIN BigPlane bp ON bp.plane_id = p.plane_id
-        WHERE
-          -- If long flight: show only Big planes
-          (%s = 0 OR bp.plane_id IS NOT NULL)
-
-          -- (A) time availability (NO buffer, ignore cancelled)
-          AND NOT EXISTS (
-            SELECT 1
-            FROM Flight f
-            JOIN Airway a
-              ON a.origin_airport = f.origin_airport
-             AND a.destination_airport = f.destination_airport
-            WHERE f.plane_id = p.plane_id
-              AND LOWER(f.status) <> 'cancelled'
-              AND TIMESTAMP(f.departure_date, f.departure_time) < %s
-              AND DATE_ADD(TIMESTAMP(f.departure_date, f.departure_time), INTERVAL a.duration MINUTE) > %s
-          )
-
-        HAVING
-          (
-            last_loc = %s
-            OR (last_loc IS NULL AND %s = %s)
-          )
-        ORDER BY p.plane_id
-        """,
-        (
-            new_start_dt,
-            1 if is_long else 0,
-            new_end_dt,
-            new_start_dt,
-            origin,
-            origin,
-            DEFAULT_BASE,
-        ),
-    )
-    planes = cursor.fetchall()
-
-    # ---- Crew filters ----
-    long_clause = "AND ac.long_flight_training = 1" if is_long else ""
-
-    # =========================
-    # Pilots
-    # =========================
-    cursor.execute(
-        f"""
-        SELECT
-          w.id, w.first_name, w.last_name,
-
-          (
-            SELECT f3.destination_airport
-            FROM FlightCrewPlacement fcp3
-            JOIN Flight f3 ON f3.flight_id = fcp3.flight_id
-            JOIN Airway a3
-              ON a3.origin_airport = f3.origin_airport
-             AND a3.destination_airport = f3.destination_airport
-            WHERE fcp3.id = w.id
-              AND LOWER(f3.status) <> 'cancelled'
-              AND DATE_ADD(TIMESTAMP(f3.departure_date, f3.departure_time), INTERVAL a3.duration MINUTE) <= %s
-            ORDER BY DATE_ADD(TIMESTAMP(f3.departure_date, f3.departure_time), INTERVAL a3.duration MINUTE) DESC
-            LIMIT 1
-          ) AS last_loc
-
-        FROM Worker w
-        JOIN Pilot p2   ON p2.id = w.id
-        JOIN AirCrew ac ON ac.id = w.id
-        WHERE
-          NOT EXISTS (SELECT 1 FROM Manager m WHERE m.id = w.id)
-          {long_clause}
-
-          -- (A) time availability (ignore cancelled)
-          AND NOT EXISTS (
-            SELECT 1
-            FROM Flight f
-            JOIN Airway a
-              ON a.origin_airport = f.origin_airport
-             AND a.destination_airport = f.destination_airport
-            JOIN FlightCrewPlacement fcp ON fcp.flight_id = f.flight_id
-            WHERE fcp.id = w.id
-              AND LOWER(f.status) <> 'cancelled'
-              AND TIMESTAMP(f.departure_date, f.departure_time) < %s
-              AND DATE_ADD(TIMESTAMP(f.departure_date, f.departure_time), INTERVAL a.duration MINUTE) > %s
-          )
-
-        HAVING
-          (
-            last_loc = %s
-            OR (last_loc IS NULL AND %s = %s)
-          )
-        ORDER BY w.last_name, w.first_name
-        """,
-        (
-            new_start_dt,
-            new_end_dt,
-            new_start_dt,
-            origin,
-            origin,
-            DEFAULT_BASE,
-        ),
-    )
-    pilots = cursor.fetchall()
-
-    # =========================
-    # Flight Attendants
-    # =========================
-    cursor.execute(
-        f"""
-        SELECT
-          w.id, w.first_name, w.last_name,
-
-          (
-            SELECT f3.destination_airport
-            FROM FlightCrewPlacement fcp3
-            JOIN Flight f3 ON f3.flight_id = fcp3.flight_id
-            JOIN Airway a3
-              ON a3.origin_airport = f3.origin_airport
-             AND a3.destination_airport = f3.destination_airport
-            WHERE fcp3.id = w.id
-              AND LOWER(f3.status) <> 'cancelled'
-              AND DATE_ADD(TIMESTAMP(f3.departure_date, f3.departure_time), INTERVAL a3.duration MINUTE) <= %s
-            ORDER BY DATE_ADD(TIMESTAMP(f3.departure_date, f3.departure_time), INTERVAL a3.duration MINUTE) DESC
-            LIMIT 1
-          ) AS last_loc
-
-        FROM Worker w
-        JOIN FlightAttendant fa ON fa.id = w.id
-        JOIN AirCrew ac         ON ac.id = w.id
-        WHERE
-          NOT EXISTS (SELECT 1 FROM Manager m WHERE m.id = w.id)
-          {long_clause}
-
-          -- (A) time availability (ignore cancelled)
-          AND NOT EXISTS (
-            SELECT 1
-            FROM Flight f
-            JOIN Airway a
-              ON a.origin_airport = f.origin_airport
-             AND a.destination_airport = f.destination_airport
-            JOIN FlightCrewPlacement fcp ON fcp.flight_id = f.flight_id
-            WHERE fcp.id = w.id
-              AND LOWER(f.status) <> 'cancelled'
-              AND TIMESTAMP(f.departure_date, f.departure_time) < %s
-              AND DATE_ADD(TIMESTAMP(f.departure_date, f.departure_time), INTERVAL a.duration MINUTE) > %s
-          )
-
-        HAVING
-          (
-            last_loc = %s
-            OR (last_loc IS NULL AND %s = %s)
-          )
-        ORDER BY w.last_name, w.first_name
-        """,
-        (
-            new_start_dt,
-            new_end_dt,
-            new_start_dt,
-            origin,
-            origin,
-            DEFAULT_BASE,
-        ),
-    )
-    attendants = cursor.fetchall()
-
-    return planes, pilots, attendants
 
+    Busy intervals and last locations of all resources are computed in one pass
+    over the schedule (availability.resource_state), not per candidate.
+    """
+    return availability.available_resources(cursor, is_long, new_start_dt, new_end_dt, origin)
 
 
 @admin_bp.route("/flights/new", methods=["GET", "POST"])
@@ -547,22 +404,11 @@ def admin_add_flight():
         if not origin or not destination or not dep_date or not dep_time:
             return render_template("admin_add_flight.html", step=1, error="All fields are required.", data=None)
 
-        with db_cur() as cursor:
-            cursor.execute(
-                """
-                SELECT duration
-                FROM Airway
-                WHERE origin_airport=%s AND destination_airport=%s
-                """,
-                (origin, destination),
-            )
-            airway = cursor.fetchone()
-
-        if not airway:
+        duration_min = airway_index.duration(origin, destination)
+        if duration_min is None:
             return render_template("admin_add_flight.html", step=1, error="No airway exists for this route.", data=None)
 
-        duration_min = int(airway["duration"])
-        is_long = duration_min > 360
+        is_long = is_long_duration(duration_min)
 
         pilots_needed = None
         fa_needed = None
@@ -627,18 +473,8 @@ def admin_add_flight():
         # -------------------------
         # 1) Fetch route duration
         # -------------------------
-        with db_cur() as cursor:
-            cursor.execute(
-                """
-                SELECT duration
-                FROM Airway
-                WHERE origin_airport=%s AND destination_airport=%s
-                """,
-                (origin, destination),
-            )
-            airway = cursor.fetchone()
-
-        if not airway:
+        duration_min = airway_index.duration(origin, destination)
+        if duration_min is None:
             return render_template(
                 "admin_add_flight.html",
                 step=1,
@@ -646,8 +482,7 @@ def admin_add_flight():
                 data=None,
             )
 
-        duration_min = int(airway["duration"])
-        is_long = duration_min > 360
+        is_long = is_long_duration(duration_min)
 
         # -------------------------
         # 2) Validate time window
@@ -714,6 +549,28 @@ def admin_add_flight():
             "is_big_selected": is_big_plane,
         }
 
+        # -------------------------
+        # Auto-assign: planner picks a feasible plane + crew with the fewest accumulated flight minutes
+        # -------------------------
+        if request.form.get("auto_assign"):
+            try:
+                with db_cur() as cursor:
+                    plane_id, is_big_plane, auto_pilots, auto_fas = scheduling.auto_assign(
+                        cursor, origin, new_start_dt, new_end_dt, is_long, big=None if is_long else is_big_plane
+                    )
+            except scheduling.NoResources as e:
+                return render_template("admin_add_flight.html", step=2, error=str(e), data=data)
+
+            data["pilots_needed"], data["fa_needed"] = _crew_needed_for_plane(is_big_plane)
+            data.update({
+                "selected_plane_id": plane_id,
+                "selected_pilot_ids": set(str(x) for x in auto_pilots),
+                "selected_fa_ids": set(str(x) for x in auto_fas),
+                "is_big_selected": is_big_plane,
+                "auto_assigned": True,
+            })
+            return render_template("admin_add_flight.html", step=2, error=None, data=data)
+
         # =========================
         # Validations & enforcement
         # =========================
@@ -734,7 +591,7 @@ def admin_add_flight():
             return render_template(
                 "admin_add_flight.html",
                 step=2,
-                error="Long flights (> 360 minutes) must use a Big plane.",
+                error=f"Long flights (> {LONG_FLIGHT_MIN} minutes) must use a Big plane.",
                 data=data,
             )
 
@@ -777,200 +634,36 @@ def admin_add_flight():
             data["business_price"] = None
 
         # -------------------------
-        # Validate crew roles + long training
-        # -------------------------
-        with db_cur() as cursor:
-            for pid in pilot_ids:
-                cursor.execute("SELECT 1 FROM Pilot WHERE id=%s", (pid,))
-                if not cursor.fetchone():
-                    return render_template("admin_add_flight.html", step=2, error=f"Worker {pid} is not a Pilot.",
-                                           data=data)
-
-                cursor.execute("SELECT 1 FROM Manager WHERE id=%s", (pid,))
-                if cursor.fetchone():
-                    return render_template("admin_add_flight.html", step=2,
-                                           error=f"Worker {pid} is a Manager and cannot be assigned as Pilot.",
-                                           data=data)
-
-                if is_long:
-                    cursor.execute("SELECT long_flight_training FROM AirCrew WHERE id=%s", (pid,))
-                    row = cursor.fetchone()
-                    if not row or int(row["long_flight_training"]) != 1:
-                        return render_template("admin_add_flight.html", step=2,
-                                               error=f"Pilot {pid} is not trained for long flights.", data=data)
-
-            for fid in fa_ids:
-                cursor.execute("SELECT 1 FROM FlightAttendant WHERE id=%s", (fid,))
-                if not cursor.fetchone():
-                    return render_template("admin_add_flight.html", step=2,
-                                           error=f"Worker {fid} is not a Flight Attendant.", data=data)
-
-                cursor.execute("SELECT 1 FROM Manager WHERE id=%s", (fid,))
-                if cursor.fetchone():
-                    return render_template("admin_add_flight.html", step=2,
-                                           error=f"Worker {fid} is a Manager and cannot be assigned as Attendant.",
-                                           data=data)
-
-                if is_long:
-                    cursor.execute("SELECT long_flight_training FROM AirCrew WHERE id=%s", (fid,))
-                    row = cursor.fetchone()
-                    if not row or int(row["long_flight_training"]) != 1:
-                        return render_template("admin_add_flight.html", step=2,
-                                               error=f"Flight attendant {fid} is not trained for long flights.",
-                                               data=data)
-
-        # -------------------------
-        # Overlap checks (NO buffer)
+        # Validate plane + crew: roles, long training, overlap, location (batched, all violations at once)
         # -------------------------
         with db_cur() as cursor:
-            if _overlap_exists_no_buffer(
-                    cursor,
-                    start_dt=new_start_dt,
-                    end_dt=new_end_dt,
-                    where_sql="f.plane_id = %s",
-                    params=(plane_id,),
-            ):
-                return render_template("admin_add_flight.html", step=2,
-                                       error="Selected plane is not available at this time (overlap).", data=data)
-
-            for pid in pilot_ids:
-                if _overlap_exists_no_buffer(
-                        cursor,
-                        start_dt=new_start_dt,
-                        end_dt=new_end_dt,
-                        where_sql="""
-                        EXISTS (
-                            SELECT 1
-                            FROM FlightCrewPlacement fcp
-                            WHERE fcp.flight_id = f.flight_id
-                              AND fcp.id = %s
-                        )
-                    """,
-                        params=(pid,),
-                ):
-                    return render_template("admin_add_flight.html", step=2,
-                                           error=f"Pilot {pid} is not available at this time (overlap).", data=data)
-
-            for fid in fa_ids:
-                if _overlap_exists_no_buffer(
-                        cursor,
-                        start_dt=new_start_dt,
-                        end_dt=new_end_dt,
-                        where_sql="""
-                        EXISTS (
-                            SELECT 1
-                            FROM FlightCrewPlacement fcp
-                            WHERE fcp.flight_id = f.flight_id
-                              AND fcp.id = %s
-                        )
-                    """,
-                        params=(fid,),
-                ):
-                    return render_template("admin_add_flight.html", step=2,
-                                           error=f"Flight attendant {fid} is not available at this time (overlap).",
-                                           data=data)
-
-        # -------------------------
-        # Location checks
-        # -------------------------
-        with db_cur() as cursor:
-            plane_loc = _last_location_plane(cursor, plane_id, new_start_dt)
-            if not ((plane_loc == origin) or (plane_loc is None and origin == DEFAULT_BASE)):
-                return render_template(
-                    "admin_add_flight.html",
-                    step=2,
-                    error=f"Selected plane is not at {origin} at departure time (last known location: {plane_loc}).",
-                    data=data,
-                )
-
-            for pid in pilot_ids:
-                loc = _last_location_worker(cursor, int(pid), new_start_dt)
-                if not ((loc == origin) or (loc is None and origin == DEFAULT_BASE)):
-                    return render_template(
-                        "admin_add_flight.html",
-                        step=2,
-                        error=f"Pilot {pid} is not at {origin} at departure time (last known location: {loc}).",
-                        data=data,
-                    )
-
-            for fid in fa_ids:
-                loc = _last_location_worker(cursor, int(fid), new_start_dt)
-                if not ((loc == origin) or (loc is None and origin == DEFAULT_BASE)):
-                    return render_template(
-                        "admin_add_flight.html",
-                        step=2,
-                        error=f"Flight attendant {fid} is not at {origin} at departure time (last known location: {loc}).",
-                        data=data,
-                    )
-
-        # -------------------------
-        # Seats exist
-        # -------------------------
-        with db_cur() as cursor:
-            cursor.execute("SELECT seat_id FROM Seat WHERE plane_id=%s", (plane_id,))
-            seat_ids = [r["seat_id"] for r in cursor.fetchall()]
+            crew_errors = availability.validate_crew(
+                cursor, plane_id, pilot_ids, fa_ids, is_long, new_start_dt, new_end_dt, origin
+            )
+        if crew_errors:
+            return render_template("admin_add_flight.html", step=2, error=None, errors=crew_errors, data=data)
 
-        if not seat_ids:
+        # =========================
+        # Create - one transaction; plane + crew rows are locked and re-checked inside it
+        # =========================
+        try:
+            scheduling.create_flight(
+                plane_id, origin, destination, dep_date, dep_time,
+                {"Regular": regular_price, "Business": business_price if has_business else None},
+                [int(x) for x in pilot_ids + fa_ids],
+                new_start_dt, new_end_dt,
+            )
+        except scheduling.ResourceConflict as e:
+            return render_template("admin_add_flight.html", step=2, error=None, errors=e.errors, data=data)
+        except scheduling.PlaneHasNoSeats:
             return render_template(
                 "admin_add_flight.html",
                 step=2,
                 error="Selected plane has no seats in Seat table. Create seats for this plane first.",
                 data=data,
             )
-
-        # =========================
-        # Create
-        # =========================
-        try:
-            with db_cur() as cursor:
-                cursor.execute(
-                    """
-                    INSERT INTO Flight
-                      (plane_id, origin_airport, destination_airport, departure_date, departure_time, status)
-                    VALUES
-                      (%s, %s, %s, %s, %s, 'open')
-                    """,
-                    (plane_id, origin, destination, dep_date, dep_time),
-                )
-                cursor.execute("SELECT LAST_INSERT_ID() AS flight_id")
-                flight_id = cursor.fetchone()["flight_id"]
-
-            with db_cur() as cursor:
-                cursor.execute(
-                    "INSERT INTO FlightPricing (flight_id, class_type, price) VALUES (%s, 'Regular', %s)",
-                    (flight_id, regular_price),
-                )
-                if has_business:
-                    cursor.execute(
-                        "INSERT INTO FlightPricing (flight_id, class_type, price) VALUES (%s, 'Business', %s)",
-                        (flight_id, business_price),
-                    )
-
-            crew_ids = [int(x) for x in pilot_ids] + [int(x) for x in fa_ids]
-            with db_cur() as cursor:
-                cursor.executemany(
-                    "INSERT INTO FlightCrewPlacement (flight_id, id) VALUES (%s, %s)",
-                    [(flight_id, cid) for cid in crew_ids],
-                )
-
-            with db_cur() as cursor:
-                cursor.executemany(
-                    "INSERT INTO FlightSeat (flight_id, seat_id, status) VALUES (%s, %s, 'available')",
-                    [(flight_id, sid) for sid in seat_ids],
-                )
-
         except Exception as e:
             traceback.print_exc()
-            try:
-                if "flight_id" in locals() and flight_id:
-                    with db_cur() as cursor:
-                        cursor.execute("DELETE FROM FlightSeat WHERE flight_id=%s", (flight_id,))
-                        cursor.execute("DELETE FROM FlightCrewPlacement WHERE flight_id=%s", (flight_id,))
-                        cursor.execute("DELETE FROM FlightPricing WHERE flight_id=%s", (flight_id,))
-                        cursor.execute("DELETE FROM Flight WHERE flight_id=%s", (flight_id,))
-            except Exception:
-                traceback.print_exc()
-
             return render_template(
                 "admin_add_flight.html",
                 step=2,
@@ -981,6 +674,41 @@ def admin_add_flight():
         return redirect("/admin/flights?created=1")
 
 
+@admin_bp.route("/flights/import", methods=["GET", "POST"])
+def import_schedule():
+    '''
+    ייבוא לוח טיסות חוזרות מקובץ CSV / JSON - עם אפשרות להרצת ניסיון (dry run) שמציגה רק את הקונפליקטים
+    '''
+    guard = _require_admin()
+    if guard:
+        return guard
+
+    if request.method == "GET":
+        return render_template("admin_import_schedule.html", report=None, errors=None)
+
+    import schedule_import
+
+    upload = request.files.get("schedule_file")
+    if not upload or not upload.filename:
+        return render_template("admin_import_schedule.html", report=None, errors=["Please choose a CSV or JSON file."])
+    fmt = "json" if upload.filename.lower().endswith(".json") else "csv"
+    dry_run = bool(request.form.get("dry_run"))
+
+    try:
+        text = upload.read().decode("utf-8-sig")
+        patterns = schedule_import.parse_patterns(text, fmt)
+        report = schedule_import.run_import(patterns, dry_run=dry_run)
+    except UnicodeDecodeError:
+        return render_template("admin_import_schedule.html", report=None, errors=["File must be UTF-8 encoded."])
+    except schedule_import.ScheduleImportError as e:
+        return render_template("admin_import_schedule.html", report=None, errors=e.errors)
+    except Exception as e:
+        traceback.print_exc()
+        return render_template("admin_import_schedule.html", report=None, errors=[_db_error_message(e)])
+
+    return render_template("admin_import_schedule.html", report=report, dry_run=dry_run, errors=None)
+
+
 # מימוש של ביטול טיסה על ידי מנהל,
 # בתנאי שנותרו לפחות 72 שעות עד מועד הטיסה
 @admin_bp.route("/flights/cancel/<int:flight_id>", methods=["GET", "POST"])
@@ -994,7 +722,7 @@ def cancel_flight(flight_id):
     with db_cur() as cursor:
         cursor.execute(
             """
-            SELECT flight_id, departure_date, departure_time, status
+            SELECT flight_id, origin_airport, destination_airport, departure_date, departure_time, status
             FROM Flight
             WHERE flight_id=%s
             """,
@@ -1009,9 +737,12 @@ def cancel_flight(flight_id):
     dep_dt = datetime.combine(flight["departure_date"], dep_time)
 
     st_db = str(flight.get("status", "")).lower()
+    job = None
 
     if st_db == "cancelled":
         derived_status = "cancelled"
+        with db_cur() as cursor:
+            job = flight_cancellation.get_job(cursor, flight_id)
     else:
         if dep_dt <= datetime.now():
             derived_status = "done"
@@ -1019,14 +750,13 @@ def cancel_flight(flight_id):
             with db_cur() as cursor:
                 cursor.execute(
                     """
-                    SELECT 1
-                    FROM FlightSeat
-                    WHERE flight_id=%s AND LOWER(status)='available'
-                    LIMIT 1
+                    SELECT COALESCE(SUM(available_seats), 0) AS available_seats
+                    FROM FlightClassAvailability
+                    WHERE flight_id=%s
                     """,
                     (flight_id,),
                 )
-                has_available = cursor.fetchone() is not None
+                has_available = int(cursor.fetchone()["available_seats"]) > 0
             derived_status = "open" if has_available else "full"
 
     can_cancel = (derived_status in ("open", "full"))
@@ -1038,6 +768,7 @@ def cancel_flight(flight_id):
             error=None,
             derived_status=derived_status,
             can_cancel=can_cancel,
+            job=job,
         )
 
     if not can_cancel:
@@ -1059,21 +790,69 @@ def cancel_flight(flight_id):
             can_cancel=False,
         )
 
+    from main import db_tx
+
     # Per Eren: no cascading effect
+    # הבקשה רק מסמנת את הטיסה כמבוטלת ופותחת עבודה; ההזמנות והמושבים מטופלים ברקע (flight_cancellation)
+    with db_tx() as cursor:
+        order_ids = flight_cancellation.start_cancellation(cursor, flight_id)
+
+    if order_ids is not None:
+        # עד שהעבודה תגיע אליהן, ההזמנות נקראות מהמסד עם הסטטוס האפקטיבי (system_cancelled) ולא מהמטמון
+        orders.forget(order_ids)
+        availability.schedule_index.remove_flight(flight_id)
+        invalidate_route_search(flight["origin_airport"], flight["destination_airport"])
+        flight_cancellation.worker.enqueue(flight_id)
+
+    return redirect(f"/admin/flights/cancel/{flight_id}")
+
+
+@admin_bp.route("/flights/cancel/<int:flight_id>/retry", methods=["POST"])
+def retry_cancel_flight(flight_id):
+    '''
+    שולחת שוב לתור עבודת ביטול שנכשלה (ההזמנות שכבר בוטלו לא מעובדות שוב)
+    '''
+    guard = _require_admin()
+    if guard:
+        return guard
+
+    from main import db_tx
+
+    with db_tx() as cursor:
+        retried = flight_cancellation.retry_job(cursor, flight_id)
+    if retried:
+        flight_cancellation.worker.enqueue(flight_id)
+
+    return redirect(f"/admin/flights/cancel/{flight_id}")
+
+
+@admin_bp.route("/flights/cancel/<int:flight_id>/status")
+def cancel_flight_status(flight_id):
+    '''
+    מצב עבודת הביטול של טיסה (JSON): pending / running / done / failed, וכמה הזמנות כבר טופלו
+    '''
+    guard = _require_admin()
+    if guard:
+        return guard
+
+    from main import db_cur
+
     with db_cur() as cursor:
-        cursor.execute("UPDATE Flight SET status='cancelled' WHERE flight_id=%s", (flight_id,))
-        cursor.execute(
-            """
-            UPDATE FlightOrder
-            SET status='system_cancelled', total_payment=0
-            WHERE flight_id=%s
-              AND LOWER(status) IN ('paid','active')
-            """,
-            (flight_id,),
-        )
-        cursor.execute("UPDATE FlightSeat SET status='available' WHERE flight_id=%s", (flight_id,))
+        job = flight_cancellation.get_job(cursor, flight_id)
+
+    if not job:
+        return jsonify({"errors": ["No cancellation job for this flight"]}), 404
+
+    return jsonify({
+        "flight_id": job["flight_id"],
+        "status": job["status"],
+        "total_orders": job["total_orders"],
+        "processed_orders": job["processed_orders"],
+        "error": job["error"],
+        "created_at": job["created_at"].isoformat(),
+        "finished_at": job["finished_at"].isoformat() if job["finished_at"] else None,
+    })
 
-    return redirect("/admin/flights")
 
 # מציג את דף הבית של ממשק משתמש מנהל
 @admin_bp.route("/", methods=["GET"])
@@ -1083,6 +862,37 @@ def admin_home():
         return guard
     return render_template("admin_home.html")
 
+
+@admin_bp.route("/db_pool", methods=["GET"])
+def admin_db_pool_stats():
+    '''
+    מחזירה את נתוני מאגר החיבורים (בשימוש, המתנות, נוצרו, מוחזרו) לצורך קביעת גודל המאגר
+    '''
+    guard = _require_admin()
+    if guard:
+        return guard
+
+    from main import get_pool
+    return jsonify(get_pool().stats())
+
+
+@admin_bp.route("/cache_stats", methods=["GET"])
+def admin_cache_stats():
+    '''
+    מחזירה מוני פגיעות/החטאות של המטמונים (חיפוש טיסות, מפות מושבים, הזמנות)
+    '''
+    guard = _require_admin()
+    if guard:
+        return guard
+
+    from flights import search_cache
+    return jsonify({
+        "search": search_cache.stats(),
+        "seat_layout": seatmap.layout_cache.stats(),
+        "seat_availability": seatmap.availability_cache.stats(),
+        "orders": orders.order_cache.stats(),
+    })
+
 @admin_bp.route("/resources", methods=["GET"])
 def admin_add_resources():
     '''
@@ -1228,238 +1038,46 @@ def admin_reports():
         )
 
 
+    if report not in reports.REPORTS:
+        return redirect(f"/admin/reports?report=avg_occupancy_completed&date_from={date_from}&date_to={date_to}")
+
     from main import db_cur
 
-    data = []
-    kpis = {}
-    meta = {"title": "", "subtitle": "", "columns": [], "notes": []}
+    requested = (date_from, date_to)
+    date_from, date_to = reports.report_range(report, date_from, date_to)
 
-    def _set_table(columns):
-        meta["columns"] = columns
+    # הדוחות קוראים מטבלאות הסיכום היומיות - קודם מחשבים מחדש ימים בטווח שהשתנו מאז (בדרך כלל מעטים)
+    report_rollups.refresh_pending(date_from, date_to)
 
-    def _set_title(title, subtitle=""):
-        meta["title"] = title
-        meta["subtitle"] = subtitle
+    spec = reports.REPORTS[report]
+    kpis = {}
+    meta = {
+        "title": spec["title"],
+        "subtitle": spec["subtitle"],
+        "columns": [{"key": c["key"], "label": c["label"]} for c in spec["columns"]],
+        "notes": [],
+    }
+    if (date_from, date_to) != requested:
+        meta["notes"].append(f"This report covers whole months: {date_from} to {date_to}.")
 
     with db_cur() as cursor:
-        # =========================
-        # Avg occupancy (Completed flights)
-        # =========================
-        if report == "avg_occupancy_completed":
-            _set_title(
-                "Average Occupancy (Completed Flights)",
-                "Average occupancy percent for flights that already departed (not cancelled).",
-            )
-            _set_table([{"key": "avg_occupancy_percent", "label": "Avg Occupancy (%)"}])
-
-            query = """
-                SELECT ROUND(AVG(t.occ_pct), 2) AS avg_occupancy_percent
-                FROM (
-                  SELECT
-                    fs.flight_id,
-                    SUM(CASE WHEN LOWER(fs.status) <> 'available' THEN 1 ELSE 0 END) * 100.0 / COUNT(*) AS occ_pct
-                  FROM FlightSeat fs
-                  GROUP BY fs.flight_id
-                ) AS t
-                JOIN Flight AS f ON f.flight_id = t.flight_id
-                WHERE LOWER(f.status) <> 'cancelled'
-                  AND f.departure_date BETWEEN %s AND %s;
-            """
-            cursor.execute(query, (date_from, date_to))
-            row = cursor.fetchone()
-            val = row["avg_occupancy_percent"] if row else None
-            data = [{"avg_occupancy_percent": f"{val}%" if val is not None else "No data"}]
+        data = list(reports.iter_rows(cursor, report, date_from, date_to))
 
-        # =========================
-        # Revenue by plane size/manufacturer/class (Completed flights)
-        # =========================
-        elif report == "revenue_plane_size_manu_class":
-            _set_title(
-                "Revenue by Plane Size / Manufacturer / Class (Completed Flights)",
-                "Revenue breakdown for flights that already departed (not cancelled).",
-            )
-            _set_table([
-                {"key": "plane_size", "label": "Plane Size"},
-                {"key": "manufacturer", "label": "Manufacturer"},
-                {"key": "class_type", "label": "Class"},
-                {"key": "revenue", "label": "Revenue"},
-            ])
-
-            query = """
-                SELECT
-                  CASE WHEN bp.plane_id IS NOT NULL THEN 'Big' ELSE 'Small' END AS plane_size,
-                  p.manufacturer AS manufacturer,
-                  s.class_type AS class_type,
-                  ROUND(SUM(
-                    CASE
-                      WHEN LOWER(fo.status) = 'system_cancelled' THEN 0
-                      WHEN LOWER(fo.status) = 'customer_cancelled' THEN fp.price * 0.05
-                      ELSE fp.price
-                    END
-                  ), 2) AS revenue
-                FROM Flight f
-                JOIN Plane p ON p.plane_id = f.plane_id
-                LEFT JOIN BigPlane bp ON bp.plane_id = f.plane_id
-                JOIN FlightSeat fs ON fs.flight_id = f.flight_id
-                JOIN Seat s ON s.seat_id = fs.seat_id
-                JOIN OrderItem oi ON oi.flight_seat_id = fs.flight_seat_id
-                JOIN FlightOrder fo ON fo.order_id = oi.order_id
-                JOIN FlightPricing fp
-                  ON fp.flight_id = f.flight_id
-                 AND fp.class_type = s.class_type
-                WHERE LOWER(f.status) <> 'cancelled'
-                  AND f.departure_date BETWEEN %s AND %s
-                GROUP BY plane_size, manufacturer, class_type
-                ORDER BY plane_size, manufacturer, class_type;
-            """
-            cursor.execute(query, (date_from, date_to))
-            data = cursor.fetchall()
-            kpis = {"total_revenue": round(sum((r.get("revenue") or 0) for r in data), 2)}
+    # עיצוב לתצוגה בלבד - הייצוא (export_report) שומר על ערכים מספריים
+    if report == "avg_occupancy_completed":
+        val = data[0]["avg_occupancy_percent"] if data else None
+        data = [{"avg_occupancy_percent": f"{val}%" if val is not None else "No data"}]
 
-        # =========================
-        # Crew hours (Completed flights, filtered by date range)
-        # =========================
-        elif report == "crew_hours_long_short":
-            _set_title(
-                "Crew Flight Hours (Short vs Long) — Completed Flights",
-                "Total accumulated flight minutes per worker, split by short/long, for flights that already departed (not cancelled).",
-            )
-            _set_table([
-                {"key": "worker_id", "label": "Worker ID"},
-                {"key": "full_name", "label": "Name"},
-                {"key": "role", "label": "Role"},
-                {"key": "short_minutes", "label": "Short Minutes"},
-                {"key": "long_minutes", "label": "Long Minutes"},
-                {"key": "total_minutes", "label": "Total Minutes"},
-            ])
-
-            query = """
-                SELECT
-                  w.id AS worker_id,
-                  CONCAT(w.first_name, ' ', w.last_name) AS full_name,
-                  CASE
-                    WHEN pl.id IS NOT NULL THEN 'Pilot'
-                    WHEN fa.id IS NOT NULL THEN 'Flight Attendant'
-                    ELSE 'AirCrew'
-                  END AS role,
-                  COALESCE(SUM(CASE WHEN aw.duration <= 360 THEN aw.duration ELSE 0 END), 0) AS short_minutes,
-                  COALESCE(SUM(CASE WHEN aw.duration > 360 THEN aw.duration ELSE 0 END), 0) AS long_minutes,
-                  COALESCE(SUM(aw.duration), 0) AS total_minutes
-                FROM Worker w
-                JOIN AirCrew ac ON ac.id = w.id
-                LEFT JOIN Pilot pl ON pl.id = w.id
-                LEFT JOIN FlightAttendant fa ON fa.id = w.id
-                JOIN FlightCrewPlacement fcp ON fcp.id = ac.id
-                JOIN Flight f ON f.flight_id = fcp.flight_id
-                JOIN Airway aw
-                  ON aw.origin_airport = f.origin_airport
-                 AND aw.destination_airport = f.destination_airport
-                WHERE LOWER(f.status) <> 'cancelled'
-                  AND f.departure_date BETWEEN %s AND %s
-                GROUP BY w.id, w.first_name, w.last_name, role
-                ORDER BY total_minutes DESC;
-            """
-            cursor.execute(query, (date_from, date_to))
-            data = cursor.fetchall()
+    elif report == "revenue_plane_size_manu_class":
+        kpis = {"total_revenue": round(sum((r.get("revenue") or 0) for r in data), 2)}
 
-        # =========================
-        # Purchase cancellation rate (Orders-based) — keep as-is
-        # =========================
-        elif report == "purchase_cancel_rate_monthly":
-            _set_title("Purchase Cancellation Rate (Monthly)", "Cancellation rate of orders by month (by execution date).")
-            _set_table([
-                {"key": "year", "label": "Year"},
-                {"key": "month", "label": "Month"},
-                {"key": "cancellation_rate_percentage", "label": "Cancel Rate (%)"},
-            ])
-
-            query = """
-                SELECT
-                  YEAR(fo.execution_date) AS year,
-                  MONTH(fo.execution_date) AS month_num,
-                  MONTHNAME(fo.execution_date) AS month,
-                  ROUND(
-                    SUM(
-                      CASE
-                        WHEN LOWER(fo.status) IN ('customer_cancelled', 'system_cancelled') THEN 1
-                        ELSE 0
-                      END
-                    ) * 100.0 / COUNT(*),
-                    2
-                  ) AS cancellation_rate_percentage
-                FROM FlightOrder fo
-                WHERE fo.execution_date BETWEEN %s AND %s
-                GROUP BY YEAR(fo.execution_date), MONTH(fo.execution_date), MONTHNAME(fo.execution_date)
-                ORDER BY year, month_num;
-            """
-            cursor.execute(query, (date_from, date_to))
-            data = cursor.fetchall()
-            for row in data:
-                row["cancellation_rate_percentage"] = f"{row['cancellation_rate_percentage']}%"
+    elif report == "purchase_cancel_rate_monthly":
+        for row in data:
+            row["cancellation_rate_percentage"] = f"{row['cancellation_rate_percentage']}%"
 
-        # =========================
-        # Monthly plane activity (Performed = completed)
-        # =========================
-        elif report == "monthly_plane_activity":
-            _set_title(
-                "Monthly Plane Activity Summary",
-                "Per aircraft: completed flights, cancelled flights, utilization % (assume 30 days), dominant route.",
-            )
-            _set_table([
-                {"key": "plane_id", "label": "Plane ID"},
-                {"key": "manufacturer", "label": "Manufacturer"},
-                {"key": "flight_month", "label": "Month"},
-                {"key": "performed_flights", "label": "Performed (Completed)"},
-                {"key": "cancelled_flights", "label": "Cancelled"},
-                {"key": "dominant_route", "label": "Dominant Route"},
-                {"key": "utilization_percentage", "label": "Utilization (%)"},
-            ])
-
-            query = """
-                SELECT
-                  ms.plane_id,
-                  ms.manufacturer,
-                  ms.flight_month,
-                  ms.performed_flights,
-                  ms.cancelled_flights,
-                  (
-                    SELECT CONCAT(f3.origin_airport, '-', f3.destination_airport)
-                    FROM Flight f3
-                    WHERE f3.plane_id = ms.plane_id
-                      AND DATE_FORMAT(f3.departure_date, '%Y-%m') = ms.flight_month
-                      AND LOWER(f3.status) <> 'cancelled'
-                      AND f3.departure_date BETWEEN %s AND %s
-                    GROUP BY f3.origin_airport, f3.destination_airport
-                    ORDER BY COUNT(*) DESC
-                    LIMIT 1
-                  ) AS dominant_route,
-                  ROUND((ms.performed_flights / 30.0) * 100, 1) AS utilization_percentage
-                FROM (
-                  SELECT
-                    p.plane_id,
-                    p.manufacturer,
-                    DATE_FORMAT(f.departure_date, '%Y-%m') AS flight_month,
-                    SUM(
-                      CASE
-                        WHEN LOWER(f.status) <> 'cancelled'
-                        THEN 1 ELSE 0
-                      END
-                    ) AS performed_flights,
-                    SUM(CASE WHEN LOWER(f.status) = 'cancelled' THEN 1 ELSE 0 END) AS cancelled_flights
-                  FROM Plane p
-                  JOIN Flight f ON f.plane_id = p.plane_id
-                  WHERE f.departure_date BETWEEN %s AND %s
-                  GROUP BY p.plane_id, p.manufacturer, flight_month
-                ) AS ms
-                ORDER BY ms.flight_month DESC, ms.performed_flights DESC;
-            """
-            cursor.execute(query, (date_from, date_to, date_from, date_to))
-            data = cursor.fetchall()
-            for row in data:
-                row["utilization_percentage"] = f"{row['utilization_percentage']}%"
-
-        else:
-            return redirect(f"/admin/reports?report=avg_occupancy_completed&date_from={date_from}&date_to={date_to}")
+    elif report == "monthly_plane_activity":
+        for row in data:
+            row["utilization_percentage"] = f"{row['utilization_percentage']}%"
 
     return render_template(
         "admin_reports.html",
@@ -1470,3 +1088,59 @@ def admin_reports():
         kpis=kpis,
         meta=meta,
     )
+
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", reports.csv_chunks),
+    "parquet": ("application/vnd.apache.parquet", reports.parquet_chunks),
+}
+
+
+@admin_bp.route("/reports/export", methods=["GET"])
+def export_report():
+    '''
+    ייצוא דוח ל-CSV / Parquet בזרימה - השורות נקראות מסמן בצד השרת ונשלחות בחתיכות,
+    כך שהזיכרון קבוע בלי קשר לגודל הדוח; הערכים נשמרים כמספרים (בלי עיצוב של התצוגה)
+    '''
+    guard = _require_admin()
+    if guard:
+        return guard
+
+    report = request.args.get("report")
+    date_from = request.args.get("date_from")
+    date_to = request.args.get("date_to")
+    fmt = (request.args.get("format") or "csv").lower()
+    if report not in reports.REPORTS or not date_from or not date_to or fmt not in EXPORT_FORMATS:
+        return redirect(f"/admin/reports?report={quote(report or '')}&date_from={quote(date_from or '')}&date_to={quote(date_to or '')}")
+
+    if fmt == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return "Parquet export requires the pyarrow package. Use format=csv instead.", 501
+
+    from main import db_cur
+
+    date_from, date_to = reports.report_range(report, date_from, date_to)
+    report_rollups.refresh_pending(date_from, date_to)
+    mimetype, to_chunks = EXPORT_FORMATS[fmt]
+    columns = reports.REPORTS[report]["columns"]
+
+    def generate():
+        with db_cur(buffered=False) as cursor:
+            try:
+                yield from to_chunks(reports.iter_rows(cursor, report, date_from, date_to), columns)
+            finally:
+                # בכל יציאה (ניתוק הלקוח או שגיאה באמצע) קוראים את שארית התוצאה לפני סגירת הסמן
+                try:
+                    reports.discard_rest(cursor)
+                except Exception:
+                    traceback.print_exc()
+
+    filename = f"{report}_{date_from}_{date_to}.{fmt}"
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
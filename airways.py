@@ -0,0 +1,121 @@
+import threading
+import time
+
+# טיסה ארוכה = מעל 360 דקות
+LONG_FLIGHT_MIN = 360
+# כל כמה שניות בודקים אם טבלת Airway השתנתה
+AIRWAY_CHECK_INTERVAL = 300
+
+
+def is_long_duration(duration_min) -> bool:
+    '''
+    סיווג טיסה כארוכה / קצרה לפי משך הטיסה בדקות
+    '''
+    return int(duration_min) > LONG_FLIGHT_MIN
+
+
+def _load_rows_from_db():
+    from main import db_cur
+
+    with db_cur() as cursor:
+        cursor.execute("SELECT origin_airport, destination_airport, duration FROM Airway")
+        return cursor.fetchall()
+
+
+def _fingerprint_from_db():
+    from main import db_cur
+
+    with db_cur() as cursor:
+        cursor.execute(
+            """
+            SELECT
+              COUNT(*) AS n,
+              COALESCE(SUM(CRC32(CONCAT_WS('|', origin_airport, destination_airport, duration))), 0) AS crc
+            FROM Airway
+            """
+        )
+        row = cursor.fetchone()
+    return (int(row["n"]), int(row["crc"]))
+
+
+class AirwayIndex:
+    '''
+    אינדקס בזיכרון של נתיבי האוויר: יעדים לפי מוצא ומשך טיסה לפי זוג שדות
+    נטען פעם אחת, ונטען מחדש רק כשטביעת האצבע של הטבלה משתנה (נבדקת לכל היותר פעם ב-check_interval)
+    '''
+
+    def __init__(self, load_rows=_load_rows_from_db, load_fingerprint=_fingerprint_from_db,
+                 check_interval=AIRWAY_CHECK_INTERVAL):
+        self._load_rows = load_rows
+        self._load_fingerprint = load_fingerprint
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._durations = None
+        self._by_origin = {}
+        self._fingerprint = None
+        self._checked_at = 0.0
+        self.version = 0
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        if self._durations is not None and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if self._durations is not None and now - self._checked_at < self.check_interval:
+                return
+            fingerprint = self._load_fingerprint()
+            if self._durations is None or fingerprint != self._fingerprint:
+                self._reload(fingerprint)
+            self._checked_at = now
+
+    def _reload(self, fingerprint):
+        durations = {}
+        by_origin = {}
+        for r in self._load_rows():
+            key = (r["origin_airport"], r["destination_airport"])
+            durations[key] = int(r["duration"])
+            by_origin.setdefault(r["origin_airport"], set()).add(r["destination_airport"])
+        self._durations = durations
+        self._by_origin = by_origin
+        self._fingerprint = fingerprint
+        self.version += 1
+
+    def invalidate(self):
+        '''
+        מכריחה בדיקה מחדש של הטבלה בגישה הבאה (למשל אחרי עדכון של Airway)
+        '''
+        with self._lock:
+            self._checked_at = 0.0
+            self._fingerprint = None
+
+    def duration(self, origin, destination):
+        '''
+        משך הטיסה בדקות, או None אם אין נתיב כזה
+        '''
+        self._ensure_fresh()
+        return self._durations.get((origin, destination))
+
+    def exists(self, origin, destination) -> bool:
+        return self.duration(origin, destination) is not None
+
+    def is_long(self, origin, destination) -> bool:
+        duration = self.duration(origin, destination)
+        return duration is not None and is_long_duration(duration)
+
+    def destinations(self, origin):
+        '''
+        כל היעדים שיש אליהם נתיב ישיר מהמוצא
+        '''
+        self._ensure_fresh()
+        return set(self._by_origin.get(origin, ()))
+
+    def routes(self):
+        '''
+        מילון {(מוצא, יעד): משך} של כל הנתיבים
+        '''
+        self._ensure_fresh()
+        return dict(self._durations)
+
+
+airway_index = AirwayIndex()
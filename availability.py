@@ -0,0 +1,484 @@
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime
+
+# בסיס ברירת מחדל - משאב שעוד לא טס אף פעם נחשב כנמצא כאן
+DEFAULT_BASE = "TLV"
+# כל כמה שניות אינדקס הזמנים בודק אם לוח הטיסות השתנה בתהליך אחר
+SCHEDULE_CHECK_INTERVAL = 30
+# האינדקס מחזיק רק טיסות שנחתו ב-48 השעות האחרונות ואילך - טיסה חדשה תמיד בעתיד
+SCHEDULE_LOOKBACK_HOURS = 48
+
+# מקור הנתונים של ResourceTimeline: שורה לכל טיסה לא מבוטלת של מטוס ושל כל איש צוות בה
+_TIMELINE_SOURCE_SQL = """
+    SELECT 'plane', f.plane_id, f.flight_id,
+           f.departure_dt,
+           DATE_ADD(f.departure_dt, INTERVAL a.duration MINUTE),
+           f.origin_airport, f.destination_airport
+    FROM Flight f
+    JOIN Airway a
+      ON a.origin_airport = f.origin_airport
+     AND a.destination_airport = f.destination_airport
+    WHERE f.status <> 'cancelled'
+      AND {flight_filter}
+    UNION ALL
+    SELECT 'crew', fcp.id, f.flight_id,
+           f.departure_dt,
+           DATE_ADD(f.departure_dt, INTERVAL a.duration MINUTE),
+           f.origin_airport, f.destination_airport
+    FROM FlightCrewPlacement fcp
+    JOIN Flight f ON f.flight_id = fcp.flight_id
+    JOIN Airway a
+      ON a.origin_airport = f.origin_airport
+     AND a.destination_airport = f.destination_airport
+    WHERE f.status <> 'cancelled'
+      AND {flight_filter}
+"""
+
+_TIMELINE_INSERT = """
+    INSERT INTO ResourceTimeline
+      (resource_type, resource_id, flight_id, start_dt, end_dt, origin_airport, destination_airport)
+"""
+
+
+def timeline_add_flight(cursor, flight_id):
+    '''
+    רושמת את הטיסה (המטוס וכל הצוות) ב-ResourceTimeline - בסוף יצירת טיסה, אחרי שיבוץ הצוות
+    '''
+    cursor.execute(
+        _TIMELINE_INSERT + _TIMELINE_SOURCE_SQL.format(flight_filter="f.flight_id = %s"),
+        (flight_id, flight_id),
+    )
+
+
+def timeline_remove_flight(cursor, flight_id):
+    '''
+    מוחקת את הטיסה מ-ResourceTimeline - בביטול טיסה
+    '''
+    cursor.execute("DELETE FROM ResourceTimeline WHERE flight_id=%s", (flight_id,))
+
+
+def rebuild_timeline(cursor):
+    '''
+    בונה את ResourceTimeline מחדש מ-Flight / FlightCrewPlacement / Airway (למשל אחרי שינוי משך של נתיב)
+    '''
+    cursor.execute("DELETE FROM ResourceTimeline")
+    cursor.execute(_TIMELINE_INSERT + _TIMELINE_SOURCE_SQL.format(flight_filter="1 = 1"))
+    cursor.execute("SELECT COUNT(*) AS n FROM ResourceTimeline")
+    return int(cursor.fetchone()["n"])
+
+
+def last_locations(cursor, resources, before_dt: datetime):
+    '''
+    שדה הנחיתה האחרון עד before_dt של כמה משאבים בשאילתה אחת
+    resources - רשימת (kind, resource_id); מחזירה {(kind, resource_id): last_loc} רק למשאבים שכבר טסו
+    '''
+    resources = list(dict.fromkeys(resources))
+    if not resources:
+        return {}
+    pairs = ",".join(["(%s, %s)"] * len(resources))
+    cursor.execute(
+        f"""
+        SELECT t.resource_type AS kind, t.resource_id, t.destination_airport AS last_loc
+        FROM (
+          SELECT resource_type, resource_id, MAX(end_dt) AS last_end
+          FROM ResourceTimeline
+          WHERE (resource_type, resource_id) IN ({pairs})
+            AND end_dt <= %s
+          GROUP BY resource_type, resource_id
+        ) m
+        JOIN ResourceTimeline t
+          ON t.resource_type = m.resource_type
+         AND t.resource_id = m.resource_id
+         AND t.end_dt = m.last_end
+        """,
+        tuple(x for key in resources for x in key) + (before_dt,),
+    )
+    return {(r["kind"], r["resource_id"]): r["last_loc"] for r in cursor.fetchall()}
+
+
+def flight_minutes(cursor):
+    '''
+    דקות הטיסה המצטברות של כל משאב בטיסות שלא בוטלו (כולל טיסות עתידיות שכבר שובצו)
+    אותו מדד כמו בדו"ח crew_hours_long_short - משך הנתיב לכל טיסה
+    מחזירה {(kind, resource_id): minutes}
+    '''
+    cursor.execute(
+        """
+        SELECT resource_type AS kind, resource_id,
+               SUM(TIMESTAMPDIFF(MINUTE, start_dt, end_dt)) AS minutes
+        FROM ResourceTimeline
+        GROUP BY resource_type, resource_id
+        """
+    )
+    return {(r["kind"], r["resource_id"]): int(r["minutes"] or 0) for r in cursor.fetchall()}
+
+
+def resource_state(cursor, start_dt: datetime, end_dt: datetime):
+    '''
+    לכל מטוס / איש צוות - האם הוא תפוס בחלון [start_dt, end_dt) ומה שדה הנחיתה האחרון שלו לפני start_dt
+    הנחיתה האחרונה היא MAX(end_dt) לכל משאב על האינדקס (resource_type, resource_id, end_dt)
+    מחזירה {(kind, resource_id): {"busy": bool, "last_loc": str | None}}
+    '''
+    cursor.execute(
+        """
+        SELECT t.resource_type AS kind, t.resource_id, t.destination_airport AS last_loc, 0 AS busy
+        FROM (
+          SELECT resource_type, resource_id, MAX(end_dt) AS last_end
+          FROM ResourceTimeline
+          WHERE end_dt <= %s
+          GROUP BY resource_type, resource_id
+        ) m
+        JOIN ResourceTimeline t
+          ON t.resource_type = m.resource_type
+         AND t.resource_id = m.resource_id
+         AND t.end_dt = m.last_end
+        UNION ALL
+        SELECT DISTINCT resource_type, resource_id, NULL, 1
+        FROM ResourceTimeline
+        WHERE end_dt > %s AND start_dt < %s
+        """,
+        (start_dt, start_dt, end_dt),
+    )
+    return _merge_state(cursor.fetchall())
+
+
+def _merge_state(rows):
+    state = {}
+    for r in rows:
+        s = state.setdefault((r["kind"], r["resource_id"]), {"busy": False, "last_loc": None})
+        if int(r["busy"]):
+            s["busy"] = True
+        else:
+            s["last_loc"] = r["last_loc"]
+    return state
+
+
+def location_ok(last_loc, origin) -> bool:
+    '''
+    משאב זמין לטיסה רק אם נחת לאחרונה בשדה המוצא, או שלא טס עדיין והמוצא הוא בסיס ברירת המחדל
+    '''
+    if last_loc is None:
+        return origin == DEFAULT_BASE
+    return last_loc == origin
+
+
+def _available(rows, kind, key, state, origin):
+    result = []
+    for r in rows:
+        s = state.get((kind, r[key])) or {"busy": False, "last_loc": None}
+        if s["busy"] or not location_ok(s["last_loc"], origin):
+            continue
+        result.append(dict(r, last_loc=s["last_loc"]))
+    return result
+
+
+def candidate_planes(cursor, big_only=False):
+    '''
+    כל המטוסים (רק גדולים אם big_only), עם is_big
+    '''
+    cursor.execute(
+        """
+        SELECT
+          p.plane_id,
+          p.manufacturer,
+          p.purchase_date,
+          CASE WHEN bp.plane_id IS NOT NULL THEN 1 ELSE 0 END AS is_big
+        FROM Plane p
+        LEFT JOIN BigPlane bp ON bp.plane_id = p.plane_id
+        WHERE (%s = 0 OR bp.plane_id IS NOT NULL)
+        ORDER BY p.plane_id
+        """,
+        (1 if big_only else 0,),
+    )
+    return cursor.fetchall()
+
+
+def candidate_crew(cursor, trained_only=False):
+    '''
+    כל אנשי הצוות שאינם מנהלים (רק בעלי הכשרה לטיסות ארוכות אם trained_only), עם התפקיד וההכשרה
+    '''
+    long_clause = "AND ac.long_flight_training = 1" if trained_only else ""
+    cursor.execute(
+        f"""
+        SELECT
+          w.id, w.first_name, w.last_name,
+          CASE WHEN p.id IS NOT NULL THEN 1 ELSE 0 END AS is_pilot,
+          CASE WHEN fa.id IS NOT NULL THEN 1 ELSE 0 END AS is_attendant,
+          ac.long_flight_training
+        FROM Worker w
+        JOIN AirCrew ac ON ac.id = w.id
+        LEFT JOIN Pilot p ON p.id = w.id
+        LEFT JOIN FlightAttendant fa ON fa.id = w.id
+        WHERE (p.id IS NOT NULL OR fa.id IS NOT NULL)
+          AND NOT EXISTS (SELECT 1 FROM Manager m WHERE m.id = w.id)
+          {long_clause}
+        ORDER BY w.last_name, w.first_name
+        """
+    )
+    return cursor.fetchall()
+
+
+def available_resources(cursor, is_long: bool, start_dt: datetime, end_dt: datetime, origin: str):
+    '''
+    מחזירה (planes, pilots, attendants) שפנויים בחלון ונמצאים בשדה המוצא
+    טיסה ארוכה - רק מטוסים גדולים ואנשי צוות עם הכשרה לטיסות ארוכות
+    '''
+    state = resource_state(cursor, start_dt, end_dt)
+    planes = _available(candidate_planes(cursor, big_only=is_long), "plane", "plane_id", state, origin)
+    crew = _available(candidate_crew(cursor, trained_only=is_long), "crew", "id", state, origin)
+
+    def strip(r):
+        return {k: v for k, v in r.items() if k not in ("is_pilot", "is_attendant", "long_flight_training")}
+
+    pilots = [strip(r) for r in crew if int(r["is_pilot"])]
+    attendants = [strip(r) for r in crew if int(r["is_attendant"])]
+    return planes, pilots, attendants
+
+
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# תפקיד -> (שם התפקיד, עמודת התפקיד, שם בהודעת מנהל, תחילית בהודעות זמינות)
+_CREW_ROLES = {
+    "pilot": ("Pilot", "is_pilot", "Pilot", "Pilot"),
+    "attendant": ("Flight Attendant", "is_attendant", "Attendant", "Flight attendant"),
+}
+
+
+def validate_crew(cursor, plane_id, pilot_ids, fa_ids, is_long: bool,
+                  start_dt: datetime, end_dt: datetime, origin: str, index=None):
+    '''
+    בודקת את המטוס ואת כל הצוות שנבחר במספר קבוע של שאילתות:
+    תפקיד, החרגת מנהלים, הכשרה לטיסה ארוכה, חפיפה בזמנים ומיקום בזמן ההמראה
+    מחזירה רשימה של כל ההפרות (ריקה אם הכל תקין)
+    '''
+    index = index or schedule_index
+    errors = []
+    selected = [("pilot", x) for x in pilot_ids] + [("attendant", x) for x in fa_ids]
+
+    ids = sorted({i for i in (_as_int(x) for _, x in selected) if i is not None})
+    people = {}
+    if ids:
+        cursor.execute(
+            f"""
+            SELECT
+              w.id,
+              CASE WHEN p.id IS NOT NULL THEN 1 ELSE 0 END AS is_pilot,
+              CASE WHEN fa.id IS NOT NULL THEN 1 ELSE 0 END AS is_attendant,
+              CASE WHEN m.id IS NOT NULL THEN 1 ELSE 0 END AS is_manager,
+              COALESCE(ac.long_flight_training, 0) AS long_flight_training
+            FROM Worker w
+            LEFT JOIN AirCrew ac         ON ac.id = w.id
+            LEFT JOIN Pilot p            ON p.id = w.id
+            LEFT JOIN FlightAttendant fa ON fa.id = w.id
+            LEFT JOIN Manager m          ON m.id = w.id
+            WHERE w.id IN ({",".join(["%s"] * len(ids))})
+            """,
+            tuple(ids),
+        )
+        people = {int(r["id"]): r for r in cursor.fetchall()}
+
+    seen = set()
+    for role, raw in selected:
+        title, flag, manager_title, prefix = _CREW_ROLES[role]
+        wid = _as_int(raw)
+        person = people.get(wid)
+        if wid is not None and wid in seen:
+            errors.append(f"Worker {raw} is selected more than once.")
+            continue
+        seen.add(wid)
+        if not person or not int(person[flag]):
+            errors.append(f"Worker {raw} is not a {title}.")
+            continue
+        if int(person["is_manager"]):
+            errors.append(f"Worker {raw} is a Manager and cannot be assigned as {manager_title}.")
+        if is_long and int(person["long_flight_training"]) != 1:
+            errors.append(f"{prefix} {raw} is not trained for long flights.")
+
+    crew = [(role, _as_int(raw), raw) for role, raw in selected if _as_int(raw) is not None]
+    resources = [("plane", plane_id)] + [("crew", wid) for _, wid, _ in crew]
+
+    busy = index.overlapping(resources, start_dt, end_dt, max_age=0)
+    if ("plane", plane_id) in busy:
+        errors.append("Selected plane is not available at this time (overlap).")
+    for role, wid, raw in crew:
+        if ("crew", wid) in busy:
+            errors.append(f"{_CREW_ROLES[role][3]} {raw} is not available at this time (overlap).")
+
+    locations = last_locations(cursor, resources, start_dt)
+    plane_loc = locations.get(("plane", plane_id))
+    if not location_ok(plane_loc, origin):
+        errors.append(f"Selected plane is not at {origin} at departure time (last known location: {plane_loc}).")
+    for role, wid, raw in crew:
+        loc = locations.get(("crew", wid))
+        if not location_ok(loc, origin):
+            errors.append(
+                f"{_CREW_ROLES[role][3]} {raw} is not at {origin} at departure time (last known location: {loc})."
+            )
+
+    return list(dict.fromkeys(errors))
+
+
+class _Intervals:
+    '''
+    הטיסות של משאב אחד, ממוינות לפי זמן המראה, עם מקסימום מצטבר של זמני הנחיתה
+    '''
+
+    def __init__(self):
+        self.items = []      # (start_dt, end_dt, flight_id)
+        self.max_end = []
+
+    def _rebuild_from(self, i):
+        del self.max_end[i:]
+        running = self.max_end[i - 1] if i else None
+        for _, end, _ in self.items[i:]:
+            running = end if running is None or end > running else running
+            self.max_end.append(running)
+
+    def add(self, start_dt, end_dt, flight_id):
+        item = (start_dt, end_dt, flight_id)
+        insort(self.items, item)
+        self._rebuild_from(self.items.index(item))
+
+    def remove(self, flight_id):
+        for i, item in enumerate(self.items):
+            if item[2] == flight_id:
+                del self.items[i]
+                self._rebuild_from(i)
+                return
+
+    def overlaps(self, start_dt, end_dt) -> bool:
+        # כל הטיסות שהמריאו לפני end_dt הן items[:i]; חפיפה אם אחת מהן נוחתת אחרי start_dt
+        i = bisect_left(self.items, (end_dt,))
+        return i > 0 and self.max_end[i - 1] > start_dt
+
+
+def _load_schedule_rows():
+    from main import db_cur
+
+    with db_cur() as cursor:
+        cursor.execute(
+            """
+            SELECT resource_type AS kind, resource_id, start_dt, end_dt, flight_id
+            FROM ResourceTimeline
+            WHERE end_dt >= NOW() - INTERVAL %s HOUR
+            """,
+            (SCHEDULE_LOOKBACK_HOURS,),
+        )
+        return cursor.fetchall()
+
+
+def schedule_fingerprint(cursor):
+    '''
+    טביעת אצבע של לוח הזמנים - משתנה בכל יצירה / ביטול של טיסה
+    '''
+    cursor.execute(
+        "SELECT COUNT(*) AS n, COALESCE(MAX(flight_id), 0) AS max_flight FROM ResourceTimeline"
+    )
+    row = cursor.fetchone()
+    return (int(row["n"]), int(row["max_flight"]))
+
+
+def _schedule_fingerprint_from_db():
+    from main import db_cur
+
+    with db_cur() as cursor:
+        return schedule_fingerprint(cursor)
+
+
+class ScheduleIndex:
+    '''
+    אינדקס אינטרוולים בזיכרון לכל מטוס / איש צוות - עונה על "האם המשאבים האלה תפוסים ב-[start, end)"
+    בקריאה אחת, במקום שאילתת חפיפה לכל משאב
+    מתעדכן ביצירה / ביטול טיסה בתהליך הזה, ונטען מחדש כשטביעת האצבע של לוח הטיסות משתנה
+    '''
+
+    def __init__(self, load_rows=_load_schedule_rows, load_fingerprint=_schedule_fingerprint_from_db,
+                 check_interval=SCHEDULE_CHECK_INTERVAL):
+        self._load_rows = load_rows
+        self._load_fingerprint = load_fingerprint
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._by_resource = None
+        self._by_flight = {}
+        self._fingerprint = None
+        self._checked_at = 0.0
+
+    def _ensure_fresh(self, max_age=None):
+        max_age = self.check_interval if max_age is None else max_age
+        with self._lock:
+            now = time.monotonic()
+            if self._by_resource is not None and now - self._checked_at < max_age:
+                return
+            fingerprint = self._load_fingerprint()
+            if self._by_resource is None or fingerprint != self._fingerprint:
+                self._by_resource = {}
+                self._by_flight = {}
+                for r in self._load_rows():
+                    self._add((r["kind"], r["resource_id"]), r["start_dt"], r["end_dt"], r["flight_id"])
+                self._fingerprint = fingerprint
+            self._checked_at = now
+
+    def _add(self, key, start_dt, end_dt, flight_id):
+        self._by_resource.setdefault(key, _Intervals()).add(start_dt, end_dt, flight_id)
+        self._by_flight.setdefault(flight_id, []).append(key)
+
+    def invalidate(self):
+        with self._lock:
+            self._by_resource = None
+
+    def overlapping(self, resources, start_dt: datetime, end_dt: datetime, max_age=None):
+        '''
+        resources - רשימת (kind, resource_id); מחזירה את קבוצת המשאבים שיש להם טיסה החופפת ל-[start_dt, end_dt)
+        max_age=0 - בודקת את טביעת האצבע לפני התשובה (לאימות לפני יצירת טיסה)
+        '''
+        self._ensure_fresh(max_age)
+        with self._lock:
+            return {
+                key for key in resources
+                if key in self._by_resource and self._by_resource[key].overlaps(start_dt, end_dt)
+            }
+
+    def add_flight(self, flight_id, plane_id, crew_ids, start_dt: datetime, end_dt: datetime):
+        '''
+        עדכון מיידי אחרי יצירת טיסה בתהליך הזה
+        גם טביעת האצבע השמורה מתעדכנת (שורות ResourceTimeline ו-flight_id המקסימלי), כך שהבדיקה הבאה
+        לא טוענת את האינדקס מחדש בגלל השינוי שלנו - רק בגלל שינוי מתהליך אחר
+        '''
+        with self._lock:
+            # טעינה מחדש אחרי ה-commit כבר כוללת את הטיסה
+            if self._by_resource is None or flight_id in self._by_flight:
+                return
+            keys = [("plane", plane_id)] + [("crew", cid) for cid in crew_ids]
+            for key in keys:
+                self._add(key, start_dt, end_dt, flight_id)
+            if self._fingerprint is not None:
+                n, max_flight = self._fingerprint
+                self._fingerprint = (n + len(keys), max(max_flight, flight_id))
+
+    def remove_flight(self, flight_id):
+        '''
+        עדכון מיידי אחרי ביטול טיסה בתהליך הזה (כולל טביעת האצבע, כמו ב-add_flight)
+        '''
+        with self._lock:
+            if self._by_resource is None:
+                return
+            keys = self._by_flight.pop(flight_id, None)
+            if keys is None:
+                return
+            for key in keys:
+                self._by_resource[key].remove(flight_id)
+            if self._fingerprint is not None:
+                n, max_flight = self._fingerprint
+                # ה-flight_id המקסימלי החדש לא ידוע כאן - הבדיקה הבאה תטען מחדש
+                self._fingerprint = None if flight_id == max_flight else (n - len(keys), max_flight)
+
+
+schedule_index = ScheduleIndex()
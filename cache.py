@@ -0,0 +1,153 @@
+import threading
+import time
+
+
+class LocalStore:
+    '''
+    אחסון בזיכרון של התהליך - ברירת המחדל של TTLCache
+    כל אובייקט עם get/set/delete/clear באותה חתימה (למשל עטיפה ל-Redis) יכול להחליף אותו
+    '''
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+
+    def replace(self, key, value):
+        '''
+        מחליפה ערך קיים בלי להאריך את זמן התפוגה שלו
+        '''
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                self._data[key] = (item[0], value)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TTLCache:
+    '''
+    מטמון עם זמן תפוגה לכל ערך, ומונים של פגיעות/החטאות
+    '''
+
+    def __init__(self, ttl=None, store=None):
+        self.ttl = ttl
+        self.store = store if store is not None else LocalStore()
+        self._lock = threading.RLock()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key):
+        value = self.store.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.store.set(key, value, ttl if ttl is not None else self.ttl)
+
+    def delete(self, key):
+        self.store.delete(key)
+
+    def get_or_compute(self, key, compute, ttl=None, wait_timeout=10.0):
+        '''
+        מחזירה את הערך מהמטמון, ובהחטאה מחשבת אותו פעם אחת בלבד (single-flight):
+        בקשות מקבילות לאותו מפתח ממתינות לחישוב הראשון במקום להריץ אותו שוב
+        '''
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = threading.Event()
+                self._inflight[key] = event
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            event.wait(wait_timeout)
+            value = self.store.get(key)
+            if value is not None:
+                return value
+            # החישוב המקורי נכשל או לקח יותר מדי זמן - מחשבים בעצמנו
+            return compute()
+
+        try:
+            value = compute()
+            if value is not None:
+                self.set(key, value, ttl)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def namespace_version(self, namespace):
+        '''
+        גרסה נוכחית של קבוצת מפתחות - משמשת כחלק מהמפתח כדי לבטל את כל הקבוצה בבת אחת
+        '''
+        return self.store.get(f"ns:{namespace}") or 0
+
+    def bump_namespace(self, namespace):
+        '''
+        מבטלת את כל המפתחות של הקבוצה (הם פשוט לא ייקראו יותר ויפוגו לבד)
+        '''
+        with self._lock:
+            self.store.set(f"ns:{namespace}", self.namespace_version(namespace) + 1, None)
+
+    def update(self, key, fn):
+        '''
+        עדכון במקום (קריאה-שינוי-כתיבה) של ערך קיים, תחת נעילה, בלי להאריך את התוקף שלו
+        fn מקבלת את הערך הנוכחי ומחזירה את הערך החדש. אם אין ערך - לא עושה כלום
+        '''
+        with self._lock:
+            value = self.store.get(key)
+            if value is None:
+                return None
+            value = fn(value)
+            replace = getattr(self.store, "replace", None)
+            if replace is not None:
+                replace(key, value)
+            else:
+                self.set(key, value)
+            return value
+
+    def clear(self):
+        self.store.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.coalesced = 0
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced}
@@ -0,0 +1,220 @@
+import heapq
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime, date, timedelta
+
+from airways import airway_index
+
+MAX_STOPS = 2
+# זמן קונקשן מינימלי / מקסימלי בין נחיתה להמראה הבאה (דקות)
+MIN_CONNECTION_MIN = 60
+MAX_CONNECTION_MIN = 24 * 60
+MAX_ITINERARIES = 10
+# בלי תאריך - מחפשים שנה קדימה
+SEARCH_HORIZON_DAYS = 365
+
+
+def _hops(start, edges, reverse=False):
+    '''
+    BFS על גרף הנתיבים - מספר הקפיצות המינימלי מ-start (או אל start, אם reverse)
+    '''
+    adj = {}
+    for o, d in edges:
+        a, b = (d, o) if reverse else (o, d)
+        adj.setdefault(a, []).append(b)
+
+    dist = {start: 0}
+    queue = deque([start])
+    while queue:
+        node = queue.popleft()
+        for nxt in adj.get(node, ()):
+            if nxt not in dist:
+                dist[nxt] = dist[node] + 1
+                queue.append(nxt)
+    return dist
+
+
+def usable_routes(routes, origin, destination, max_stops=MAX_STOPS):
+    '''
+    מחזירה רק את הנתיבים שיכולים להופיע במסלול מהמוצא ליעד עם עד max_stops עצירות
+    '''
+    max_legs = max_stops + 1
+    dist_from = _hops(origin, routes)
+    dist_to = _hops(destination, routes, reverse=True)
+    inf = max_legs + 1
+    return [
+        (o, d) for (o, d) in routes
+        if dist_from.get(o, inf) + 1 + dist_to.get(d, inf) <= max_legs
+    ]
+
+
+def find_itineraries(legs, origin, destination, depart_from, depart_to,
+                     max_stops=MAX_STOPS, min_stops=1,
+                     min_connection=MIN_CONNECTION_MIN, max_connection=MAX_CONNECTION_MIN,
+                     limit=MAX_ITINERARIES):
+    '''
+    חיפוש מסלולים על גרף זמן-מורחב (מרומז): לכל שדה, ההמראות ממוינות לפי זמן,
+    ומכל נחיתה ממשיכים רק להמראות שבחלון הקונקשן (bisect)
+    legs - רשימת טיסות עם departure_dt, arrival_dt, origin_airport, destination_airport, regular_price
+    מחזירה עד limit מסלולים, ממוינים לפי משך כולל ואז לפי מחיר
+    '''
+    max_legs = max_stops + 1
+    min_gap = timedelta(minutes=min_connection)
+    max_gap = timedelta(minutes=max_connection)
+
+    by_origin = {}
+    for leg in legs:
+        by_origin.setdefault(leg["origin_airport"], []).append(leg)
+    times = {}
+    for airport, lst in by_origin.items():
+        lst.sort(key=lambda x: x["departure_dt"])
+        times[airport] = [x["departure_dt"] for x in lst]
+
+    dist_to = _hops(destination, {(l["origin_airport"], l["destination_airport"]) for l in legs}, reverse=True)
+    inf = max_legs + 1
+
+    # ערימת מקסימום (לפי מפתח שלילי) של המסלולים הטובים ביותר עד כה
+    best = []
+    counter = 0
+
+    def rank(path):
+        duration = path[-1]["arrival_dt"] - path[0]["departure_dt"]
+        price = sum(float(l["regular_price"] or 0) for l in path)
+        return duration, price
+
+    def worst_duration():
+        return -best[0][0][0] if len(best) >= limit else None
+
+    def extend(path, airport, ready_at, latest, visited):
+        nonlocal counter
+        deps = by_origin.get(airport)
+        if not deps:
+            return
+        remaining = max_legs - len(path) - 1
+        i = bisect_left(times[airport], ready_at)
+        for leg in deps[i:]:
+            if leg["departure_dt"] > latest:
+                break
+            nxt = leg["destination_airport"]
+            if nxt in visited or dist_to.get(nxt, inf) > remaining:
+                continue
+
+            new_path = path + [leg]
+            start = new_path[0]["departure_dt"]
+            elapsed = leg["arrival_dt"] - start
+            cutoff = worst_duration()
+            if cutoff is not None and elapsed > cutoff:
+                continue
+
+            if nxt == destination:
+                if len(new_path) - 1 >= min_stops:
+                    duration, price = rank(new_path)
+                    counter += 1
+                    item = ((-duration, -price), counter, new_path)
+                    if len(best) < limit:
+                        heapq.heappush(best, item)
+                    elif (duration, price) < (-best[0][0][0], -best[0][0][1]):
+                        heapq.heapreplace(best, item)
+                continue
+
+            extend(
+                new_path, nxt,
+                leg["arrival_dt"] + min_gap, leg["arrival_dt"] + max_gap,
+                visited | {nxt},
+            )
+
+    extend([], origin, depart_from, depart_to, {origin})
+
+    itineraries = sorted(best, key=lambda x: (-x[0][0], -x[0][1]))
+    return [_itinerary(path) for _, _, path in itineraries]
+
+
+def _itinerary(path):
+    duration = path[-1]["arrival_dt"] - path[0]["departure_dt"]
+    return {
+        "legs": path,
+        "stops": len(path) - 1,
+        "airports": [path[0]["origin_airport"]] + [l["destination_airport"] for l in path],
+        "departure_dt": path[0]["departure_dt"],
+        "arrival_dt": path[-1]["arrival_dt"],
+        "duration_min": int(duration.total_seconds() // 60),
+        "regular_price": sum(float(l["regular_price"] or 0) for l in path),
+    }
+
+
+def load_legs(routes, depart_from, depart_to):
+    '''
+    שאילתה אחת שמביאה את כל הטיסות הניתנות להזמנה בנתיבים הרלוונטיים ובחלון הזמן
+    '''
+    from main import db_cur
+
+    if not routes:
+        return []
+
+    pairs = ",".join(["(%s, %s)"] * len(routes))
+    params = [x for pair in routes for x in pair]
+    query = f"""
+        SELECT
+            f.flight_id,
+            f.origin_airport,
+            f.destination_airport,
+            f.departure_date,
+            f.departure_time,
+            f.departure_dt,
+            reg.price AS regular_price,
+            bus.price AS business_price
+        FROM Flight f
+        LEFT JOIN FlightPricing reg
+          ON reg.flight_id = f.flight_id AND reg.class_type='Regular'
+        LEFT JOIN FlightPricing bus
+          ON bus.flight_id = f.flight_id AND bus.class_type='Business'
+        WHERE (f.origin_airport, f.destination_airport) IN ({pairs})
+          AND f.departure_dt >= %s
+          AND f.departure_dt < %s
+          AND f.departure_dt > NOW()
+          AND f.status <> 'cancelled'
+          AND EXISTS (
+              SELECT 1
+              FROM FlightClassAvailability ca
+              WHERE ca.flight_id = f.flight_id
+                AND ca.available_seats > 0
+          )
+    """
+    with db_cur() as cursor:
+        cursor.execute(query, tuple(params) + (depart_from, depart_to))
+        return cursor.fetchall()
+
+
+def search_connections(origin, destination, departure_date=None, max_stops=MAX_STOPS):
+    '''
+    מוצאת מסלולים עם עצירה אחת או שתיים בין מוצא ליעד
+    עם תאריך - המראה ראשונה באותו יום; בלי תאריך - בשנה הקרובה
+    '''
+    routes = airway_index.routes()
+    candidate_routes = usable_routes(list(routes), origin, destination, max_stops)
+    if not candidate_routes:
+        return []
+
+    if departure_date:
+        day = date.fromisoformat(str(departure_date))
+        depart_from = datetime.combine(day, datetime.min.time())
+        depart_to = depart_from + timedelta(days=1)
+    else:
+        depart_from = datetime.now()
+        depart_to = depart_from + timedelta(days=SEARCH_HORIZON_DAYS)
+
+    # הטיסה האחרונה במסלול יכולה להמריא מאוחר יותר מהחלון של הטיסה הראשונה
+    longest = max(routes[r] for r in candidate_routes)
+    slack = timedelta(minutes=max_stops * (longest + MAX_CONNECTION_MIN))
+
+    legs = []
+    for row in load_legs(candidate_routes, depart_from, depart_to + slack):
+        leg = dict(row)
+        leg["arrival_dt"] = leg["departure_dt"] + timedelta(
+            minutes=routes[(leg["origin_airport"], leg["destination_airport"])]
+        )
+        legs.append(leg)
+
+    return find_itineraries(
+        legs, origin, destination, depart_from, depart_to, max_stops=max_stops
+    )
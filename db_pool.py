@@ -0,0 +1,164 @@
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    '''
+    נזרקת כאשר לא התפנה חיבור במאגר בתוך זמן ההמתנה שהוגדר
+    '''
+
+
+class ConnectionPool:
+    '''
+    מאגר חיבורים חסום למסד הנתונים
+    size - מספר החיבורים שנשמרים פתוחים במאגר
+    max_overflow - חיבורים נוספים שנפתחים בעומס ונסגרים בהחזרה
+    timeout - זמן המתנה מקסימלי (שניות) לחיבור פנוי
+    pre_ping - בדיקת תקינות החיבור לפני השאלה
+    max_lifetime - גיל מקסימלי (שניות) של חיבור לפני שממחזרים אותו
+    '''
+
+    def __init__(self, connect, size=5, max_overflow=5, timeout=10.0, pre_ping=True, max_lifetime=1800):
+        self._connect = connect
+        self.size = int(size)
+        self.max_overflow = int(max_overflow)
+        self.timeout = float(timeout)
+        self.pre_ping = bool(pre_ping)
+        self.max_lifetime = max_lifetime
+
+        self._cond = threading.Condition()
+        self._idle = []          # LIFO - החיבור "החם" ביותר יוצא ראשון
+        self._born = {}          # id(conn) -> זמן יצירה
+        self._total = 0          # חיבורים פתוחים (בשימוש + פנויים)
+        self._in_use = 0
+
+        self._created = 0
+        self._recycled = 0
+        self._waits = 0
+        self._timeouts = 0
+
+    def _new_connection(self):
+        conn = self._connect()
+        with self._cond:
+            self._born[id(conn)] = time.monotonic()
+            self._created += 1
+        return conn
+
+    def _close(self, conn):
+        self._born.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_expired(self, conn):
+        if not self.max_lifetime:
+            return False
+        born = self._born.get(id(conn))
+        return born is None or time.monotonic() - born > self.max_lifetime
+
+    def acquire(self):
+        '''
+        מחזירה חיבור מהמאגר, פותחת חיבור חדש אם יש מקום, או ממתינה עד שיתפנה חיבור
+        '''
+        deadline = time.monotonic() + self.timeout
+        counted_wait = False
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._total < self.size + self.max_overflow:
+                    self._total += 1
+                    conn = None
+                    break
+
+                if not counted_wait:
+                    self._waits += 1
+                    counted_wait = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f"No database connection available within {self.timeout:g}s "
+                        f"(size={self.size}, overflow={self.max_overflow})"
+                    )
+                self._cond.wait(remaining)
+            self._in_use += 1
+
+        try:
+            if conn is None:
+                return self._new_connection()
+
+            # חיבור ישן או שנותק - סוגרים ופותחים חדש במקומו
+            if self._is_expired(conn) or (self.pre_ping and not self._is_alive(conn)):
+                with self._cond:
+                    self._recycled += 1
+                self._close(conn)
+                return self._new_connection()
+            return conn
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    @staticmethod
+    def _is_alive(conn):
+        try:
+            return conn.is_connected()
+        except Exception:
+            return False
+
+    def release(self, conn, discard=False):
+        '''
+        מחזירה חיבור למאגר. חיבור פגום, חיבור עודף (overflow) או חיבור שביקשו לזרוק - נסגר
+        '''
+        if not discard:
+            try:
+                # לא משאירים טרנזקציה פתוחה לשואל הבא
+                if getattr(conn, "in_transaction", False):
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            keep = not discard and self._total <= self.size
+            if keep:
+                self._idle.append(conn)
+            else:
+                self._total -= 1
+            self._cond.notify()
+
+        if not keep:
+            self._close(conn)
+
+    def close_all(self):
+        '''
+        סוגרת את כל החיבורים הפנויים במאגר
+        '''
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+        for conn in idle:
+            self._close(conn)
+
+    def stats(self):
+        '''
+        מחזירה נתוני שימוש במאגר, לצורך קביעת הגודל המתאים
+        '''
+        with self._cond:
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "open": self._total,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "created": self._created,
+                "recycled": self._recycled,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+            }
@@ -0,0 +1,244 @@
+import queue
+import threading
+import traceback
+
+import availability
+import orders
+import report_rollups
+import seatmap
+import seat_counters
+
+# כמה הזמנות מבוטלות בכל טרנזקציה של עבודת הביטול
+CANCEL_CHUNK_SIZE = 100
+
+JOB_STATUSES = ("pending", "running", "done", "failed")
+
+
+def start_cancellation(cursor, flight_id):
+    '''
+    החלק הסינכרוני של ביטול טיסה (בתוך הטרנזקציה של הבקשה): מסמנת את הטיסה כמבוטלת,
+    משחררת את המטוס והצוות ופותחת עבודת ביטול להזמנות
+    מחזירה את ההזמנות הפעילות של הטיסה (כדי להוציא אותן מהמטמון אחרי ה-commit), או None אם הטיסה כבר בוטלה
+    '''
+    cursor.execute(
+        "UPDATE Flight SET status='cancelled' WHERE flight_id=%s AND status <> 'cancelled'",
+        (flight_id,),
+    )
+    if not cursor.rowcount:
+        return None
+
+    report_rollups.activity_cancel_flight(cursor, flight_id)
+    availability.timeline_remove_flight(cursor, flight_id)
+    report_rollups.mark_flight(cursor, flight_id)
+
+    cursor.execute(
+        """
+        SELECT order_id FROM FlightOrder
+        WHERE flight_id=%s AND LOWER(status) IN ('paid','active')
+        """,
+        (flight_id,),
+    )
+    order_ids = [r["order_id"] for r in cursor.fetchall()]
+    # עבודה אחת לכל טיסה - שליחה חוזרת לא פותחת עבודה נוספת
+    cursor.execute(
+        """
+        INSERT IGNORE INTO FlightCancellationJob
+          (flight_id, status, total_orders, processed_orders, created_at, updated_at)
+        VALUES (%s, 'pending', %s, 0, NOW(), NOW())
+        """,
+        (flight_id, len(order_ids)),
+    )
+    return order_ids
+
+
+def process_chunk(cursor, flight_id, limit=CANCEL_CHUNK_SIZE):
+    '''
+    מבטלת עד limit הזמנות פעילות של הטיסה (החזר מלא) ומשחררת את המושבים שלהן
+    בוחרת רק הזמנות שעדיין פעילות, כך שהרצה חוזרת אחרי כשל לא מבטלת פעמיים; מחזירה את ההזמנות שבוטלו
+    '''
+    cursor.execute(
+        """
+        SELECT order_id FROM FlightOrder
+        WHERE flight_id=%s AND LOWER(status) IN ('paid','active')
+        ORDER BY order_id
+        LIMIT %s
+        FOR UPDATE
+        """,
+        (flight_id, limit),
+    )
+    order_ids = [r["order_id"] for r in cursor.fetchall()]
+    if not order_ids:
+        return []
+
+    fmt = ",".join(["%s"] * len(order_ids))
+    cursor.execute(
+        f"""
+        UPDATE FlightOrder
+        SET status='system_cancelled', total_payment=0
+        WHERE order_id IN ({fmt})
+        """,
+        tuple(order_ids),
+    )
+    cursor.execute(
+        f"""
+        UPDATE FlightSeat fs
+        JOIN OrderItem oi ON oi.flight_seat_id = fs.flight_seat_id
+        SET fs.status='available'
+        WHERE oi.order_id IN ({fmt})
+        """,
+        tuple(order_ids),
+    )
+    cursor.execute(
+        """
+        UPDATE FlightCancellationJob
+        SET processed_orders = processed_orders + %s, updated_at = NOW()
+        WHERE flight_id=%s
+        """,
+        (len(order_ids), flight_id),
+    )
+    return order_ids
+
+
+def finish(cursor, flight_id):
+    '''
+    סוף העבודה: משחררת מושבים שנשארו תפוסים, מחשבת מחדש את מוני המושבים ומסמנת את העבודה כגמורה
+    '''
+    cursor.execute(
+        "UPDATE FlightSeat SET status='available' WHERE flight_id=%s AND status <> 'available'",
+        (flight_id,),
+    )
+    seat_counters.recount_flight(cursor, flight_id)
+    # ההזמנות השתנו אחרי הסימון שבבקשה - מסמנים שוב את הימים שלהן
+    report_rollups.mark_flight(cursor, flight_id)
+    cursor.execute(
+        """
+        UPDATE FlightCancellationJob
+        SET status='done', total_orders = processed_orders, error=NULL,
+            updated_at = NOW(), finished_at = NOW()
+        WHERE flight_id=%s
+        """,
+        (flight_id,),
+    )
+
+
+def run_job(flight_id, chunk_size=CANCEL_CHUNK_SIZE):
+    '''
+    מריצה את עבודת הביטול של טיסה עד הסוף - כל חלק בטרנזקציה משלו
+    עבודה שכבר הסתיימה לא רצה שוב; בכשל העבודה מסומנת failed ואפשר להריץ אותה שוב
+    '''
+    from main import db_tx
+
+    with db_tx() as cursor:
+        cursor.execute(
+            """
+            UPDATE FlightCancellationJob
+            SET status='running', updated_at = NOW()
+            WHERE flight_id=%s AND status <> 'done'
+            """,
+            (flight_id,),
+        )
+        if not cursor.rowcount:
+            return False
+
+    try:
+        while True:
+            with db_tx() as cursor:
+                order_ids = process_chunk(cursor, flight_id, chunk_size)
+            orders.forget(order_ids)
+            if len(order_ids) < chunk_size:
+                break
+
+        with db_tx() as cursor:
+            finish(cursor, flight_id)
+    except Exception as e:
+        traceback.print_exc()
+        with db_tx() as cursor:
+            cursor.execute(
+                """
+                UPDATE FlightCancellationJob
+                SET status='failed', error=%s, updated_at = NOW()
+                WHERE flight_id=%s
+                """,
+                (str(e)[:1000], flight_id),
+            )
+        return False
+    finally:
+        seatmap.invalidate_flight(flight_id)
+
+    return True
+
+
+def retry_job(cursor, flight_id):
+    '''
+    מחזירה עבודה שנכשלה למצב pending (כדי לשלוח אותה שוב לתור); False אם היא לא במצב failed
+    '''
+    cursor.execute(
+        """
+        UPDATE FlightCancellationJob
+        SET status='pending', error=NULL, updated_at = NOW()
+        WHERE flight_id=%s AND status='failed'
+        """,
+        (flight_id,),
+    )
+    return cursor.rowcount == 1
+
+
+def get_job(cursor, flight_id):
+    cursor.execute(
+        """
+        SELECT flight_id, status, total_orders, processed_orders, error, created_at, updated_at, finished_at
+        FROM FlightCancellationJob
+        WHERE flight_id=%s
+        """,
+        (flight_id,),
+    )
+    return cursor.fetchone()
+
+
+def unfinished_jobs(cursor):
+    '''
+    עבודות שלא הסתיימו (pending / running / failed) - למשל אחרי הפעלה מחדש של השרת
+    '''
+    cursor.execute(
+        "SELECT flight_id FROM FlightCancellationJob WHERE status <> 'done' ORDER BY created_at, flight_id"
+    )
+    return [r["flight_id"] for r in cursor.fetchall()]
+
+
+class CancellationWorker:
+    '''
+    תור מקומי ו-thread רקע אחד שמריץ את עבודות הביטול לפי הסדר
+    ה-thread נוצר בשליחה הראשונה (ומחדש אם נפל)
+    '''
+
+    def __init__(self, run=run_job):
+        self._run = run
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def enqueue(self, flight_id):
+        self._queue.put(flight_id)
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="flight-cancellation", daemon=True)
+                self._thread.start()
+
+    def join(self):
+        '''
+        ממתינה עד שכל העבודות שבתור הסתיימו
+        '''
+        self._queue.join()
+
+    def _loop(self):
+        while True:
+            flight_id = self._queue.get()
+            try:
+                self._run(flight_id)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                self._queue.task_done()
+
+
+worker = CancellationWorker()
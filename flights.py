@@ -1,8 +1,47 @@
-from flask import Blueprint, render_template, request, redirect, session
+from flask import Blueprint, render_template, request, redirect, session, jsonify
 from datetime import datetime, date, timedelta
+import calendar
+import time
+
+import orders
+import seatmap
+import seat_counters
+import report_rollups
+from cache import TTLCache
+from airways import airway_index
+from connections import search_connections
 
 flights_bp = Blueprint("flights", __name__)
 
+# תוצאות חיפוש לפי (מוצא, יעד, תאריך) - תוקף קצר, ומתבטלות ביצירה/ביטול/מכירה מלאה של טיסה בנתיב
+SEARCH_CACHE_TTL = 30
+search_cache = TTLCache(ttl=SEARCH_CACHE_TTL)
+
+# deadlock / lock wait timeout - שגיאות שמותר לנסות שוב
+RETRYABLE_DB_ERRNOS = (1213, 1205)
+BOOKING_MAX_ATTEMPTS = 3
+
+
+class SeatsUnavailable(Exception):
+    '''
+    אחד או יותר מהמושבים שנבחרו כבר נתפס על ידי הזמנה אחרת
+    '''
+    def __init__(self, flight_seat_ids):
+        super().__init__(f"Seats no longer available: {sorted(flight_seat_ids)}")
+        self.flight_seat_ids = set(flight_seat_ids)
+
+
+class InvalidSeatSelection(Exception):
+    '''
+    המושבים שנבחרו אינם שייכים לטיסה / למטוס, או שאין מחיר למחלקה שלהם
+    '''
+
+
+class FlightClosed(Exception):
+    '''
+    הטיסה בוטלה או המריאה בין הבדיקה בדף המושבים לבין הטרנזקציה של ההזמנה
+    '''
+
 
 @flights_bp.route("/search_flights", methods=["GET"])
 def search_flights():
@@ -48,37 +87,25 @@ def search_flights():
             departure_date=departure_date
         )
 
-    from main import db_cur
+    has_route = airway_index.exists(origin, destination)
+    flights = cached_bookable_flights(origin, destination, departure_date) if has_route else []
 
-    with db_cur() as cursor:
-        cursor.execute("""
-            SELECT 1
-            FROM Airway
-            WHERE origin_airport=%s
-              AND destination_airport=%s
-        """, (origin, destination))
-        if not cursor.fetchone():
+    # אין טיסה ישירה - מציעים מסלולים עם עצירה אחת או שתיים
+    connections = [] if flights else search_connections(origin, destination, departure_date)
+
+    if not flights and not connections:
+        if not has_route:
             errors.append("No flights exist between these airports")
-            return render_template(
-                "search_flights.html",
-                errors=errors,
-                flights=[],
-                origin=origin,
-                destination=destination,
-                departure_date=departure_date
+        else:
+            errors.append(
+                "No flights available for booking on this route"
+                + (" on this date" if departure_date else "")
             )
 
-    flights = get_bookable_flights(origin, destination, departure_date)
-
-    if not flights:
-        errors.append(
-            "No flights available for booking on this route"
-            + (" on this date" if departure_date else "")
-        )
-
     return render_template(
         "search_flights.html",
         flights=flights,
+        connections=connections,
         errors=errors,
         origin=origin,
         destination=destination,
@@ -94,7 +121,40 @@ def get_bookable_flights(origin, destination, departure_date=None):
     '''
     from main import db_cur
 
-    base_query = """
+    query, params = _bookable_flights_query(origin, destination, departure_date)
+    with db_cur() as cursor:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+
+def _route_namespace(origin, destination):
+    return f"route:{origin}:{destination}"
+
+
+def cached_bookable_flights(origin, destination, departure_date=None):
+    '''
+    get_bookable_flights דרך מטמון החיפוש - חיפושים מקבילים לאותו מפתח מחושבים פעם אחת
+    '''
+    version = search_cache.namespace_version(_route_namespace(origin, destination))
+    key = f"search:{origin}:{destination}:{departure_date or '*'}:v{version}"
+    return search_cache.get_or_compute(
+        key, lambda: get_bookable_flights(origin, destination, departure_date)
+    )
+
+
+def invalidate_route_search(origin, destination):
+    '''
+    מבטלת את כל תוצאות החיפוש השמורות של נתיב (לכל התאריכים)
+    '''
+    search_cache.bump_namespace(_route_namespace(origin, destination))
+
+
+def _bookable_flights_query(origin, destination, departure_date=None):
+    '''
+    בונה את שאילתת החיפוש כך שכל התנאים על Flight יוכלו להשתמש באינדקס
+    (origin_airport, destination_airport, departure_dt) - בלי פונקציות על העמודות המאונדקסות
+    '''
+    query = """
         SELECT
             f.flight_id,
             f.origin_airport,
@@ -103,10 +163,9 @@ def get_bookable_flights(origin, destination, departure_date=None):
             f.departure_time,
             reg.price AS regular_price,
             bus.price AS business_price,
-            (SELECT COUNT(*)
-             FROM FlightSeat fs
-             WHERE fs.flight_id = f.flight_id
-               AND LOWER(fs.status) = 'available'
+            (SELECT SUM(ca.available_seats)
+             FROM FlightClassAvailability ca
+             WHERE ca.flight_id = f.flight_id
             ) AS available_seats
         FROM Flight f
         LEFT JOIN FlightPricing reg
@@ -115,27 +174,131 @@ def get_bookable_flights(origin, destination, departure_date=None):
           ON bus.flight_id = f.flight_id AND bus.class_type='Business'
         WHERE f.origin_airport=%s
           AND f.destination_airport=%s
-          AND LOWER(f.status) <> 'cancelled'
-          AND TIMESTAMP(f.departure_date, f.departure_time) > NOW()
+          AND f.departure_dt > NOW()
+          AND f.status <> 'cancelled'
           AND EXISTS (
               SELECT 1
-              FROM FlightSeat fs2
-              WHERE fs2.flight_id = f.flight_id
-                AND LOWER(fs2.status) = 'available'
+              FROM FlightClassAvailability ca2
+              WHERE ca2.flight_id = f.flight_id
+                AND ca2.available_seats > 0
           )
     """
 
     params = [origin, destination]
 
     if departure_date:
-        base_query += " AND f.departure_date=%s"
-        params.append(departure_date)
+        # טווח על departure_dt במקום השוואה על departure_date - נשאר בתוך אותו אינדקס
+        day = date.fromisoformat(str(departure_date))
+        query += " AND f.departure_dt >= %s AND f.departure_dt < %s"
+        params += [datetime.combine(day, datetime.min.time()), datetime.combine(day + timedelta(days=1), datetime.min.time())]
+
+    query += " ORDER BY f.departure_dt"
+    return query, tuple(params)
+
+
+@flights_bp.route("/fare_calendar", methods=["GET"])
+def fare_calendar():
+    '''
+    לוח מחירים לנתיב: לכל יום בחודש - המחיר הזול ביותר בכל מחלקה שיש בה מושבים פנויים, ומספר המושבים הפנויים
+    פרמטרים: origin, destination, month (YYYY-MM, ברירת מחדל - החודש הנוכחי)
+    '''
+    origin = (request.args.get("origin") or "").strip()
+    destination = (request.args.get("destination") or "").strip()
+    month = (request.args.get("month") or "").strip() or date.today().strftime("%Y-%m")
+
+    errors = []
+    if not origin:
+        errors.append("Origin field is required")
+    if not destination:
+        errors.append("Destination field is required")
+    if origin and destination and origin == destination:
+        errors.append("Origin and destination cannot be the same")
+    try:
+        month_start = datetime.strptime(month, "%Y-%m").date()
+    except ValueError:
+        errors.append("Invalid month")
+
+    if errors:
+        return jsonify({"errors": errors}), 400
+
+    days = cached_fare_calendar(origin, destination, month_start)
+    return jsonify({
+        "origin": origin,
+        "destination": destination,
+        "month": month_start.strftime("%Y-%m"),
+        "days": days,
+    })
 
-    base_query += " ORDER BY f.departure_date, f.departure_time"
 
+def cached_fare_calendar(origin, destination, month_start):
+    '''
+    get_fare_calendar דרך מטמון החיפוש - מתבטל יחד עם שאר החיפושים של הנתיב
+    '''
+    version = search_cache.namespace_version(_route_namespace(origin, destination))
+    key = f"fares:{origin}:{destination}:{month_start:%Y-%m}:v{version}"
+    return search_cache.get_or_compute(
+        key, lambda: get_fare_calendar(origin, destination, month_start)
+    )
+
+
+def get_fare_calendar(origin, destination, month_start):
+    '''
+    שאילתה מקובצת אחת לכל החודש, ומחזירה שורה לכל יום (גם לימים בלי טיסות)
+    '''
+    from main import db_cur
+
+    query, params = _fare_calendar_query(origin, destination, month_start)
     with db_cur() as cursor:
-        cursor.execute(base_query, tuple(params))
-        return cursor.fetchall()
+        cursor.execute(query, params)
+        rows = {str(r["day"]): r for r in cursor.fetchall()}
+
+    n_days = calendar.monthrange(month_start.year, month_start.month)[1]
+    days = []
+    for i in range(n_days):
+        day = (month_start + timedelta(days=i)).isoformat()
+        r = rows.get(day) or {}
+        days.append({
+            "date": day,
+            "flights": int(r.get("flights") or 0),
+            "regular_price": float(r["regular_price"]) if r.get("regular_price") is not None else None,
+            "business_price": float(r["business_price"]) if r.get("business_price") is not None else None,
+            "regular_seats": int(r.get("regular_seats") or 0),
+            "business_seats": int(r.get("business_seats") or 0),
+        })
+    return days
+
+
+def _fare_calendar_query(origin, destination, month_start):
+    '''
+    כמו בחיפוש - כל התנאים על Flight הם טווח על האינדקס (origin_airport, destination_airport, departure_dt)
+    מחיר מחלקה נספר רק אם יש בה מושבים פנויים באותה טיסה
+    '''
+    n_days = calendar.monthrange(month_start.year, month_start.month)[1]
+    start = datetime.combine(month_start, datetime.min.time())
+    end = start + timedelta(days=n_days)
+
+    query = """
+        SELECT
+            DATE(f.departure_dt) AS day,
+            COUNT(DISTINCT f.flight_id) AS flights,
+            MIN(CASE WHEN ca.class_type='Regular' THEN p.price END) AS regular_price,
+            MIN(CASE WHEN ca.class_type='Business' THEN p.price END) AS business_price,
+            SUM(CASE WHEN ca.class_type='Regular' THEN ca.available_seats ELSE 0 END) AS regular_seats,
+            SUM(CASE WHEN ca.class_type='Business' THEN ca.available_seats ELSE 0 END) AS business_seats
+        FROM Flight f
+        JOIN FlightClassAvailability ca
+          ON ca.flight_id = f.flight_id AND ca.available_seats > 0
+        LEFT JOIN FlightPricing p
+          ON p.flight_id = f.flight_id AND p.class_type = ca.class_type
+        WHERE f.origin_airport=%s
+          AND f.destination_airport=%s
+          AND f.departure_dt >= %s AND f.departure_dt < %s
+          AND f.departure_dt > NOW()
+          AND f.status <> 'cancelled'
+        GROUP BY DATE(f.departure_dt)
+        ORDER BY day
+    """
+    return query, (origin, destination, start, end)
 
 
 @flights_bp.route("/select_seats", methods=["GET", "POST"])
@@ -152,7 +315,7 @@ def select_seats():
     מחשב מחיר סופי למושבים
     פותח הזמנה, מעדכן את מסד הנתונים במושבים שנרכשו ובפרטי הלקוח
     '''
-    from main import db_cur
+    from main import db_cur, is_valid_phone
 
     flight_id = (
         request.args.get("flight_id", type=int)
@@ -216,17 +379,14 @@ def select_seats():
             error="This flight has already departed.",
         )
 
-    with db_cur() as cursor:
-        cursor.execute(
-            """
-            SELECT 1
-            FROM FlightSeat
-            WHERE flight_id=%s AND LOWER(status)='available'
-            LIMIT 1
-            """,
-            (flight_id,),
-        )
-        has_any_available = cursor.fetchone() is not None
+    seats_by_class, grid_by_class = _get_seats_and_grids_by_class(
+        flight_id, flight["plane_id"]
+    )
+    has_any_available = any(
+        str(s["status"]).lower() == "available"
+        for seats in seats_by_class.values()
+        for s in seats
+    )
 
     if not has_any_available:
         return render_template(
@@ -236,10 +396,6 @@ def select_seats():
             grid_by_class={},
             error="This flight is fully booked.",
         )
-
-    seats_by_class, grid_by_class = _get_seats_and_grids_by_class(
-        flight_id, flight["plane_id"]
-    )
     #אם מנהל מנסה לרכוש כרטיס - לא נאשר את ההזמנה
     if session.get("is_manager"):
         return render_template(
@@ -275,44 +431,11 @@ def select_seats():
                 error="Please select at least one seat.",
             )
 
-        with db_cur() as cursor:
-            fmt = ",".join(["%s"] * len(selected_ids))
-            cursor.execute(
-                f"""
-                SELECT fs.flight_seat_id, fs.status, s.class_type, s.plane_id
-                FROM FlightSeat fs
-                JOIN Seat s ON s.seat_id = fs.seat_id
-                WHERE fs.flight_id=%s AND fs.flight_seat_id IN ({fmt})
-                """,
-                (flight_id, *selected_ids),
-            )
-            rows = cursor.fetchall()
-
-        if len(rows) != len(selected_ids):
+        try:
+            selected_ids = sorted({int(x) for x in selected_ids})
+        except (TypeError, ValueError):
             return redirect(f"/select_seats?flight_id={flight_id}")
 
-        reg_price = flight["regular_price"]
-        bus_price = flight["business_price"]  # may be None
-
-        total_payment = 0.0
-        for r in rows:
-            if str(r["status"]).lower() != "available":
-                return redirect(f"/select_seats?flight_id={flight_id}")
-            if int(r["plane_id"]) != int(flight["plane_id"]):
-                return redirect(f"/select_seats?flight_id={flight_id}")
-
-            ct = r["class_type"]
-            if ct == "Regular":
-                if reg_price is None:
-                    return redirect(f"/select_seats?flight_id={flight_id}")
-                total_payment += float(reg_price)
-            elif ct == "Business":
-                if bus_price is None:
-                    return redirect(f"/select_seats?flight_id={flight_id}")
-                total_payment += float(bus_price)
-            else:
-                return redirect(f"/select_seats?flight_id={flight_id}")
-
         is_logged_in = bool(session.get("user_email"))
 
         guest_full_name = (request.form.get("guest_full_name") or "").strip()
@@ -400,25 +523,35 @@ def select_seats():
                         (email, phone),
                     )
 
-            cursor.execute(
-                """
-                INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment)
-                VALUES (%s, %s, %s, %s, %s)
-                """,
-                (flight_id, email, date.today(), "paid", total_payment),
+        try:
+            order_id, total_payment = book_seats(
+                flight_id,
+                email,
+                selected_ids,
+                plane_id=flight["plane_id"],
+                regular_price=flight["regular_price"],
+                business_price=flight["business_price"],
             )
-
-            cursor.execute("SELECT LAST_INSERT_ID() AS order_id")
-            order_id = cursor.fetchone()["order_id"]
-
-            cursor.executemany(
-                "INSERT INTO OrderItem (order_id, flight_seat_id) VALUES (%s, %s)",
-                [(order_id, fsid) for fsid in selected_ids],
+        except SeatsUnavailable:
+            seats_by_class, grid_by_class = _get_seats_and_grids_by_class(
+                flight_id, flight["plane_id"]
             )
-
-            cursor.execute(
-                f"UPDATE FlightSeat SET status='booked' WHERE flight_id=%s AND flight_seat_id IN ({fmt})",
-                (flight_id, *selected_ids),
+            return render_template(
+                "select_seats.html",
+                flight=flight,
+                seats_by_class=seats_by_class,
+                grid_by_class=grid_by_class,
+                error="Some of the selected seats were just booked by another customer. Please choose again.",
+            )
+        except InvalidSeatSelection:
+            return redirect(f"/select_seats?flight_id={flight_id}")
+        except FlightClosed as e:
+            return render_template(
+                "select_seats.html",
+                flight=flight,
+                seats_by_class={},
+                grid_by_class={},
+                error=str(e),
             )
 
         return redirect(f"/order_success?order_id={order_id}&email={email}")
@@ -433,73 +566,159 @@ def select_seats():
 
 
 
-def _get_seats_and_grids_by_class(flight_id, plane_id):
+def book_seats(flight_id, email, flight_seat_ids, plane_id, regular_price, business_price):
     '''
-    פונקציה הבונה את מפת המושבים למטוס הספציפי, בחלוקה למחלקה רגילה ועסקים (אם קיימת)
+    מבצעת את ההזמנה בטרנזקציה אחת: נעילת המושבים, בדיקת זמינות, יצירת הזמנה ופריטים וסימון המושבים כתפוסים
+    במקרה של deadlock מנסה שוב מספר מוגבל של פעמים
+    מחזירה (order_id, total_payment), או זורקת SeatsUnavailable / InvalidSeatSelection
     '''
-    from main import db_cur
+    from main import db_tx
 
-    with db_cur() as cursor:
-        cursor.execute(
-            """
-            DELETE fs
-            FROM FlightSeat fs
-            JOIN Seat s ON s.seat_id = fs.seat_id
-            WHERE fs.flight_id=%s AND s.plane_id<>%s
-            """,
-            (flight_id, plane_id),
-        )
+    seat_ids = sorted({int(x) for x in flight_seat_ids})
+    if not seat_ids:
+        raise InvalidSeatSelection("No seats selected")
 
-    with db_cur() as cursor:
-        cursor.execute("SELECT COUNT(*) AS cnt FROM FlightSeat WHERE flight_id=%s", (flight_id,))
-        if cursor.fetchone()["cnt"] == 0:
-            cursor.execute("SELECT seat_id FROM Seat WHERE plane_id=%s", (plane_id,))
-            seat_ids = [r["seat_id"] for r in cursor.fetchall()]
-            if seat_ids:
-                cursor.executemany(
-                    "INSERT INTO FlightSeat (flight_id, seat_id, status) VALUES (%s, %s, 'available')",
-                    [(flight_id, sid) for sid in seat_ids],
+    for attempt in range(1, BOOKING_MAX_ATTEMPTS + 1):
+        try:
+            with db_tx() as cursor:
+                order_id, total_payment, seat_rows = _book_seats_tx(
+                    cursor, flight_id, email, seat_ids, plane_id, regular_price, business_price
                 )
+                flight = _flight_after_booking(cursor, flight_id, {r["class_type"] for r in seat_rows})
+            seatmap.mark_booked(flight_id, seat_ids)
+            orders.remember_booking(order_id, email, total_payment, flight, seat_rows, date.today())
+            if int(flight["classes_sold_out"]):
+                # מחלקה (או כל הטיסה) נמכרה עכשיו - החיפוש ולוח המחירים מציגים זמינות לפי מחלקה
+                invalidate_route_search(flight["origin_airport"], flight["destination_airport"])
+            return order_id, total_payment
+        except SeatsUnavailable:
+            # המפה השמורה כנראה לא עדכנית (הזמנה מתהליך אחר) - נטען אותה מחדש
+            seatmap.invalidate_flight(flight_id)
+            raise
+        except (InvalidSeatSelection, FlightClosed):
+            raise
+        except Exception as e:
+            if getattr(e, "errno", None) not in RETRYABLE_DB_ERRNOS or attempt == BOOKING_MAX_ATTEMPTS:
+                raise
+            time.sleep(0.05 * attempt)
+
+
+def _flight_after_booking(cursor, flight_id, class_types):
+    '''
+    פרטי הטיסה אחרי ההזמנה, בתוך הטרנזקציה: מסלול ומועד (לאישור ההזמנה) וכמה מהמחלקות שהוזמנו
+    נשארו בלי מושבים - לפני ההזמנה היה בהן מושב פנוי, כך שההזמנה הזו היא שמכרה אותן
+    '''
+    class_types = sorted(class_types)
+    fmt = ",".join(["%s"] * len(class_types))
+    cursor.execute(
+        f"""
+        SELECT
+          f.flight_id,
+          f.origin_airport,
+          f.destination_airport,
+          f.departure_date,
+          f.departure_time,
+          f.departure_dt,
+          (SELECT COUNT(*)
+           FROM FlightClassAvailability ca
+           WHERE ca.flight_id = f.flight_id AND ca.class_type IN ({fmt})
+             AND ca.available_seats = 0) AS classes_sold_out
+        FROM Flight f
+        WHERE f.flight_id=%s
+        """,
+        (*class_types, flight_id),
+    )
+    return cursor.fetchone()
 
-    seats_by_class = {}
-    grid_by_class = {}
-    #יצירת מספר שורות וטורים למחלקות
-    for class_type in ("Regular", "Business"):
-        with db_cur() as cursor:
-            cursor.execute(
-                """
-                SELECT rows_number, columns_number
-                FROM Class
-                WHERE plane_id=%s AND class_type=%s
-                """,
-                (plane_id, class_type),
-            )
-            meta = cursor.fetchone()
 
-            cursor.execute(
-                """
-                SELECT
-                  fs.flight_seat_id,
-                  fs.status,
-                  s.row_num,
-                  s.column_number,
-                  s.class_type
-                FROM FlightSeat fs
-                JOIN Seat s ON s.seat_id = fs.seat_id
-                WHERE fs.flight_id=%s
-                  AND s.class_type=%s
-                  AND s.plane_id=%s
-                ORDER BY s.row_num, s.column_number
-                """,
-                (flight_id, class_type, plane_id),
-            )
-            seats = cursor.fetchall()
+def _book_seats_tx(cursor, flight_id, email, seat_ids, plane_id, regular_price, business_price):
+    '''
+    גוף הטרנזקציה של ההזמנה - רץ על סמן שנמצא בתוך db_tx
+    '''
+    fmt = ",".join(["%s"] * len(seat_ids))
+
+    # נועלים את שורת הטיסה (משותף) ובודקים אותה שוב - ביטול טיסה (UPDATE Flight) ממתין לסוף ההזמנה,
+    # והזמנה שמתחילה אחרי הביטול רואה אותו; כך לא נשארת הזמנה משולמת על טיסה מבוטלת
+    cursor.execute(
+        "SELECT status, departure_dt FROM Flight WHERE flight_id=%s FOR SHARE",
+        (flight_id,),
+    )
+    current = cursor.fetchone()
+    if not current or str(current["status"]).lower() == "cancelled":
+        raise FlightClosed("This flight is cancelled.")
+    if current["departure_dt"] <= datetime.now():
+        raise FlightClosed("This flight has already departed.")
+
+    # נועלים את שורות המושבים (לפי סדר קבוע, כדי לצמצם deadlocks)
+    cursor.execute(
+        f"""
+        SELECT fs.flight_seat_id, fs.status, s.class_type, s.plane_id, s.row_num, s.column_number
+        FROM FlightSeat fs
+        JOIN Seat s ON s.seat_id = fs.seat_id
+        WHERE fs.flight_id=%s AND fs.flight_seat_id IN ({fmt})
+        ORDER BY fs.flight_seat_id
+        FOR UPDATE
+        """,
+        (flight_id, *seat_ids),
+    )
+    rows = cursor.fetchall()
+
+    if len(rows) != len(seat_ids):
+        raise InvalidSeatSelection("Seat does not belong to this flight")
+
+    taken = [r["flight_seat_id"] for r in rows if str(r["status"]).lower() != "available"]
+    if taken:
+        raise SeatsUnavailable(taken)
+
+    total_payment = 0.0
+    for r in rows:
+        if int(r["plane_id"]) != int(plane_id):
+            raise InvalidSeatSelection("Seat does not match the flight's plane")
+        ct = r["class_type"]
+        if ct == "Regular" and regular_price is not None:
+            total_payment += float(regular_price)
+        elif ct == "Business" and business_price is not None:
+            total_payment += float(business_price)
+        else:
+            raise InvalidSeatSelection(f"No price for class {ct}")
+
+    # עדכון מותנה - גם אם משהו עקף את הנעילה, לא נמכור מושב פעמיים
+    cursor.execute(
+        f"""
+        UPDATE FlightSeat
+        SET status='booked'
+        WHERE flight_id=%s AND status='available' AND flight_seat_id IN ({fmt})
+        """,
+        (flight_id, *seat_ids),
+    )
+    if cursor.rowcount != len(seat_ids):
+        raise SeatsUnavailable(seat_ids)
+
+    seat_counters.apply_booking(cursor, flight_id, seat_counters.count_by_class(rows))
+
+    cursor.execute(
+        """
+        INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment, departure_dt)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        """,
+        (flight_id, email, date.today(), "paid", total_payment, current["departure_dt"]),
+    )
+    order_id = cursor.lastrowid
+
+    cursor.executemany(
+        "INSERT INTO OrderItem (order_id, flight_seat_id) VALUES (%s, %s)",
+        [(order_id, fsid) for fsid in seat_ids],
+    )
+    report_rollups.mark_order(cursor, order_id)
+
+    return order_id, total_payment, rows
 
-        if seats:
-            seats_by_class[class_type] = seats
-            grid_by_class[class_type] = {
-                "rows": meta["rows_number"] if meta else 0,
-                "cols": meta["columns_number"] if meta else 6,
-            }
 
-    return seats_by_class, grid_by_class
+def _get_seats_and_grids_by_class(flight_id, plane_id):
+    '''
+    פונקציה הבונה את מפת המושבים למטוס הספציפי, בחלוקה למחלקה רגילה ועסקים (אם קיימת)
+    קריאה בלבד - מבנה המטוס ומפת הזמינות של הטיסה מגיעים מהמטמון (seatmap),
+    ובהחטאה נטענים בשאילתה אחת
+    (יצירת רשומות FlightSeat נעשית רק ביצירת הטיסה, ראו scheduling.insert_flight)
+    '''
+    return seatmap.get_seat_map(flight_id, plane_id)
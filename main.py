@@ -1,11 +1,35 @@
-from flask import Flask, render_template, redirect, session, request
+from flask import Flask, render_template, redirect, session, request, g, has_app_context, jsonify
 import mysql.connector
+import click
 from contextlib import contextmanager
 from datetime import date, datetime
+from urllib.parse import urlencode
+
+from db_pool import ConnectionPool
+import availability
+import orders
+import report_rollups
+import seatmap
+import seat_counters
 
 app = Flask(__name__)
 app.secret_key = 'flytau123'
 
+DB_CONFIG = {
+    "host": "ellibrinker.mysql.pythonanywhere-services.com",
+    "user": "ellibrinker",
+    "password": "elli2003",
+    "database": "ellibrinker$flytau",
+    "autocommit": True,
+}
+
+# הגדרות מאגר החיבורים (ניתן לדרוס דרך app.config)
+app.config.setdefault("DB_POOL_SIZE", 5)
+app.config.setdefault("DB_POOL_MAX_OVERFLOW", 5)
+app.config.setdefault("DB_POOL_TIMEOUT", 10.0)
+app.config.setdefault("DB_POOL_PRE_PING", True)
+app.config.setdefault("DB_POOL_MAX_LIFETIME", 1800)
+
 import re
 
 PHONE_RE = re.compile(r"^\+?[0-9]{8,15}$")      # E.164-ish
@@ -23,28 +47,97 @@ def is_valid_passport(x: str) -> bool:
     '''
     return bool(PASSPORT_RE.fullmatch((x or "").strip()))
 
+_pool = None
+
+
+def get_pool():
+    '''
+    מחזירה את מאגר החיבורים של האפליקציה (נוצר בשימוש הראשון)
+    '''
+    global _pool
+    if _pool is None:
+        _pool = ConnectionPool(
+            lambda: mysql.connector.connect(**DB_CONFIG),
+            size=app.config["DB_POOL_SIZE"],
+            max_overflow=app.config["DB_POOL_MAX_OVERFLOW"],
+            timeout=app.config["DB_POOL_TIMEOUT"],
+            pre_ping=app.config["DB_POOL_PRE_PING"],
+            max_lifetime=app.config["DB_POOL_MAX_LIFETIME"],
+        )
+    return _pool
+
+
+def _borrow_connection():
+    '''
+    בתוך בקשה - חיבור אחד לכל הבקשה, שנשמר ב-g ומוחזר למאגר בסופה
+    מחוץ לבקשה - חיבור שמוחזר למאגר מיד בסיום השימוש
+    '''
+    if has_app_context():
+        conn = g.get("db_conn")
+        if conn is None:
+            conn = get_pool().acquire()
+            g.db_conn = conn
+        return conn, False
+    return get_pool().acquire(), True
+
+
+@app.teardown_appcontext
+def _release_request_connection(exc):
+    conn = g.pop("db_conn", None)
+    if conn is not None:
+        get_pool().release(conn)
+
+
 @contextmanager
-def db_cur():
+def db_cur(buffered=True):
     '''
     יצירת חיבור למסד הנתונים וניהול הקשר עימו
+    החיבור נלקח ממאגר החיבורים, ובמהלך בקשה משותף לכל הקריאות ל-db_cur
+    buffered=False - סמן בצד השרת לקריאה בזרימה (ייצוא דוחות); חייבים לקרוא את כל התוצאה לפני סגירה
     '''
-    mydb = None
+    conn, owned = _borrow_connection()
     cursor = None
+    broken = False
     try:
-        mydb = mysql.connector.connect(
-            host="ellibrinker.mysql.pythonanywhere-services.com",
-            user="ellibrinker",
-            password="elli2003",
-            database="ellibrinker$flytau",
-            autocommit=True
-        )
-        cursor = mydb.cursor(dictionary=True)
+        # buffered - כדי שכמה סמנים יוכלו לחלוק את אותו חיבור
+        cursor = conn.cursor(dictionary=True, buffered=buffered)
         yield cursor
+    finally:
+        if cursor:
+            try:
+                cursor.close()
+            except Exception:
+                if buffered:
+                    raise
+                # סמן בזרימה שנשארו בו שורות שלא נקראו - לא מסתירים את השגיאה המקורית,
+                # והחיבור נסגר במקום לחזור למאגר
+                broken = True
+        if broken and not owned:
+            g.pop("db_conn", None)
+        if owned or broken:
+            get_pool().release(conn, discard=broken)
+
+
+@contextmanager
+def db_tx():
+    '''
+    פותח טרנזקציה על חיבור מהמאגר - commit בסיום מוצלח, rollback בכל שגיאה
+    '''
+    conn, owned = _borrow_connection()
+    cursor = None
+    try:
+        conn.start_transaction()
+        cursor = conn.cursor(dictionary=True, buffered=True)
+        yield cursor
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
     finally:
         if cursor:
             cursor.close()
-        if mydb:
-            mydb.close()
+        if owned:
+            get_pool().release(conn)
 
 
 @app.route('/')
@@ -196,115 +289,193 @@ def order_success():
     order_id = request.args.get("order_id", type=int)
     email = request.args.get("email", "")
 
-    with db_cur() as cursor:
-        cursor.execute("""
-            SELECT fo.order_id, fo.flight_id, fo.email, fo.execution_date, fo.status, fo.total_payment
-            FROM FlightOrder fo
-            WHERE fo.order_id=%s AND fo.email=%s
-        """, (order_id, email))
-        order = cursor.fetchone()
+    # מיד אחרי ההזמנה - מהמטמון שנכתב בזמן ההזמנה, בלי גישה למסד
+    order = orders.get_order(order_id, email) if order_id else None
+    seats = order["seats"] if order else []
 
-        cursor.execute("""
-            SELECT s.row_num, s.column_number
+    return render_template("order_success.html", order=order, seats=seats)
+
+# כמה הזמנות מוצגות בכל עמוד של /my_orders
+ORDERS_PAGE_SIZE = 20
+
+# לשוניות הסטטוס של /my_orders ("done" / "paid" נגזרים ממועד הטיסה)
+ORDER_STATUS_TABS = ("paid", "done", "customer_cancelled", "system_cancelled")
+
+
+def _parse_orders_cursor(value):
+    '''
+    "<departure_dt ISO>_<order_id>" -> (datetime, order_id); None אם ריק או לא תקין
+    '''
+    try:
+        dt, order_id = value.rsplit("_", 1)
+        return datetime.fromisoformat(dt), int(order_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def orders_page(cursor, email, status_filter, after, limit):
+    '''
+    עמוד אחד מהיסטוריית ההזמנות של הלקוח, מהטיסה המאוחרת למוקדמת (departure_dt, order_id)
+    המפתח הוא FlightOrder.departure_dt, כך שהעמוד נקרא לפי הסדר מ-idx_order_email_departure
+    המושבים נשלפים רק להזמנות של העמוד; מחזירה (orders, seats_by_order, next_cursor)
+    '''
+    query = f"""
+        SELECT
+            fo.order_id,
+            fo.flight_id,
+            fo.email,
+            fo.execution_date,
+            {orders.EFFECTIVE_STATUS_SQL} AS status,
+            {orders.EFFECTIVE_PAYMENT_SQL} AS total_payment,
+            f.origin_airport,
+            f.destination_airport,
+            f.departure_date,
+            f.departure_time,
+            fo.departure_dt
+        FROM FlightOrder fo
+        JOIN Flight f ON f.flight_id = fo.flight_id
+        WHERE fo.email=%s
+    """
+    params = [email]
+
+    if status_filter == "done":
+        # Done = paid orders where the flight already departed
+        query += " AND fo.status='paid' AND f.status <> 'cancelled' AND fo.departure_dt < %s"
+        params.append(datetime.now())
+
+    elif status_filter == "paid":
+        # Active = paid orders where the flight is in the future
+        query += " AND fo.status='paid' AND f.status <> 'cancelled' AND fo.departure_dt >= %s"
+        params.append(datetime.now())
+
+    elif status_filter:
+        # other statuses: customer_cancelled / system_cancelled / etc.
+        query += f" AND {orders.EFFECTIVE_STATUS_SQL}=%s"
+        params.append(status_filter)
+
+    if after:
+        query += " AND (fo.departure_dt < %s OR (fo.departure_dt = %s AND fo.order_id < %s))"
+        params += [after[0], after[0], after[1]]
+
+    # שורה אחת יותר מהעמוד - כדי לדעת אם יש עמוד הבא
+    query += " ORDER BY fo.departure_dt DESC, fo.order_id DESC LIMIT %s"
+    params.append(limit + 1)
+
+    cursor.execute(query, tuple(params))
+    page = cursor.fetchall()
+
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        last = page[-1]
+        next_cursor = f"{last['departure_dt'].isoformat()}_{last['order_id']}"
+
+    order_ids = [o["order_id"] for o in page]
+    seats_by_order = {oid: [] for oid in order_ids}
+    if order_ids:
+        fmt = ",".join(["%s"] * len(order_ids))
+        cursor.execute(f"""
+            SELECT
+                oi.order_id,
+                s.row_num,
+                s.column_number,
+                s.class_type
             FROM OrderItem oi
             JOIN FlightSeat fs ON fs.flight_seat_id = oi.flight_seat_id
             JOIN Seat s ON s.seat_id = fs.seat_id
-            WHERE oi.order_id=%s
-            ORDER BY s.row_num, s.column_number
-        """, (order_id,))
-        seats = cursor.fetchall()
+            WHERE oi.order_id IN ({fmt})
+            ORDER BY oi.order_id, s.row_num, s.column_number
+        """, tuple(order_ids))
+        for r in cursor.fetchall():
+            seats_by_order[r["order_id"]].append(r)
+
+    return page, seats_by_order, next_cursor
+
+
+def order_status_counts(cursor, email):
+    '''
+    מספר ההזמנות של הלקוח בכל לשונית סטטוס (וסה"כ ב-"all"), בשאילתה מקובצת אחת
+    '''
+    cursor.execute(f"""
+        SELECT
+            CASE
+              WHEN fo.status='paid' AND f.status <> 'cancelled' AND fo.departure_dt < %s THEN 'done'
+              ELSE {orders.EFFECTIVE_STATUS_SQL}
+            END AS tab,
+            COUNT(*) AS n
+        FROM FlightOrder fo
+        JOIN Flight f ON f.flight_id = fo.flight_id
+        WHERE fo.email=%s
+        GROUP BY tab
+    """, (datetime.now(), email))
+    counts = {tab: 0 for tab in ORDER_STATUS_TABS}
+    for r in cursor.fetchall():
+        counts[r["tab"]] = counts.get(r["tab"], 0) + int(r["n"])
+    counts["all"] = sum(counts.values())
+    return counts
+
+
+def _is_registered(cursor, email):
+    cursor.execute("SELECT 1 FROM RegisteredCustomer WHERE email=%s", (email,))
+    return cursor.fetchone() is not None
 
-    return render_template("order_success.html", order=order, seats=seats)
 
 @app.route("/my_orders")
 def my_orders():
     '''
     מאפשר לראות את היסטוריות ההזמנות של המשתמש, עם סטטוס הטיסה
+    ההזמנות מוצגות בעמודים של ORDERS_PAGE_SIZE (after = הסמן של סוף העמוד הקודם)
     '''
     email = session.get("user_email")
     if not email:
         return redirect("/login")
 
-    status_filter = request.args.get("status", "").strip()  
+    status_filter = request.args.get("status", "").strip()
+    after = _parse_orders_cursor(request.args.get("after", ""))
 
     with db_cur() as cursor:
-        cursor.execute("SELECT 1 FROM RegisteredCustomer WHERE email=%s", (email,))
-        if not cursor.fetchone():
+        if not _is_registered(cursor, email):
             # אם בעתיד יהיה מצב של "מחובר כאורח" - כאן נחסום
             return redirect("/")
 
-        base_query = """
-            SELECT
-                fo.order_id,
-                fo.flight_id,
-                fo.email,
-                fo.execution_date,
-                fo.status,
-                fo.total_payment,
-                f.origin_airport,
-                f.destination_airport,
-                f.departure_date,
-                f.departure_time,
-                TIMESTAMP(f.departure_date, f.departure_time) AS departure_dt
-            FROM FlightOrder fo
-            JOIN Flight f ON f.flight_id = fo.flight_id
-            WHERE fo.email=%s
-        """
-        params = [email]
-
-        if status_filter == "done":
-            # Done = paid orders where the flight already departed
-            base_query += """
-                AND fo.status='paid'
-                AND TIMESTAMP(f.departure_date, f.departure_time) < %s
-            """
-            params.append(datetime.now())
+        counts = order_status_counts(cursor, email)
+        page, seats_by_order, next_cursor = orders_page(
+            cursor, email, status_filter, after, ORDERS_PAGE_SIZE
+        )
 
-        elif status_filter == "paid":
-            # Active = paid orders where the flight is in the future
-            base_query += """
-                AND fo.status='paid'
-                AND TIMESTAMP(f.departure_date, f.departure_time) >= %s
-            """
-            params.append(datetime.now())
-
-        elif status_filter:
-            # other statuses: customer_cancelled / system_cancelled / etc.
-            base_query += " AND fo.status=%s"
-            params.append(status_filter)
-
-        base_query += " ORDER BY departure_dt DESC"
-
-        cursor.execute(base_query, tuple(params))
-        orders = cursor.fetchall()
-
-        order_ids = [o["order_id"] for o in orders]
-        seats_by_order = {oid: [] for oid in order_ids}
-        if order_ids:
-            fmt = ",".join(["%s"] * len(order_ids))
-            cursor.execute(f"""
-                SELECT
-                    oi.order_id,
-                    s.row_num,
-                    s.column_number,
-                    s.class_type
-                FROM OrderItem oi
-                JOIN FlightSeat fs ON fs.flight_seat_id = oi.flight_seat_id
-                JOIN Seat s ON s.seat_id = fs.seat_id
-                WHERE oi.order_id IN ({fmt})
-                ORDER BY oi.order_id, s.row_num, s.column_number
-            """, tuple(order_ids))
-            for r in cursor.fetchall():
-                seats_by_order[r["order_id"]].append(r)
+    base_args = {"status": status_filter} if status_filter else {}
+    next_url = None
+    if next_cursor:
+        next_url = "/my_orders?" + urlencode({**base_args, "after": next_cursor})
 
     return render_template(
         "my_orders.html",
-        orders=orders,
+        orders=page,
         seats_by_order=seats_by_order,
         status_filter=status_filter,
+        counts=counts,
+        next_url=next_url,
+        first_url=("/my_orders?" + urlencode(base_args)) if after else None,
         now=datetime.now()
     )
 
+
+@app.route("/my_orders/counts")
+def my_orders_counts():
+    '''
+    מספר ההזמנות בכל לשונית סטטוס (JSON) - all / paid / done / customer_cancelled / system_cancelled
+    '''
+    email = session.get("user_email")
+    if not email:
+        return jsonify({"errors": ["Login required"]}), 401
+
+    with db_cur() as cursor:
+        if not _is_registered(cursor, email):
+            return jsonify({"errors": ["Login required"]}), 401
+        counts = order_status_counts(cursor, email)
+
+    return jsonify(counts)
+
 @app.route("/order_lookup", methods=["GET", "POST"])
 def order_lookup():
     '''
@@ -319,32 +490,11 @@ def order_lookup():
     if not email or not order_id:
         return render_template("order_lookup.html", error="Please enter both email and order code.", order=None, seats=[])
 
-    with db_cur() as cursor:
-        cursor.execute("""
-            SELECT
-                fo.order_id, fo.flight_id, fo.email, fo.execution_date, fo.status, fo.total_payment,
-                f.origin_airport, f.destination_airport, f.departure_date, f.departure_time,
-                TIMESTAMP(f.departure_date, f.departure_time) AS departure_dt
-            FROM FlightOrder fo
-            JOIN Flight f ON f.flight_id = fo.flight_id
-            WHERE fo.order_id=%s AND fo.email=%s
-        """, (order_id, email))
-        order = cursor.fetchone()
+    order = orders.get_order(order_id, email)
+    if not order:
+        return render_template("order_lookup.html", error="Order not found.", order=None, seats=[])
 
-        if not order:
-            return render_template("order_lookup.html", error="Order not found.", order=None, seats=[])
-
-        cursor.execute("""
-            SELECT s.row_num, s.column_number, s.class_type
-            FROM OrderItem oi
-            JOIN FlightSeat fs ON fs.flight_seat_id = oi.flight_seat_id
-            JOIN Seat s ON s.seat_id = fs.seat_id
-            WHERE oi.order_id=%s
-            ORDER BY s.row_num, s.column_number
-        """, (order_id,))
-        seats = cursor.fetchall()
-
-    return render_template("order_lookup.html", error=None, order=order, seats=seats, now=datetime.now())
+    return render_template("order_lookup.html", error=None, order=order, seats=order["seats"], now=datetime.now())
 
 
 @app.route("/cancel_order", methods=["POST"])
@@ -361,21 +511,13 @@ def cancel_order():
         return redirect("/")
 
     with db_cur() as cursor:
-        cursor.execute("""
-            SELECT
-                fo.order_id, fo.email, fo.status, fo.total_payment,
-                f.departure_date, f.departure_time,
-                TIMESTAMP(f.departure_date, f.departure_time) AS departure_dt
-            FROM FlightOrder fo
-            JOIN Flight f ON f.flight_id = fo.flight_id
-            WHERE fo.order_id=%s AND fo.email=%s
-        """, (order_id, email))
-        order = cursor.fetchone()
+        # קריאה טרייה (לא מהמטמון) - הסטטוס והסכום קובעים אם מותר לבטל
+        order = orders.load_order(cursor, order_id, email)
 
         if not order:
             return redirect("/order_lookup")
 
-        # אפשר לבטל רק הזמנה פעילה
+        # אפשר לבטל רק הזמנה פעילה (הזמנה של טיסה שבוטלה כבר מוצגת כ-system_cancelled)
         if order["status"] != "paid":
             return redirect(f"/order_success?order_id={order_id}&email={email}")
 
@@ -394,20 +536,47 @@ def cancel_order():
         # דמי ביטול: 5% מסך העלות
         fee = float(order["total_payment"]) * 0.05
 
-        # 1) משחררים את כל המושבים של ההזמנה
-        cursor.execute("""
-            UPDATE FlightSeat fs
-            JOIN OrderItem oi ON oi.flight_seat_id = fs.flight_seat_id
-            SET fs.status='available'
-            WHERE oi.order_id=%s
-        """, (order_id,))
-
-        # 2) מעדכנים סטטוס + total_payment לדמי ביטול (הלקוח "שילם" רק 5%)
+    # ביטול בטרנזקציה אחת: סטטוס ההזמנה, שחרור המושבים ועדכון מוני המושבים
+    with db_tx() as cursor:
+        # הבדיקה של סטטוס הטיסה נעשית כאן, תחת נעילה: אם החברה ביטלה את הטיסה בינתיים,
+        # ההזמנה נשארת לעבודת הביטול (החזר מלא) ולא מחויבת בדמי ביטול
         cursor.execute("""
-            UPDATE FlightOrder
-            SET status='customer_cancelled', total_payment=%s
-            WHERE order_id=%s
+            UPDATE FlightOrder fo
+            JOIN Flight f ON f.flight_id = fo.flight_id
+            SET fo.status='customer_cancelled', fo.total_payment=%s
+            WHERE fo.order_id=%s AND fo.status='paid' AND f.status <> 'cancelled'
         """, (fee, order_id))
+        # ההזמנה כבר בוטלה במקביל (או שהטיסה בוטלה) - אין מה לשחרר
+        cancelled = cursor.rowcount == 1
+
+        released = []
+        if cancelled:
+            cursor.execute("""
+                SELECT fs.flight_seat_id, s.class_type
+                FROM OrderItem oi
+                JOIN FlightSeat fs ON fs.flight_seat_id = oi.flight_seat_id
+                JOIN Seat s ON s.seat_id = fs.seat_id
+                WHERE oi.order_id=%s
+                FOR UPDATE
+            """, (order_id,))
+            released = cursor.fetchall()
+
+            # משחררים את כל המושבים של ההזמנה
+            cursor.execute("""
+                UPDATE FlightSeat fs
+                JOIN OrderItem oi ON oi.flight_seat_id = fs.flight_seat_id
+                SET fs.status='available'
+                WHERE oi.order_id=%s
+            """, (order_id,))
+
+            seat_counters.apply_release(cursor, order["flight_id"], seat_counters.count_by_class(released))
+            report_rollups.mark_order(cursor, order_id)
+
+    orders.forget([order_id])
+    seatmap.mark_available(order["flight_id"], [r["flight_seat_id"] for r in released])
+    if released:
+        # טיסה שהייתה מלאה עשויה לחזור לתוצאות החיפוש
+        invalidate_route_search(order["origin_airport"], order["destination_airport"])
 
     # אחרי ביטול נחזור למסך
     if session.get("user_email"):
@@ -415,7 +584,103 @@ def cancel_order():
     return redirect("/order_lookup")
 
 
-from flights import flights_bp
+@app.cli.command("reconcile-seat-counters")
+@click.option("--fix", is_flag=True, help="Rewrite mismatched counters from FlightSeat.")
+def reconcile_seat_counters_command(fix):
+    '''
+    בודקת את מוני המושבים (FlightClassAvailability) מול FlightSeat, ומתקנת אותם עם --fix
+    '''
+    with db_tx() as cursor:
+        mismatches = seat_counters.reconcile(cursor, fix=fix)
+
+    for m in mismatches:
+        click.echo(
+            f"flight {m['flight_id']} {m['class_type']}: "
+            f"stored {m['stored_available']}/{m['stored_booked']} "
+            f"actual {m['actual_available']}/{m['actual_booked']} (available/booked)"
+        )
+    click.echo(f"{len(mismatches)} mismatched counter(s)" + (" fixed." if fix and mismatches else "."))
+
+
+
+@app.cli.command("rebuild-resource-timeline")
+def rebuild_resource_timeline_command():
+    '''
+    בונה מחדש את ResourceTimeline מלוח הטיסות (למשל אחרי שינוי משך של נתיב)
+    '''
+    with db_tx() as cursor:
+        n = availability.rebuild_timeline(cursor)
+    availability.schedule_index.invalidate()
+    click.echo(f"{n} timeline row(s) written.")
+
+
+@app.cli.command("refresh-report-rollups")
+@click.option("--all", "rebuild_all", is_flag=True, help="Recompute every day, not only the changed ones.")
+def refresh_report_rollups_command(rebuild_all):
+    '''
+    מחשבת מחדש את טבלאות הסיכום של הדוחות לימים שהשתנו (מיועד להרצה לילית), או לכל הימים עם --all
+    '''
+    if rebuild_all:
+        with db_tx() as cursor:
+            report_rollups.mark_all(cursor)
+    n = report_rollups.refresh_pending()
+    click.echo(f"{n} day(s) recomputed.")
+
+
+@app.cli.command("rebuild-plane-activity")
+def rebuild_plane_activity_command():
+    '''
+    בונה מחדש את הפעילות החודשית של המטוסים (PlaneMonthActivity) מלוח הטיסות
+    '''
+    with db_tx() as cursor:
+        n = report_rollups.rebuild_activity(cursor)
+    click.echo(f"{n} plane-month row(s) written.")
+
+
+@app.cli.command("process-cancellations")
+def process_cancellations_command():
+    '''
+    מריצה עד הסוף את עבודות ביטול הטיסות שלא הסתיימו (למשל אחרי הפעלה מחדש של השרת)
+    '''
+    import flight_cancellation
+
+    with db_cur() as cursor:
+        flight_ids = flight_cancellation.unfinished_jobs(cursor)
+    for flight_id in flight_ids:
+        ok = flight_cancellation.run_job(flight_id)
+        click.echo(f"flight {flight_id}: {'done' if ok else 'failed'}")
+    click.echo(f"{len(flight_ids)} job(s) processed.")
+
+
+@app.cli.command("import-schedule")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--dry-run", is_flag=True, help="Only plan the flights and report conflicts.")
+def import_schedule_command(path, dry_run):
+    '''
+    ייבוא לוח טיסות חוזרות מקובץ CSV / JSON (ראו schedule_import.PATTERN_FIELDS)
+    '''
+    import schedule_import
+
+    fmt = "json" if path.lower().endswith(".json") else "csv"
+    with open(path, encoding="utf-8") as f:
+        try:
+            patterns = schedule_import.parse_patterns(f.read(), fmt)
+            report = schedule_import.run_import(patterns, dry_run=dry_run)
+        except schedule_import.ScheduleImportError as e:
+            for err in e.errors:
+                click.echo(err, err=True)
+            raise SystemExit(1)
+
+    for c in report["conflicts"]:
+        click.echo(f"pattern {c['pattern']} {c['date'] or ''}: {c['reason']}")
+    click.echo(
+        f"{report['planned']} flight(s) planned, {report['created']} created, "
+        f"{report['existing']} already existed, "
+        f"{len(report['conflicts'])} conflict(s)."
+    )
+
+
+from flights import flights_bp, invalidate_route_search
 app.register_blueprint(flights_bp)
 
 from admin import admin_bp
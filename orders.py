@@ -0,0 +1,122 @@
+from cache import TTLCache
+
+# מודל קריאה של הזמנה (הזמנה + טיסה + מושבים) - נשמר לזמן קצר, ונכתב כבר בזמן ההזמנה
+# כך שדף האישור שאחרי ההזמנה לא ניגש למסד הנתונים
+ORDER_CACHE_TTL = 120
+
+order_cache = TTLCache(ttl=ORDER_CACHE_TTL)
+
+
+def _order_key(order_id):
+    return f"order:{int(order_id)}"
+
+
+# הזמנה פעילה של טיסה שבוטלה מוצגת כ-system_cancelled (החזר מלא) כבר מרגע הביטול,
+# גם לפני שעבודת הביטול (flight_cancellation) הגיעה אליה
+EFFECTIVE_STATUS_SQL = (
+    "CASE WHEN f.status = 'cancelled' AND LOWER(fo.status) IN ('paid','active') "
+    "THEN 'system_cancelled' ELSE fo.status END"
+)
+EFFECTIVE_PAYMENT_SQL = (
+    "CASE WHEN f.status = 'cancelled' AND LOWER(fo.status) IN ('paid','active') "
+    "THEN 0 ELSE fo.total_payment END"
+)
+
+
+# שורה לכל מושב בהזמנה (או שורה אחת עם מושב NULL אם אין פריטים) - הכל בסבב אחד מול המסד
+_ORDER_SQL = f"""
+    SELECT
+        fo.order_id, fo.flight_id, fo.email, fo.execution_date,
+        {EFFECTIVE_STATUS_SQL} AS status, {EFFECTIVE_PAYMENT_SQL} AS total_payment,
+        f.origin_airport, f.destination_airport, f.departure_date, f.departure_time, f.departure_dt,
+        fs.flight_seat_id, s.row_num, s.column_number, s.class_type
+    FROM FlightOrder fo
+    JOIN Flight f ON f.flight_id = fo.flight_id
+    LEFT JOIN OrderItem oi ON oi.order_id = fo.order_id
+    LEFT JOIN FlightSeat fs ON fs.flight_seat_id = oi.flight_seat_id
+    LEFT JOIN Seat s ON s.seat_id = fs.seat_id
+    WHERE fo.order_id=%s AND fo.email=%s
+    ORDER BY s.row_num, s.column_number
+"""
+
+_ORDER_FIELDS = (
+    "order_id", "flight_id", "email", "execution_date", "status", "total_payment",
+    "origin_airport", "destination_airport", "departure_date", "departure_time", "departure_dt",
+)
+_SEAT_FIELDS = ("flight_seat_id", "row_num", "column_number", "class_type")
+
+
+def _order_from_rows(rows):
+    '''
+    מקפלת את השורות של _ORDER_SQL להזמנה אחת עם רשימת מושבים (seats)
+    '''
+    if not rows:
+        return None
+    order = {k: rows[0][k] for k in _ORDER_FIELDS}
+    order["seats"] = [
+        {k: r[k] for k in _SEAT_FIELDS}
+        for r in rows
+        if r["flight_seat_id"] is not None
+    ]
+    return order
+
+
+def load_order(cursor, order_id, email):
+    '''
+    קוראת את ההזמנה מהמסד (בלי מטמון) ומעדכנת את המטמון; None אם אין הזמנה כזו לאימייל הזה
+    '''
+    cursor.execute(_ORDER_SQL, (order_id, email))
+    order = _order_from_rows(cursor.fetchall())
+    if order:
+        order_cache.set(_order_key(order_id), order)
+    return order
+
+
+def get_order(order_id, email):
+    '''
+    ההזמנה, הטיסה והמושבים שלה - מהמטמון, ובהחטאה בשאילתה אחת
+    '''
+    order = order_cache.get(_order_key(order_id))
+    if order is not None:
+        # כמו ההשוואה ב-MySQL (collation לא רגיש לאותיות)
+        return order if order["email"].casefold() == email.strip().casefold() else None
+
+    from main import db_cur
+
+    with db_cur() as cursor:
+        return load_order(cursor, order_id, email)
+
+
+def remember_booking(order_id, email, total_payment, flight, seat_rows, execution_date):
+    '''
+    שומרת במטמון את ההזמנה שנוצרה עכשיו, מהנתונים שכבר נקראו בטרנזקציה של ההזמנה
+    flight - שורת Flight (מקור, יעד, מועד המראה); seat_rows - המושבים שננעלו
+    '''
+    order = {
+        "order_id": order_id,
+        "flight_id": flight["flight_id"],
+        "email": email,
+        "execution_date": execution_date,
+        "status": "paid",
+        "total_payment": total_payment,
+        "origin_airport": flight["origin_airport"],
+        "destination_airport": flight["destination_airport"],
+        "departure_date": flight["departure_date"],
+        "departure_time": flight["departure_time"],
+        "departure_dt": flight["departure_dt"],
+        "seats": sorted(
+            ({k: r[k] for k in _SEAT_FIELDS} for r in seat_rows),
+            key=lambda s: (s["row_num"], s["column_number"]),
+        ),
+    }
+    order_cache.set(_order_key(order_id), order)
+    return order
+
+
+def forget(order_ids):
+    '''
+    מוחקת הזמנות מהמטמון - אחרי כל שינוי בסטטוס או בסכום שלהן
+    '''
+    for order_id in order_ids:
+        order_cache.delete(_order_key(order_id))
+
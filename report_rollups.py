@@ -0,0 +1,385 @@
+from datetime import date
+
+from airways import LONG_FLIGHT_MIN
+
+# כמה ימים מחושבים מחדש בכל סבב
+REFRESH_BATCH_DAYS = 31
+
+
+# טבלת סיכום -> (שאילתת מקור לימים נתונים, עמודות). {days} מוחלף ברשימת placeholders
+# שאילתות המקור הן קריאות רגילות (לא INSERT ... SELECT), כדי לא לקחת נעילות על FlightSeat / FlightOrder
+_ROLLUPS = {
+    "RollupFlightOccupancy": (
+        """
+        SELECT f.flight_id, f.departure_date AS day,
+               COUNT(*) AS total_seats,
+               SUM(CASE WHEN fs.status <> 'available' THEN 1 ELSE 0 END) AS taken_seats
+        FROM Flight f
+        JOIN FlightSeat fs ON fs.flight_id = f.flight_id
+        WHERE f.departure_date IN ({days})
+          AND f.status <> 'cancelled'
+        GROUP BY f.flight_id, f.departure_date
+        """,
+        ("flight_id", "day", "total_seats", "taken_seats"),
+    ),
+    "RollupRevenueDaily": (
+        """
+        SELECT f.departure_date AS day, f.plane_id, s.class_type,
+               SUM(
+                 CASE
+                   WHEN LOWER(fo.status) = 'system_cancelled' THEN 0
+                   WHEN LOWER(fo.status) = 'customer_cancelled' THEN fp.price * 0.05
+                   ELSE fp.price
+                 END
+               ) AS revenue
+        FROM Flight f
+        JOIN FlightSeat fs ON fs.flight_id = f.flight_id
+        JOIN Seat s ON s.seat_id = fs.seat_id
+        JOIN OrderItem oi ON oi.flight_seat_id = fs.flight_seat_id
+        JOIN FlightOrder fo ON fo.order_id = oi.order_id
+        JOIN FlightPricing fp
+          ON fp.flight_id = f.flight_id
+         AND fp.class_type = s.class_type
+        WHERE f.departure_date IN ({days})
+          AND f.status <> 'cancelled'
+        GROUP BY f.departure_date, f.plane_id, s.class_type
+        """,
+        ("day", "plane_id", "class_type", "revenue"),
+    ),
+    "RollupCrewMinutesDaily": (
+        """
+        SELECT f.departure_date AS day, fcp.id AS worker_id,
+               SUM(CASE WHEN aw.duration <= %s THEN aw.duration ELSE 0 END) AS short_minutes,
+               SUM(CASE WHEN aw.duration > %s THEN aw.duration ELSE 0 END) AS long_minutes
+        FROM Flight f
+        JOIN FlightCrewPlacement fcp ON fcp.flight_id = f.flight_id
+        JOIN Airway aw
+          ON aw.origin_airport = f.origin_airport
+         AND aw.destination_airport = f.destination_airport
+        WHERE f.departure_date IN ({days})
+          AND f.status <> 'cancelled'
+        GROUP BY f.departure_date, fcp.id
+        """,
+        ("day", "worker_id", "short_minutes", "long_minutes"),
+    ),
+    "RollupOrdersDaily": (
+        """
+        SELECT execution_date AS day,
+               COUNT(*) AS orders,
+               SUM(CASE WHEN LOWER(status) IN ('customer_cancelled', 'system_cancelled') THEN 1 ELSE 0 END)
+                 AS cancelled_orders
+        FROM FlightOrder
+        WHERE execution_date IN ({days})
+        GROUP BY execution_date
+        """,
+        ("day", "orders", "cancelled_orders"),
+    ),
+}
+
+
+def mark_flight(cursor, flight_id):
+    '''
+    מסמנת לחישוב מחדש את יום ההמראה של הטיסה ואת ימי הביצוע של ההזמנות שלה (יצירת טיסה / ביטול טיסה)
+    '''
+    cursor.execute(
+        """
+        INSERT INTO ReportRollupDirty (day)
+        SELECT departure_date FROM Flight WHERE flight_id=%s
+        UNION
+        SELECT execution_date FROM FlightOrder WHERE flight_id=%s
+        """,
+        (flight_id, flight_id),
+    )
+
+
+def mark_order(cursor, order_id):
+    '''
+    מסמנת לחישוב מחדש את יום ההמראה ואת יום ביצוע ההזמנה (הזמנה / ביטול הזמנה)
+    כל סימון הוא שורה חדשה (בלי מפתח ליום), כך שהזמנות לאותו יום לא ממתינות זו לזו
+    '''
+    cursor.execute(
+        """
+        INSERT INTO ReportRollupDirty (day)
+        SELECT f.departure_date FROM FlightOrder fo JOIN Flight f ON f.flight_id = fo.flight_id
+        WHERE fo.order_id=%s
+        UNION
+        SELECT execution_date FROM FlightOrder WHERE order_id=%s
+        """,
+        (order_id, order_id),
+    )
+
+
+def mark_all(cursor):
+    '''
+    מסמנת את כל הימים שיש בהם טיסות או הזמנות (בנייה מחדש של כל טבלאות הסיכום)
+    '''
+    cursor.execute(
+        """
+        INSERT INTO ReportRollupDirty (day)
+        SELECT departure_date FROM Flight
+        UNION
+        SELECT execution_date FROM FlightOrder
+        """
+    )
+
+
+class MarksClaimed(Exception):
+    '''
+    רענון אחר כבר מחק חלק מהסימונים שנקראו - החישוב הזה אולי ישן יותר, ולכן לא נשמר
+    '''
+
+
+def pending_marks(cursor, date_from=None, date_to=None, limit=REFRESH_BATCH_DAYS):
+    '''
+    קריאה בלי נעילות של הסימונים של עד limit ימים (בטווח, אם נתון)
+    מחזירה (days, mark_ids) - ממוינים
+    '''
+    cursor.execute(
+        """
+        SELECT d.mark_id, d.day
+        FROM ReportRollupDirty d
+        JOIN (
+          SELECT DISTINCT day FROM ReportRollupDirty
+          WHERE day BETWEEN %s AND %s
+          ORDER BY day
+          LIMIT %s
+        ) x ON x.day = d.day
+        ORDER BY d.mark_id
+        """,
+        (date_from or date.min, date_to or date.max, limit),
+    )
+    rows = cursor.fetchall()
+    return sorted({r["day"] for r in rows}), [r["mark_id"] for r in rows]
+
+
+def compute_days(cursor, days):
+    '''
+    מריצה את שאילתות המקור לימים הנתונים (קריאות רגילות, בלי נעילות); מחזירה {טבלה: שורות}
+    '''
+    fmt = ",".join(["%s"] * len(days))
+    computed = {}
+    for table, (select_sql, _) in _ROLLUPS.items():
+        params = tuple(days)
+        if table == "RollupCrewMinutesDaily":
+            params = (LONG_FLIGHT_MIN, LONG_FLIGHT_MIN) + params
+        cursor.execute(select_sql.format(days=fmt), params)
+        computed[table] = cursor.fetchall()
+    return computed
+
+
+def store_days(cursor, days, computed, mark_ids):
+    '''
+    בטרנזקציה קצרה: מוחקת את הסימונים שנקראו וכותבת את התוצאות שחושבו במקום השורות של הימים
+    זורקת MarksClaimed אם רענון אחר כבר מחק חלק מהסימונים (וה-rollback משאיר את השאר)
+    סימונים חדשים יותר לאותם ימים לא נמחקים - הם יחושבו בפעם הבאה
+    '''
+    if mark_ids:
+        cursor.execute(
+            f"DELETE FROM ReportRollupDirty WHERE mark_id IN ({','.join(['%s'] * len(mark_ids))})",
+            tuple(mark_ids),
+        )
+        if cursor.rowcount != len(mark_ids):
+            raise MarksClaimed()
+
+    fmt = ",".join(["%s"] * len(days))
+    for table, (_, columns) in _ROLLUPS.items():
+        cursor.execute(f"DELETE FROM {table} WHERE day IN ({fmt})", tuple(days))
+        rows = computed[table]
+        if rows:
+            cursor.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})",
+                [tuple(r[c] for c in columns) for r in rows],
+            )
+
+
+def refresh_dirty(date_from=None, date_to=None, limit=REFRESH_BATCH_DAYS):
+    '''
+    מחשבת מחדש עד limit ימים מסומנים (בטווח, אם נתון); מחזירה כמה ימים נקראו
+    הקריאה והחישוב רצים בלי נעילות, ורק הכתיבה בטרנזקציה - הזמנות לא ממתינות לדוח
+    '''
+    from main import db_cur, db_tx
+
+    with db_cur() as cursor:
+        days, mark_ids = pending_marks(cursor, date_from, date_to, limit)
+        if not days:
+            return 0
+        computed = compute_days(cursor, days)
+
+    try:
+        with db_tx() as cursor:
+            store_days(cursor, days, computed, mark_ids)
+    except MarksClaimed:
+        pass
+    return len(days)
+
+
+def refresh_pending(date_from=None, date_to=None):
+    '''
+    מחשבת מחדש את כל הימים המסומנים בטווח, REFRESH_BATCH_DAYS ימים בכל סבב
+    '''
+    total = 0
+    while True:
+        n = refresh_dirty(date_from, date_to)
+        total += n
+        if n < REFRESH_BATCH_DAYS:
+            return total
+
+
+# ---------------------------------------------------------
+# פעילות חודשית לכל מטוס (PlaneMonthActivity) - מתעדכנת בהפרשים בתוך הטרנזקציה של יצירת / ביטול טיסה
+# החודש הוא חודש ההמראה; ימי פעילות = יום ההמראה ויום הנחיתה (אם שונה), בלי כפילויות
+# ---------------------------------------------------------
+
+_ACTIVITY_FLIGHT_SQL = """
+    SELECT f.plane_id, f.departure_date, f.origin_airport, f.destination_airport,
+           DATE(DATE_ADD(f.departure_dt, INTERVAL a.duration MINUTE)) AS arrival_date
+    FROM Flight f
+    JOIN Airway a
+      ON a.origin_airport = f.origin_airport
+     AND a.destination_airport = f.destination_airport
+    WHERE f.flight_id = %s
+"""
+
+# דירוג הנתיבים של מטוס בחודש: הכי הרבה טיסות שבוצעו, ובשוויון לפי שם הנתיב
+_RANK_ROUTES_SQL = """
+    UPDATE PlaneMonthRoute r
+    JOIN (
+      SELECT plane_id, month, origin_airport, destination_airport,
+             ROW_NUMBER() OVER (
+               PARTITION BY plane_id, month
+               ORDER BY performed_flights DESC, origin_airport, destination_airport
+             ) AS route_rank
+      FROM PlaneMonthRoute
+      WHERE {scope}
+    ) x
+      ON x.plane_id = r.plane_id
+     AND x.month = r.month
+     AND x.origin_airport = r.origin_airport
+     AND x.destination_airport = r.destination_airport
+    SET r.route_rank = x.route_rank
+"""
+
+_CLOSE_ACTIVITY_SQL = """
+    UPDATE PlaneMonthActivity a
+    SET a.active_days = (
+          SELECT COUNT(*) FROM PlaneActiveDay d
+          WHERE d.plane_id = a.plane_id AND d.month = a.month
+        ),
+        a.dominant_route = (
+          SELECT CONCAT(r.origin_airport, '-', r.destination_airport) FROM PlaneMonthRoute r
+          WHERE r.plane_id = a.plane_id AND r.month = a.month
+            AND r.route_rank = 1 AND r.performed_flights > 0
+        )
+    WHERE {scope}
+"""
+
+
+def _apply_activity(cursor, flight_id, performed, cancelled):
+    cursor.execute(_ACTIVITY_FLIGHT_SQL, (flight_id,))
+    f = cursor.fetchone()
+    if not f:
+        return
+    key = (f["plane_id"], f["departure_date"].replace(day=1))
+
+    # השורה החודשית ננעלת ראשונה - שני עדכונים לאותו מטוס וחודש עוברים אחד אחרי השני
+    cursor.execute(
+        """
+        INSERT INTO PlaneMonthActivity (plane_id, month, performed_flights, cancelled_flights, active_days)
+        VALUES (%s, %s, %s, %s, 0)
+        ON DUPLICATE KEY UPDATE
+          performed_flights = performed_flights + VALUES(performed_flights),
+          cancelled_flights = cancelled_flights + VALUES(cancelled_flights)
+        """,
+        key + (performed, cancelled),
+    )
+    cursor.execute(
+        """
+        INSERT INTO PlaneMonthRoute
+          (plane_id, month, origin_airport, destination_airport, performed_flights, cancelled_flights, route_rank)
+        VALUES (%s, %s, %s, %s, %s, %s, 0)
+        ON DUPLICATE KEY UPDATE
+          performed_flights = performed_flights + VALUES(performed_flights),
+          cancelled_flights = cancelled_flights + VALUES(cancelled_flights)
+        """,
+        key + (f["origin_airport"], f["destination_airport"], performed, cancelled),
+    )
+    for day in sorted({f["departure_date"], f["arrival_date"]}):
+        cursor.execute(
+            """
+            INSERT INTO PlaneActiveDay (plane_id, month, day, flights)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE flights = flights + VALUES(flights)
+            """,
+            key + (day, performed),
+        )
+    cursor.execute("DELETE FROM PlaneActiveDay WHERE plane_id=%s AND month=%s AND flights <= 0", key)
+
+    cursor.execute(_RANK_ROUTES_SQL.format(scope="plane_id = %s AND month = %s"), key)
+    cursor.execute(_CLOSE_ACTIVITY_SQL.format(scope="a.plane_id = %s AND a.month = %s"), key)
+
+
+def activity_add_flight(cursor, flight_id):
+    '''
+    מוסיפה טיסה חדשה לפעילות החודשית של המטוס - בסוף יצירת טיסה
+    '''
+    _apply_activity(cursor, flight_id, 1, 0)
+
+
+def activity_cancel_flight(cursor, flight_id):
+    '''
+    מעבירה טיסה מ"בוצעה" ל"בוטלה" בפעילות החודשית של המטוס - בביטול טיסה (פעם אחת לכל טיסה)
+    '''
+    _apply_activity(cursor, flight_id, -1, 1)
+
+
+def rebuild_activity(cursor):
+    '''
+    בונה מחדש את PlaneMonthActivity / PlaneMonthRoute / PlaneActiveDay מלוח הטיסות
+    '''
+    for table in ("PlaneActiveDay", "PlaneMonthRoute", "PlaneMonthActivity"):
+        cursor.execute(f"DELETE FROM {table}")
+
+    cursor.execute(
+        """
+        INSERT INTO PlaneMonthRoute
+          (plane_id, month, origin_airport, destination_airport, performed_flights, cancelled_flights, route_rank)
+        SELECT plane_id, DATE_FORMAT(departure_date, '%Y-%m-01'), origin_airport, destination_airport,
+               SUM(CASE WHEN status <> 'cancelled' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN status = 'cancelled' THEN 1 ELSE 0 END), 0
+        FROM Flight
+        GROUP BY plane_id, DATE_FORMAT(departure_date, '%Y-%m-01'), origin_airport, destination_airport
+        """
+    )
+    cursor.execute(
+        """
+        INSERT INTO PlaneActiveDay (plane_id, month, day, flights)
+        SELECT d.plane_id, d.month, d.day, COUNT(*)
+        FROM (
+          SELECT f.plane_id, DATE_FORMAT(f.departure_date, '%Y-%m-01') AS month, f.departure_date AS day
+          FROM Flight f
+          WHERE f.status <> 'cancelled'
+          UNION ALL
+          SELECT f.plane_id, DATE_FORMAT(f.departure_date, '%Y-%m-01'),
+                 DATE(DATE_ADD(f.departure_dt, INTERVAL a.duration MINUTE))
+          FROM Flight f
+          JOIN Airway a
+            ON a.origin_airport = f.origin_airport
+           AND a.destination_airport = f.destination_airport
+          WHERE f.status <> 'cancelled'
+            AND DATE(DATE_ADD(f.departure_dt, INTERVAL a.duration MINUTE)) <> f.departure_date
+        ) d
+        GROUP BY d.plane_id, d.month, d.day
+        """
+    )
+    cursor.execute(
+        """
+        INSERT INTO PlaneMonthActivity (plane_id, month, performed_flights, cancelled_flights, active_days)
+        SELECT plane_id, month, SUM(performed_flights), SUM(cancelled_flights), 0
+        FROM PlaneMonthRoute
+        GROUP BY plane_id, month
+        """
+    )
+    cursor.execute(_RANK_ROUTES_SQL.format(scope="1 = 1"))
+    cursor.execute(_CLOSE_ACTIVITY_SQL.format(scope="1 = 1"))
+    cursor.execute("SELECT COUNT(*) AS n FROM PlaneMonthActivity")
+    return int(cursor.fetchone()["n"])
@@ -0,0 +1,273 @@
+import calendar
+import csv
+import io
+from datetime import date
+
+# כמה שורות נשלפות מהסמן בכל פעם בייצוא, וכמה שורות בכל row group של Parquet
+EXPORT_FETCH_SIZE = 1000
+PARQUET_ROW_GROUP = 10_000
+
+
+# כל דוח: כותרת, עמודות (עם טיפוס לייצוא) ושאילתה על טבלאות הסיכום (פרמטרים: date_from, date_to)
+REPORTS = {
+    "avg_occupancy_completed": {
+        "title": "Average Occupancy (Completed Flights)",
+        "subtitle": "Average occupancy percent for flights that already departed (not cancelled).",
+        "columns": [
+            {"key": "avg_occupancy_percent", "label": "Avg Occupancy (%)", "type": "float"},
+        ],
+        "sql": """
+            SELECT ROUND(AVG(r.taken_seats * 100.0 / r.total_seats), 2) AS avg_occupancy_percent
+            FROM RollupFlightOccupancy r
+            WHERE r.day BETWEEN %s AND %s
+        """,
+    },
+    "revenue_plane_size_manu_class": {
+        "title": "Revenue by Plane Size / Manufacturer / Class (Completed Flights)",
+        "subtitle": "Revenue breakdown for flights that already departed (not cancelled).",
+        "columns": [
+            {"key": "plane_size", "label": "Plane Size", "type": "str"},
+            {"key": "manufacturer", "label": "Manufacturer", "type": "str"},
+            {"key": "class_type", "label": "Class", "type": "str"},
+            {"key": "revenue", "label": "Revenue", "type": "float"},
+        ],
+        "sql": """
+            SELECT
+              CASE WHEN bp.plane_id IS NOT NULL THEN 'Big' ELSE 'Small' END AS plane_size,
+              p.manufacturer AS manufacturer,
+              r.class_type AS class_type,
+              ROUND(SUM(r.revenue), 2) AS revenue
+            FROM RollupRevenueDaily r
+            JOIN Plane p ON p.plane_id = r.plane_id
+            LEFT JOIN BigPlane bp ON bp.plane_id = r.plane_id
+            WHERE r.day BETWEEN %s AND %s
+            GROUP BY plane_size, manufacturer, class_type
+            ORDER BY plane_size, manufacturer, class_type
+        """,
+    },
+    "crew_hours_long_short": {
+        "title": "Crew Flight Hours (Short vs Long) — Completed Flights",
+        "subtitle": "Total accumulated flight minutes per worker, split by short/long, "
+                    "for flights that already departed (not cancelled).",
+        "columns": [
+            {"key": "worker_id", "label": "Worker ID", "type": "int"},
+            {"key": "full_name", "label": "Name", "type": "str"},
+            {"key": "role", "label": "Role", "type": "str"},
+            {"key": "short_minutes", "label": "Short Minutes", "type": "int"},
+            {"key": "long_minutes", "label": "Long Minutes", "type": "int"},
+            {"key": "total_minutes", "label": "Total Minutes", "type": "int"},
+        ],
+        "sql": """
+            SELECT
+              w.id AS worker_id,
+              CONCAT(w.first_name, ' ', w.last_name) AS full_name,
+              CASE
+                WHEN pl.id IS NOT NULL THEN 'Pilot'
+                WHEN fa.id IS NOT NULL THEN 'Flight Attendant'
+                ELSE 'AirCrew'
+              END AS role,
+              SUM(r.short_minutes) AS short_minutes,
+              SUM(r.long_minutes) AS long_minutes,
+              SUM(r.short_minutes + r.long_minutes) AS total_minutes
+            FROM RollupCrewMinutesDaily r
+            JOIN Worker w ON w.id = r.worker_id
+            JOIN AirCrew ac ON ac.id = w.id
+            LEFT JOIN Pilot pl ON pl.id = w.id
+            LEFT JOIN FlightAttendant fa ON fa.id = w.id
+            WHERE r.day BETWEEN %s AND %s
+            GROUP BY w.id, w.first_name, w.last_name, role
+            ORDER BY total_minutes DESC
+        """,
+    },
+    "purchase_cancel_rate_monthly": {
+        "title": "Purchase Cancellation Rate (Monthly)",
+        "subtitle": "Cancellation rate of orders by month (by execution date).",
+        "columns": [
+            {"key": "year", "label": "Year", "type": "int"},
+            {"key": "month", "label": "Month", "type": "str"},
+            {"key": "cancellation_rate_percentage", "label": "Cancel Rate (%)", "type": "float"},
+        ],
+        "sql": """
+            SELECT
+              YEAR(r.day) AS year,
+              MONTH(r.day) AS month_num,
+              MONTHNAME(r.day) AS month,
+              ROUND(SUM(r.cancelled_orders) * 100.0 / SUM(r.orders), 2) AS cancellation_rate_percentage
+            FROM RollupOrdersDaily r
+            WHERE r.day BETWEEN %s AND %s
+            GROUP BY YEAR(r.day), MONTH(r.day), MONTHNAME(r.day)
+            ORDER BY year, month_num
+        """,
+    },
+    "monthly_plane_activity": {
+        "title": "Monthly Plane Activity Summary",
+        "subtitle": "Per aircraft and month: performed and cancelled flights, active days (departure or arrival), "
+                    "utilization % (active days out of 30) and dominant route.",
+        # הדוח נשמר לפי חודש - הטווח מורחב לחודשים שלמים (ראו month_range)
+        "whole_months": True,
+        "columns": [
+            {"key": "plane_id", "label": "Plane ID", "type": "int"},
+            {"key": "manufacturer", "label": "Manufacturer", "type": "str"},
+            {"key": "flight_month", "label": "Month", "type": "str"},
+            {"key": "performed_flights", "label": "Performed (Completed)", "type": "int"},
+            {"key": "cancelled_flights", "label": "Cancelled", "type": "int"},
+            {"key": "active_days", "label": "Active Days", "type": "int"},
+            {"key": "dominant_route", "label": "Dominant Route", "type": "str"},
+            {"key": "utilization_percentage", "label": "Utilization (%)", "type": "float"},
+        ],
+        # PlaneMonthActivity מתעדכנת ביצירת / ביטול טיסה - הדוח הוא קריאה ישירה
+        "sql": """
+            SELECT
+              a.plane_id,
+              p.manufacturer,
+              DATE_FORMAT(a.month, '%Y-%m') AS flight_month,
+              a.performed_flights,
+              a.cancelled_flights,
+              a.active_days,
+              a.dominant_route,
+              ROUND(a.active_days / 30.0 * 100, 1) AS utilization_percentage
+            FROM PlaneMonthActivity a
+            JOIN Plane p ON p.plane_id = a.plane_id
+            WHERE a.month BETWEEN DATE_FORMAT(%s, '%Y-%m-01') AND %s
+            ORDER BY a.month DESC, a.performed_flights DESC, a.plane_id
+        """,
+    },
+}
+
+
+def _fetch_iter(cursor, size=EXPORT_FETCH_SIZE):
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
+
+
+def discard_rest(cursor, size=EXPORT_FETCH_SIZE):
+    '''
+    קוראת ומשליכה את שארית התוצאה של סמן לא-buffered (למשל כשהלקוח התנתק באמצע ייצוא)
+    '''
+    while cursor.fetchmany(size):
+        pass
+
+
+def _typed(value, kind):
+    if value is None:
+        return None
+    if kind == "int":
+        return int(value)
+    if kind == "float":
+        return float(value)
+    return str(value)
+
+
+def month_range(date_from, date_to):
+    '''
+    מרחיבה טווח תאריכים (YYYY-MM-DD) לחודשים שלמים: מה-1 בחודש של date_from עד סוף החודש של date_to
+    תאריך לא תקין מוחזר כמו שהוא
+    '''
+    try:
+        start, end = date.fromisoformat(date_from), date.fromisoformat(date_to)
+    except (TypeError, ValueError):
+        return date_from, date_to
+    end = end.replace(day=calendar.monthrange(end.year, end.month)[1])
+    return start.replace(day=1).isoformat(), end.isoformat()
+
+
+def report_range(name, date_from, date_to):
+    '''
+    הטווח שהדוח באמת מכסה - לדוחות חודשיים (whole_months) החודשים השלמים, כך שהתצוגה והייצוא מציגים אותו
+    '''
+    if REPORTS[name].get("whole_months"):
+        return month_range(date_from, date_to)
+    return date_from, date_to
+
+
+def iter_rows(cursor, name, date_from, date_to):
+    '''
+    מריצה את הדוח ומחזירה את השורות אחת-אחת, עם ערכים טיפוסיים (int / float / str) לפי העמודות
+    עם סמן לא-buffered השורות לא נטענות לזיכרון כולן - זה מה שמאפשר ייצוא בזיכרון קבוע
+    '''
+    spec = REPORTS[name]
+    cursor.execute(spec["sql"], (date_from, date_to))
+    columns = [(c["key"], c["type"]) for c in spec["columns"]]
+    for r in _fetch_iter(cursor):
+        yield {key: _typed(r.get(key), kind) for key, kind in columns}
+
+
+def csv_chunks(rows, columns, chunk_rows=EXPORT_FETCH_SIZE):
+    '''
+    ממירה שורות ל-CSV בחתיכות (str), כותרת לפי label
+    '''
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow([c["label"] for c in columns])
+    keys = [c["key"] for c in columns]
+    n = 0
+    for r in rows:
+        writer.writerow(["" if r[k] is None else r[k] for k in keys])
+        n += 1
+        if n % chunk_rows == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+class _ChunkSink:
+    '''
+    יעד כתיבה ל-ParquetWriter שאוסף את הבתים עד שהמחולל שולח אותם ללקוח
+    '''
+
+    def __init__(self):
+        self.chunks = []
+        self.pos = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def parquet_chunks(rows, columns, row_group=PARQUET_ROW_GROUP):
+    '''
+    ממירה שורות ל-Parquet בזרימה - row group לכל row_group שורות, עם עמודות טיפוסיות (int64 / float64 / string)
+    דורש pyarrow (תלות אופציונלית)
+    '''
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {"int": pa.int64(), "float": pa.float64(), "str": pa.string()}
+    schema = pa.schema([(c["key"], types[c["type"]]) for c in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+
+    batch = {c["key"]: [] for c in columns}
+    n = 0
+    for r in rows:
+        for key in batch:
+            batch[key].append(r[key])
+        n += 1
+        if n == row_group:
+            writer.write_table(pa.table(batch, schema=schema))
+            batch = {key: [] for key in batch}
+            n = 0
+            yield sink.drain()
+    if n:
+        writer.write_table(pa.table(batch, schema=schema))
+    writer.close()
+    yield sink.drain()
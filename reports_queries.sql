@@ -1,18 +1,22 @@
 /* =========================================================
 1) Average occupancy of flights that actually took place
    (exclude cancelled flights, only past flights)
+   The date/status predicate is applied to Flight *inside* the derived table,
+   so only the seats of the matching flights are aggregated
+   (idx_flight_departure_date, then idx_flightseat_flight_status per flight)
+   instead of grouping the whole FlightSeat history first.
 ========================================================= */
 
 SELECT ROUND(AVG(t.occ_pct), 2) AS avg_occupancy_percent
 FROM (
   SELECT fs.flight_id,
-         SUM(CASE WHEN LOWER(fs.status) <> 'available' THEN 1 ELSE 0 END) * 100.0 / COUNT(*) AS occ_pct
-  FROM FlightSeat fs
+         SUM(CASE WHEN fs.status <> 'available' THEN 1 ELSE 0 END) * 100.0 / COUNT(*) AS occ_pct
+  FROM Flight f
+  JOIN FlightSeat fs ON fs.flight_id = f.flight_id
+  WHERE f.status <> 'cancelled'
+    AND f.departure_date < CURDATE()
   GROUP BY fs.flight_id
-) AS t
-JOIN Flight AS f ON f.flight_id = t.flight_id
-WHERE LOWER(f.status) <> 'cancelled'
-  AND f.departure_date < CURDATE();
+) AS t;
 
 
 /* =========================================================
@@ -44,7 +48,7 @@ JOIN FlightOrder fo ON fo.order_id = oi.order_id
 JOIN FlightPricing fp
   ON fp.flight_id = f.flight_id
  AND fp.class_type = s.class_type
-WHERE LOWER(f.status) <> 'cancelled'
+WHERE f.status <> 'cancelled'
 GROUP BY plane_size, p.manufacturer, s.class_type;
 
 
@@ -74,7 +78,7 @@ JOIN Flight f ON f.flight_id = fcp.flight_id
 JOIN Airway aw
   ON aw.origin_airport = f.origin_airport
  AND aw.destination_airport = f.destination_airport
-WHERE LOWER(f.status) <> 'cancelled'
+WHERE f.status <> 'cancelled'
 GROUP BY w.id, w.first_name, w.last_name, role
 ORDER BY total_minutes DESC;
 
@@ -114,79 +118,21 @@ Active day definition:
 
 utilization % = active_days / 30 * 100
 dominant route = most frequent performed route in that month
+Maintained incrementally in PlaneMonthActivity (month = first day of the
+departure month) when a flight is created or cancelled; the dominant route
+is route_rank = 1 in PlaneMonthRoute, ranked with ROW_NUMBER() by performed
+flights. `flask --app main rebuild-plane-activity` recomputes everything.
 ========================================================= */
 
 SELECT
-  ms.plane_id,
-  ms.manufacturer,
-  ms.flight_month,
-  ms.performed_flights,
-  ms.cancelled_flights,
-  ms.active_days,
-  (
-    SELECT CONCAT(f3.origin_airport, '-', f3.destination_airport)
-    FROM Flight f3
-    WHERE f3.plane_id = ms.plane_id
-      AND DATE_FORMAT(f3.departure_date, '%Y-%m') = ms.flight_month
-      AND LOWER(f3.status) <> 'cancelled'
-    GROUP BY f3.origin_airport, f3.destination_airport
-    ORDER BY COUNT(*) DESC
-    LIMIT 1
-  ) AS dominant_route,
-  ROUND((ms.active_days / 30.0) * 100, 1) AS utilization_percentage
-FROM (
-  SELECT
-    p.plane_id,
-    p.manufacturer,
-    DATE_FORMAT(f.departure_date, '%Y-%m') AS flight_month,
-
-    /* flights counts */
-    SUM(CASE WHEN LOWER(f.status) <> 'cancelled' THEN 1 ELSE 0 END) AS performed_flights,
-    SUM(CASE WHEN LOWER(f.status) = 'cancelled' THEN 1 ELSE 0 END) AS cancelled_flights,
-
-    /* active days = distinct (departure day) + distinct (arrival day when different) */
-    COUNT(DISTINCT d.active_day) AS active_days
-
-  FROM Plane p
-  JOIN Flight f ON f.plane_id = p.plane_id
-  JOIN Airway aw
-    ON aw.origin_airport = f.origin_airport
-   AND aw.destination_airport = f.destination_airport
-
-  /* build a small "days" set per flight: departure day always, arrival day if different */
-  JOIN (
-    SELECT 1 AS kind
-    UNION ALL
-    SELECT 2 AS kind
-  ) k
-
-  /* compute active_day per kind */
-  CROSS JOIN LATERAL (
-    SELECT
-      CASE
-        WHEN k.kind = 1 THEN DATE(f.departure_date)
-        WHEN k.kind = 2 THEN
-          CASE
-            WHEN DATE(
-              DATE_ADD(
-                TIMESTAMP(f.departure_date, f.departure_time),
-                INTERVAL aw.duration MINUTE
-              )
-            ) <> DATE(f.departure_date)
-            THEN DATE(
-              DATE_ADD(
-                TIMESTAMP(f.departure_date, f.departure_time),
-                INTERVAL aw.duration MINUTE
-              )
-            )
-            ELSE NULL
-          END
-      END AS active_day
-  ) d
-
-  WHERE d.active_day IS NOT NULL
-    AND LOWER(f.status) <> 'cancelled'
-
-  GROUP BY p.plane_id, p.manufacturer, flight_month
-) AS ms
-ORDER BY ms.flight_month DESC, ms.performed_flights DESC;
+  a.plane_id,
+  p.manufacturer,
+  DATE_FORMAT(a.month, '%Y-%m') AS flight_month,
+  a.performed_flights,
+  a.cancelled_flights,
+  a.active_days,
+  a.dominant_route,
+  ROUND((a.active_days / 30.0) * 100, 1) AS utilization_percentage
+FROM PlaneMonthActivity a
+JOIN Plane p ON p.plane_id = a.plane_id
+ORDER BY a.month DESC, a.performed_flights DESC;
@@ -0,0 +1,264 @@
+import csv
+import io
+import json
+from datetime import datetime, date, timedelta
+
+import availability
+import scheduling
+from airways import airway_index, is_long_duration
+
+# כמה טיסות נכתבות בכל טרנזקציה
+IMPORT_BATCH_SIZE = 200
+
+WEEKDAYS = {"mon": 0, "tue": 1, "wed": 2, "thu": 3, "fri": 4, "sat": 5, "sun": 6}
+PATTERN_FIELDS = (
+    "origin", "destination", "weekdays", "departure_time",
+    "start_date", "end_date", "plane_size", "regular_price", "business_price",
+)
+
+
+class ScheduleImportError(ValueError):
+    '''
+    קובץ הייבוא לא תקין - errors היא רשימת הודעות לפי שורה
+    '''
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = list(errors)
+
+
+def _parse_weekdays(value):
+    if isinstance(value, (list, tuple)):
+        tokens = [str(x) for x in value]
+    else:
+        tokens = str(value or "").replace("|", " ").replace(";", " ").replace(",", " ").split()
+    days = set()
+    for t in tokens:
+        key = t.strip().lower()
+        if key in WEEKDAYS or (len(key) > 3 and key[:3] in WEEKDAYS and key.endswith("day")):
+            days.add(WEEKDAYS[key[:3]])
+        elif key.isdigit() and 1 <= int(key) <= 7:
+            days.add(int(key) - 1)      # ISO: 1 = Monday
+        else:
+            raise ValueError(f"invalid weekday '{t}'")
+    if not days:
+        raise ValueError("at least one weekday is required")
+    return days
+
+
+def _parse_pattern(raw):
+    def field(name):
+        return str(raw.get(name) if raw.get(name) is not None else "").strip()
+
+    origin, destination = field("origin").upper(), field("destination").upper()
+    if not origin or not destination:
+        raise ValueError("origin and destination are required")
+    if origin == destination:
+        raise ValueError("origin and destination cannot be the same")
+
+    dep_time = field("departure_time")
+    datetime.strptime(dep_time, "%H:%M:%S" if len(dep_time) > 5 else "%H:%M")
+
+    start_date = date.fromisoformat(field("start_date"))
+    end_date = date.fromisoformat(field("end_date"))
+    if end_date < start_date:
+        raise ValueError("end_date is before start_date")
+
+    size = field("plane_size").lower() or "any"
+    if size not in ("big", "small", "any"):
+        raise ValueError("plane_size must be big, small or any")
+
+    regular_price = float(field("regular_price"))
+    business_price = float(field("business_price")) if field("business_price") else None
+    if regular_price <= 0 or (business_price is not None and business_price <= 0):
+        raise ValueError("prices must be positive")
+
+    return {
+        "origin": origin,
+        "destination": destination,
+        "weekdays": _parse_weekdays(raw.get("weekdays")),
+        "departure_time": dep_time,
+        "start_date": start_date,
+        "end_date": end_date,
+        "big": {"big": True, "small": False, "any": None}[size],
+        "regular_price": regular_price,
+        "business_price": business_price,
+    }
+
+
+def parse_patterns(text, fmt):
+    '''
+    fmt - "csv" (שורת כותרת עם PATTERN_FIELDS) או "json" (רשימת אובייקטים)
+    מחזירה רשימת דפוסים, או זורקת ScheduleImportError עם כל השגיאות
+    '''
+    if fmt == "json":
+        try:
+            rows = json.loads(text)
+        except ValueError as e:
+            raise ScheduleImportError([f"Invalid JSON: {e}"])
+        if not isinstance(rows, list):
+            raise ScheduleImportError(["JSON must be a list of patterns"])
+    elif fmt == "csv":
+        rows = list(csv.DictReader(io.StringIO(text)))
+    else:
+        raise ScheduleImportError([f"Unsupported format: {fmt}"])
+
+    patterns, errors = [], []
+    for n, raw in enumerate(rows, start=1):
+        try:
+            patterns.append(_parse_pattern(raw))
+        except (ValueError, TypeError, AttributeError) as e:
+            errors.append(f"Pattern {n}: {e}")
+    if errors:
+        raise ScheduleImportError(errors)
+    return patterns
+
+
+def expand_patterns(patterns, now=None):
+    '''
+    פורשת את הדפוסים לרשימת טיסות ממוינת לפי זמן המראה
+    מחזירה (flights, conflicts) - conflicts על נתיב לא קיים / זמן שכבר עבר
+    '''
+    now = now or datetime.now()
+    flights, conflicts = [], []
+    for n, p in enumerate(patterns, start=1):
+        duration = airway_index.duration(p["origin"], p["destination"])
+        if duration is None:
+            conflicts.append({"pattern": n, "date": None, "reason": f"No airway {p['origin']}-{p['destination']}"})
+            continue
+        is_long = is_long_duration(duration)
+
+        day = p["start_date"]
+        while day <= p["end_date"]:
+            if day.weekday() in p["weekdays"]:
+                start_dt, end_dt = _window(day, p["departure_time"], duration)
+                if start_dt <= now:
+                    conflicts.append({"pattern": n, "date": day.isoformat(), "reason": "Departure is in the past"})
+                else:
+                    flights.append({
+                        "pattern": n,
+                        "origin": p["origin"],
+                        "destination": p["destination"],
+                        "departure_date": day.isoformat(),
+                        "departure_time": p["departure_time"],
+                        "start_dt": start_dt,
+                        "end_dt": end_dt,
+                        "is_long": is_long,
+                        "big": p["big"],
+                        "regular_price": p["regular_price"],
+                        "business_price": p["business_price"],
+                    })
+            day += timedelta(days=1)
+
+    flights.sort(key=lambda f: (f["start_dt"], f["pattern"]))
+    return flights, conflicts
+
+
+def _window(day, dep_time, duration):
+    tm = datetime.strptime(dep_time, "%H:%M:%S" if len(dep_time) > 5 else "%H:%M").time()
+    start_dt = datetime.combine(day, tm)
+    return start_dt, start_dt + timedelta(minutes=int(duration))
+
+
+def existing_slots(cursor, flights):
+    '''
+    המשבצות (מקור, יעד, זמן המראה) מתוך flights שכבר יש להן טיסה שלא בוטלה - למשל מייבוא קודם שנעצר באמצע
+    '''
+    if not flights:
+        return set()
+    cursor.execute(
+        """
+        SELECT origin_airport, destination_airport, departure_dt
+        FROM Flight
+        WHERE departure_dt BETWEEN %s AND %s AND status <> 'cancelled'
+        """,
+        (flights[0]["start_dt"], flights[-1]["start_dt"]),
+    )
+    return {(r["origin_airport"], r["destination_airport"], r["departure_dt"]) for r in cursor.fetchall()}
+
+
+def plan_flights(planner, flights):
+    '''
+    משבצת מטוס וצוות לכל טיסה לפי סדר ההמראה, ומעדכנת את תמונת המצב בזיכרון אחרי כל שיבוץ
+    מחזירה (planned, conflicts)
+    '''
+    planned, conflicts = [], []
+    for f in flights:
+        try:
+            plane_id, is_big, crew_ids = planner.assign(f["origin"], f["start_dt"], f["end_dt"], f["is_long"], f["big"])
+        except scheduling.NoResources as e:
+            conflicts.append({"pattern": f["pattern"], "date": f["departure_date"], "reason": str(e)})
+            continue
+        if is_big and f["business_price"] is None:
+            conflicts.append({"pattern": f["pattern"], "date": f["departure_date"],
+                              "reason": "Business price is required for Big planes"})
+            continue
+        planner.reserve(plane_id, crew_ids, f["start_dt"], f["end_dt"], f["destination"])
+        planned.append(dict(f, plane_id=plane_id, is_big=is_big, crew_ids=crew_ids))
+    return planned, conflicts
+
+
+def run_import(patterns, dry_run=False):
+    '''
+    מתכננת את כל הטיסות בזיכרון, ואם לא dry_run - כותבת אותן בטרנזקציות של IMPORT_BATCH_SIZE
+    כל טרנזקציה נועלת את המשאבים של האצווה ומוודאת שלוח הזמנים לא השתנה מאז התכנון
+    טיסות שכבר קיימות לאותו נתיב ולאותו זמן המראה מדולגות, כך שאפשר להריץ שוב ייבוא שנעצר
+    מחזירה דו"ח: {"planned", "created", "existing", "conflicts", "flight_ids"}
+    '''
+    from main import db_cur, db_tx
+    from flights import invalidate_route_search
+
+    flights, conflicts = expand_patterns(patterns)
+    report = {"planned": 0, "created": 0, "existing": 0, "conflicts": conflicts, "flight_ids": []}
+    if not flights:
+        return report
+
+    with db_cur() as cursor:
+        fingerprint = availability.schedule_fingerprint(cursor)
+        existing = existing_slots(cursor, flights)
+        new_flights = [f for f in flights if (f["origin"], f["destination"], f["start_dt"]) not in existing]
+        report["existing"] = len(flights) - len(new_flights)
+        flights = new_flights
+        if not flights:
+            return report
+        window_start = flights[0]["start_dt"]
+        window_end = max(f["end_dt"] for f in flights)
+        planner = scheduling.ResourcePlanner.load(cursor, window_start, window_end)
+
+    planned, plan_conflicts = plan_flights(planner, flights)
+    report["planned"] = len(planned)
+    report["conflicts"] = conflicts + plan_conflicts
+    if dry_run:
+        return report
+
+    routes = set()
+    try:
+        for i in range(0, len(planned), IMPORT_BATCH_SIZE):
+            batch = planned[i:i + IMPORT_BATCH_SIZE]
+            with db_tx() as cursor:
+                scheduling.lock_resources(
+                    cursor, [f["plane_id"] for f in batch], [cid for f in batch for cid in f["crew_ids"]]
+                )
+                if availability.schedule_fingerprint(cursor) != fingerprint:
+                    raise ScheduleImportError([
+                        f"The schedule changed while importing; {report['created']} flight(s) were created. "
+                        "Run the import again - flights that already exist are skipped."
+                    ])
+                ids = []
+                for f in batch:
+                    ids.append(scheduling.insert_flight(
+                        cursor, f["plane_id"], f["origin"], f["destination"], f["departure_date"], f["departure_time"],
+                        {"Regular": f["regular_price"], "Business": f["business_price"] if f["is_big"] else None},
+                        f["crew_ids"], f["start_dt"], f["end_dt"], check=False,
+                    ))
+                fingerprint = availability.schedule_fingerprint(cursor)
+
+            for f, flight_id in zip(batch, ids):
+                availability.schedule_index.add_flight(flight_id, f["plane_id"], f["crew_ids"], f["start_dt"], f["end_dt"])
+                routes.add((f["origin"], f["destination"]))
+            report["flight_ids"] += ids
+            report["created"] += len(ids)
+    finally:
+        # גם אם אצווה מאוחרת נכשלה - האצוות שכבר נשמרו צריכות להופיע בחיפוש
+        for origin, destination in routes:
+            invalidate_route_search(origin, destination)
+    return report
@@ -0,0 +1,351 @@
+import heapq
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+import availability
+import report_rollups
+import seat_counters
+
+
+# גודל מטוס -> (טייסים, דיילים)
+CREW_BY_PLANE_SIZE = {True: (3, 6), False: (2, 3)}
+
+
+def crew_needed(is_big_plane: bool):
+    '''
+    מחזירה את מס' הטייסים והדיילים הדרושים, לפי גודל המטוס
+    '''
+    return CREW_BY_PLANE_SIZE[bool(is_big_plane)]
+
+
+class ResourceConflict(Exception):
+    '''
+    המטוס או אחד מאנשי הצוות כבר שובץ (או לא נמצא בשדה המוצא) - נבדק בתוך הטרנזקציה, אחרי נעילת המשאבים
+    '''
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = list(errors)
+
+
+class PlaneHasNoSeats(Exception):
+    pass
+
+
+def lock_resources(cursor, plane_ids, crew_ids):
+    '''
+    נועלת את שורות המטוסים ואנשי הצוות (FOR UPDATE) עד סוף הטרנזקציה
+    כך שני מנהלים לא יכולים לשבץ את אותו מטוס / טייס במקביל
+    הנעילה תמיד באותו סדר (מטוסים, ואז צוות, לפי id) כדי לא ליצור deadlock בין יצירות מקבילות
+    '''
+    plane_ids = sorted(set(plane_ids))
+    cursor.execute(
+        f"SELECT plane_id FROM Plane WHERE plane_id IN ({','.join(['%s'] * len(plane_ids))}) ORDER BY plane_id FOR UPDATE",
+        tuple(plane_ids),
+    )
+    crew_ids = sorted(set(crew_ids))
+    if crew_ids:
+        cursor.execute(
+            f"SELECT id FROM AirCrew WHERE id IN ({','.join(['%s'] * len(crew_ids))}) ORDER BY id FOR UPDATE",
+            tuple(crew_ids),
+        )
+
+
+def check_resources(cursor, plane_id, crew_ids, start_dt: datetime, end_dt: datetime, origin: str):
+    '''
+    בדיקה סמכותית מול ResourceTimeline (אחרי lock_resources): חפיפה בזמנים ומיקום בזמן ההמראה
+    מחזירה רשימת הפרות
+    '''
+    resources = [("plane", plane_id)] + [("crew", cid) for cid in crew_ids]
+    pairs = ",".join(["(%s, %s)"] * len(resources))
+    cursor.execute(
+        f"""
+        SELECT DISTINCT resource_type, resource_id
+        FROM ResourceTimeline
+        WHERE (resource_type, resource_id) IN ({pairs})
+          AND start_dt < %s
+          AND end_dt > %s
+        """,
+        tuple(x for key in resources for x in key) + (end_dt, start_dt),
+    )
+    busy = {(r["resource_type"], r["resource_id"]) for r in cursor.fetchall()}
+
+    errors = []
+    locations = availability.last_locations(cursor, resources, start_dt)
+    for kind, rid in resources:
+        label = "Selected plane" if kind == "plane" else f"Crew member {rid}"
+        if (kind, rid) in busy:
+            errors.append(f"{label} was assigned to another flight at this time.")
+        loc = locations.get((kind, rid))
+        if not availability.location_ok(loc, origin):
+            errors.append(f"{label} is not at {origin} at departure time (last known location: {loc}).")
+    return errors
+
+
+def insert_flight(cursor, plane_id, origin, destination, departure_date, departure_time,
+                  prices, crew_ids, start_dt: datetime, end_dt: datetime, check=True):
+    '''
+    יוצרת טיסה שלמה בתוך הטרנזקציה של cursor: Flight, מחירים, צוות, מושבים, מונים וציר הזמן
+    prices - {"Regular": 100.0, "Business": 400.0}
+    check=False - המשאבים כבר נבדקו ונעולים אצל הקורא (ייבוא בכמויות)
+    '''
+    if check:
+        lock_resources(cursor, [plane_id], crew_ids)
+        errors = check_resources(cursor, plane_id, crew_ids, start_dt, end_dt, origin)
+        if errors:
+            raise ResourceConflict(errors)
+
+    cursor.execute(
+        """
+        INSERT INTO Flight
+          (plane_id, origin_airport, destination_airport, departure_date, departure_time, status)
+        VALUES
+          (%s, %s, %s, %s, %s, 'open')
+        """,
+        (plane_id, origin, destination, departure_date, departure_time),
+    )
+    flight_id = cursor.lastrowid
+
+    price_rows = [(flight_id, class_type, price) for class_type, price in prices.items() if price is not None]
+    cursor.execute(
+        "INSERT INTO FlightPricing (flight_id, class_type, price) VALUES "
+        + ",".join(["(%s, %s, %s)"] * len(price_rows)),
+        tuple(x for row in price_rows for x in row),
+    )
+
+    if crew_ids:
+        cursor.execute(
+            "INSERT INTO FlightCrewPlacement (flight_id, id) VALUES "
+            + ",".join(["(%s, %s)"] * len(crew_ids)),
+            tuple(x for cid in crew_ids for x in (flight_id, cid)),
+        )
+
+    # כל המושבים של המטוס בפקודה אחת
+    cursor.execute(
+        """
+        INSERT INTO FlightSeat (flight_id, seat_id, status)
+        SELECT %s, s.seat_id, 'available'
+        FROM Seat s
+        WHERE s.plane_id=%s
+        """,
+        (flight_id, plane_id),
+    )
+    if cursor.rowcount == 0:
+        raise PlaneHasNoSeats(plane_id)
+
+    seat_counters.recount_flight(cursor, flight_id)
+    availability.timeline_add_flight(cursor, flight_id)
+    report_rollups.mark_flight(cursor, flight_id)
+    report_rollups.activity_add_flight(cursor, flight_id)
+    return flight_id
+
+
+def create_flight(plane_id, origin, destination, departure_date, departure_time,
+                  prices, crew_ids, start_dt: datetime, end_dt: datetime):
+    '''
+    יצירת טיסה בטרנזקציה אחת - או שהכל נכתב, או ששום דבר לא נכתב (אין מחיקות פיצוי)
+    deadlock / lock wait timeout - מנסים שוב מספר מוגבל של פעמים, כמו בהזמנת מושבים
+    '''
+    from main import db_tx
+    from flights import RETRYABLE_DB_ERRNOS, BOOKING_MAX_ATTEMPTS, invalidate_route_search
+
+    crew_ids = [int(x) for x in crew_ids]
+    for attempt in range(1, BOOKING_MAX_ATTEMPTS + 1):
+        try:
+            with db_tx() as cursor:
+                flight_id = insert_flight(
+                    cursor, plane_id, origin, destination, departure_date, departure_time,
+                    prices, crew_ids, start_dt, end_dt,
+                )
+            availability.schedule_index.add_flight(flight_id, plane_id, crew_ids, start_dt, end_dt)
+            invalidate_route_search(origin, destination)
+            return flight_id
+        except (ResourceConflict, PlaneHasNoSeats):
+            raise
+        except Exception as e:
+            if getattr(e, "errno", None) not in RETRYABLE_DB_ERRNOS or attempt == BOOKING_MAX_ATTEMPTS:
+                raise
+            time.sleep(0.05 * attempt)
+
+
+class NoResources(Exception):
+    '''
+    אין מטוס / מספיק אנשי צוות פנויים לטיסה בתכנון
+    '''
+
+
+class _Track:
+    '''
+    הטיסות של משאב אחד בזיכרון, ממוינות לפי זמן (הטיסות של משאב לא חופפות, לכן גם זמני הנחיתה ממוינים)
+    '''
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.dests = []
+
+    def add(self, start_dt, end_dt, dest):
+        i = bisect_right(self.starts, start_dt)
+        self.starts.insert(i, start_dt)
+        self.ends.insert(i, end_dt)
+        self.dests.insert(i, dest)
+
+    def is_free(self, start_dt, end_dt) -> bool:
+        i = bisect_left(self.starts, end_dt)
+        return i == 0 or self.ends[i - 1] <= start_dt
+
+    def location_at(self, when):
+        j = bisect_right(self.ends, when)
+        return self.dests[j - 1] if j else None
+
+
+class ResourcePlanner:
+    '''
+    תמונת מצב בזיכרון של המטוסים, הצוות ולוח הזמנים שלהם בחלון תכנון
+    מאפשרת לשבץ הרבה טיסות חדשות בלי שאילתה לכל טיסה - כל שיבוץ מתעדכן מיד בתמונה
+
+    השיבוץ חמדני ומאוזן: מכל מאגר (מטוסים גדולים / קטנים, טייסים, דיילים, בעלי הכשרה)
+    נבחרים המשאבים הפנויים עם הכי מעט דקות טיסה מצטברות. כל מאגר הוא heap של (דקות, id);
+    אחרי שיבוץ נדחפת רשומה חדשה, ורשומות ישנות (שהדקות שלהן כבר לא עדכניות) מדולגות
+    '''
+
+    def __init__(self, planes, crew, timeline_rows, minutes=None):
+        self.minutes = dict(minutes or {})
+        self.big_planes = {p["plane_id"] for p in planes if int(p["is_big"])}
+        self.tracks = {}
+        for r in sorted(timeline_rows, key=lambda r: r["start_dt"]):
+            self._track((r["kind"], r["resource_id"])).add(r["start_dt"], r["end_dt"], r["destination_airport"])
+
+        self._heaps = {}
+        self._pools_of = {}
+        for p in planes:
+            self._join("big" if int(p["is_big"]) else "small", ("plane", p["plane_id"]))
+        for c in crew:
+            trained = int(c.get("long_flight_training") or 0)
+            for role, flag in (("pilot", c["is_pilot"]), ("attendant", c["is_attendant"])):
+                if int(flag):
+                    self._join(role, ("crew", c["id"]))
+                    if trained:
+                        self._join(role + ":long", ("crew", c["id"]))
+
+    @classmethod
+    def load(cls, cursor, window_start: datetime, window_end: datetime):
+        '''
+        ארבע שאילתות: מטוסים, צוות, דקות הטיסה המצטברות,
+        ולוח הזמנים בחלון (כולל הטיסה האחרונה של כל משאב לפני החלון)
+        '''
+        planes = availability.candidate_planes(cursor)
+        crew = availability.candidate_crew(cursor)
+        minutes = availability.flight_minutes(cursor)
+        cursor.execute(
+            """
+            SELECT t.resource_type AS kind, t.resource_id, t.start_dt, t.end_dt, t.destination_airport
+            FROM (
+              SELECT resource_type, resource_id, MAX(end_dt) AS last_end
+              FROM ResourceTimeline
+              WHERE end_dt <= %s
+              GROUP BY resource_type, resource_id
+            ) m
+            JOIN ResourceTimeline t
+              ON t.resource_type = m.resource_type
+             AND t.resource_id = m.resource_id
+             AND t.end_dt = m.last_end
+            UNION ALL
+            SELECT resource_type, resource_id, start_dt, end_dt, destination_airport
+            FROM ResourceTimeline
+            WHERE end_dt > %s AND start_dt < %s
+            """,
+            (window_start, window_start, window_end),
+        )
+        return cls(planes, crew, cursor.fetchall(), minutes)
+
+    def _join(self, pool, key):
+        self._pools_of.setdefault(key, []).append(pool)
+        heapq.heappush(self._heaps.setdefault(pool, []), (self.minutes.get(key, 0), key[1]))
+
+    def _track(self, key):
+        track = self.tracks.get(key)
+        if track is None:
+            track = self.tracks[key] = _Track()
+        return track
+
+    def is_available(self, key, start_dt, end_dt, origin) -> bool:
+        track = self.tracks.get(key)
+        if track is None:
+            return availability.location_ok(None, origin)
+        return track.is_free(start_dt, end_dt) and availability.location_ok(track.location_at(start_dt), origin)
+
+    def _pick(self, pool, kind, n, start_dt, end_dt, origin, exclude=()):
+        '''
+        n המשאבים הפנויים עם הכי מעט דקות במאגר; הרשומות שנבדקו חוזרות ל-heap
+        '''
+        heap = self._heaps.get(pool, [])
+        picked, seen, checked = [], [], set()
+        while heap and len(picked) < n:
+            entry = heapq.heappop(heap)
+            minutes, rid = entry
+            if minutes != self.minutes.get((kind, rid), 0) or rid in checked:
+                continue        # רשומה ישנה / כפולה - יש רשומה עדכנית ב-heap
+            checked.add(rid)
+            seen.append(entry)
+            if rid not in exclude and self.is_available((kind, rid), start_dt, end_dt, origin):
+                picked.append(rid)
+        for entry in seen:
+            heapq.heappush(heap, entry)
+        return picked
+
+    def assign(self, origin, start_dt: datetime, end_dt: datetime, is_long: bool, big=None):
+        '''
+        בוחרת מטוס וצוות פנויים לטיסה, המאוזנים לפי דקות טיסה מצטברות
+        big - גודל מטוס מבוקש, או None לכל גודל (לטיסה קצרה מעדיפים מטוס קטן ומשאירים את הגדולים לטיסות ארוכות)
+        מחזירה (plane_id, is_big, crew_ids) או זורקת NoResources עם הסיבה
+        '''
+        if is_long and big is False:
+            raise NoResources("Long flights must use a Big plane")
+        want_big = True if is_long else big
+        pools = {True: ["big"], False: ["small"], None: ["small", "big"]}[want_big]
+
+        plane_ids = []
+        for pool in pools:
+            plane_ids = self._pick(pool, "plane", 1, start_dt, end_dt, origin)
+            if plane_ids:
+                break
+        if not plane_ids:
+            size = {True: "Big ", False: "Small ", None: ""}[want_big]
+            raise NoResources(f"No {size}plane available at {origin}")
+        plane_id = plane_ids[0]
+        is_big = plane_id in self.big_planes
+
+        n_pilots, n_attendants = crew_needed(is_big)
+        suffix = ":long" if is_long else ""
+        pilot_ids = self._pick("pilot" + suffix, "crew", n_pilots, start_dt, end_dt, origin)
+        if len(pilot_ids) < n_pilots:
+            raise NoResources(f"Only {len(pilot_ids)} of {n_pilots} pilots available at {origin}")
+        fa_ids = self._pick("attendant" + suffix, "crew", n_attendants, start_dt, end_dt, origin,
+                            exclude=set(pilot_ids))
+        if len(fa_ids) < n_attendants:
+            raise NoResources(f"Only {len(fa_ids)} of {n_attendants} attendants available at {origin}")
+
+        return plane_id, is_big, pilot_ids + fa_ids
+
+    def reserve(self, plane_id, crew_ids, start_dt: datetime, end_dt: datetime, destination):
+        '''
+        רושמת טיסה שתוכננה: המשאבים תפוסים בחלון, נמצאים ביעד אחריו, והדקות שלהם גדלות
+        '''
+        duration = int((end_dt - start_dt).total_seconds() // 60)
+        for key in [("plane", plane_id)] + [("crew", cid) for cid in crew_ids]:
+            self._track(key).add(start_dt, end_dt, destination)
+            self.minutes[key] = self.minutes.get(key, 0) + duration
+            for pool in self._pools_of.get(key, []):
+                heapq.heappush(self._heaps[pool], (self.minutes[key], key[1]))
+
+
+def auto_assign(cursor, origin, start_dt: datetime, end_dt: datetime, is_long: bool, big=None):
+    '''
+    שיבוץ אוטומטי לטיסה אחת (מצב "Auto-assign" באשף הוספת טיסה)
+    מחזירה (plane_id, is_big, pilot_ids, fa_ids) או זורקת NoResources
+    '''
+    planner = ResourcePlanner.load(cursor, start_dt, end_dt)
+    plane_id, is_big, crew_ids = planner.assign(origin, start_dt, end_dt, is_long, big)
+    n_pilots = crew_needed(is_big)[0]
+    return plane_id, is_big, crew_ids[:n_pilots], crew_ids[n_pilots:]
@@ -129,10 +129,18 @@ CREATE TABLE Flight (
   destination_airport VARCHAR(255) NOT NULL,
   departure_date DATE NOT NULL,
   departure_time TIME NOT NULL,
+  /* סטטוס קנוני באותיות קטנות - מאפשר השוואה ישירה בלי LOWER() */
   status VARCHAR(50) NOT NULL,
+  /* מועד ההמראה המלא, נשמר כעמודה כדי שהחיפוש יוכל להשתמש באינדקס */
+  departure_dt DATETIME AS (TIMESTAMP(departure_date, departure_time)) STORED,
   PRIMARY KEY (flight_id),
   FOREIGN KEY (plane_id) REFERENCES Plane(plane_id),
-  FOREIGN KEY (origin_airport, destination_airport) REFERENCES Airway(origin_airport, destination_airport)
+  FOREIGN KEY (origin_airport, destination_airport) REFERENCES Airway(origin_airport, destination_airport),
+  CHECK (status IN ('open', 'cancelled')),
+  INDEX idx_flight_route_departure (origin_airport, destination_airport, departure_dt),
+  INDEX idx_flight_departure_date (departure_date, status),
+  /* לוח הטיסות של המנהל מדפדף לפי (departure_dt, flight_id) - המפתח הראשי כלול באינדקס */
+  INDEX idx_flight_departure_dt (departure_dt)
 );
 
 CREATE TABLE FlightPricing (
@@ -150,9 +158,15 @@ CREATE TABLE FlightOrder (
   execution_date DATE NOT NULL,
   status VARCHAR(50) NOT NULL,
   total_payment DECIMAL(10,2) NOT NULL,
+  /* עותק של Flight.departure_dt (שלא משתנה אחרי יצירת הטיסה) - המפתח של דפי /my_orders */
+  departure_dt DATETIME NOT NULL,
   PRIMARY KEY (order_id),
   FOREIGN KEY (flight_id) REFERENCES Flight(flight_id),
-  FOREIGN KEY (email) REFERENCES Customer(email)
+  FOREIGN KEY (email) REFERENCES Customer(email),
+  INDEX idx_order_execution_date (execution_date),
+  INDEX idx_order_email_flight (email, flight_id),
+  /* היסטוריית ההזמנות של לקוח (/my_orders) בדפים לפי (departure_dt, order_id) - בלי מיון של כל ההיסטוריה */
+  INDEX idx_order_email_departure (email, departure_dt, order_id)
 );
 
 CREATE TABLE FlightSeat (
@@ -163,7 +177,9 @@ CREATE TABLE FlightSeat (
   PRIMARY KEY (flight_seat_id),
   FOREIGN KEY (flight_id) REFERENCES Flight(flight_id),
   FOREIGN KEY (seat_id) REFERENCES Seat(seat_id),
-  UNIQUE (flight_id, seat_id)
+  UNIQUE (flight_id, seat_id),
+  CHECK (status IN ('available', 'booked')),
+  INDEX idx_flightseat_flight_status (flight_id, status)
 );
 
 CREATE TABLE OrderItem (
@@ -183,3 +199,125 @@ CREATE TABLE FlightCrewPlacement (
   FOREIGN KEY (flight_id) REFERENCES Flight(flight_id),
   FOREIGN KEY (id) REFERENCES AirCrew(id)
 );
+
+/* מוני מושבים פנויים ותפוסים לכל טיסה ומחלקה - מתעדכנים בהזמנה, בביטול הזמנה ובביטול טיסה */
+CREATE TABLE FlightClassAvailability (
+  flight_id INT NOT NULL,
+  class_type VARCHAR(50) NOT NULL,
+  available_seats INT NOT NULL DEFAULT 0,
+  booked_seats INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (flight_id, class_type),
+  FOREIGN KEY (flight_id) REFERENCES Flight(flight_id)
+);
+
+/* ציר הזמן של כל מטוס ואיש צוות - שורה לכל טיסה לא מבוטלת, עם זמן הנחיתה המחושב
+   נרשם ביצירת טיסה ונמחק בביטול; מאפשר למצוא מיקום אחרון וחפיפות דרך אינדקס */
+CREATE TABLE ResourceTimeline (
+  resource_type VARCHAR(10) NOT NULL,
+  resource_id INT NOT NULL,
+  flight_id INT NOT NULL,
+  start_dt DATETIME NOT NULL,
+  end_dt DATETIME NOT NULL,
+  origin_airport VARCHAR(255) NOT NULL,
+  destination_airport VARCHAR(255) NOT NULL,
+  PRIMARY KEY (resource_type, resource_id, flight_id),
+  FOREIGN KEY (flight_id) REFERENCES Flight(flight_id),
+  CHECK (resource_type IN ('plane', 'crew')),
+  INDEX idx_timeline_resource_end (resource_type, resource_id, end_dt),
+  INDEX idx_timeline_end (end_dt)
+);
+
+/* טבלאות סיכום יומיות לדוחות המנהל - day הוא יום ההמראה (או יום ביצוע ההזמנה ב-RollupOrdersDaily)
+   ימים שהשתנו נרשמים ב-ReportRollupDirty בהזמנה / ביטול / יצירת טיסה, ומחושבים מחדש לפני הרצת דוח
+   או ב-`flask --app main refresh-report-rollups`
+   כל סימון הוא שורה נפרדת, כך שטרנזקציות שמסמנות את אותו יום לא ננעלות זו על זו;
+   הרענון מוחק רק את הסימונים שקרא */
+CREATE TABLE ReportRollupDirty (
+  mark_id BIGINT NOT NULL AUTO_INCREMENT,
+  day DATE NOT NULL,
+  PRIMARY KEY (mark_id),
+  INDEX idx_rollup_dirty_day (day)
+);
+
+CREATE TABLE RollupFlightOccupancy (
+  flight_id INT NOT NULL,
+  day DATE NOT NULL,
+  total_seats INT NOT NULL,
+  taken_seats INT NOT NULL,
+  PRIMARY KEY (flight_id),
+  FOREIGN KEY (flight_id) REFERENCES Flight(flight_id),
+  INDEX idx_rollup_occupancy_day (day)
+);
+
+CREATE TABLE RollupRevenueDaily (
+  day DATE NOT NULL,
+  plane_id INT NOT NULL,
+  class_type VARCHAR(50) NOT NULL,
+  revenue DECIMAL(12,2) NOT NULL,
+  PRIMARY KEY (day, plane_id, class_type)
+);
+
+CREATE TABLE RollupCrewMinutesDaily (
+  day DATE NOT NULL,
+  worker_id INT NOT NULL,
+  short_minutes INT NOT NULL,
+  long_minutes INT NOT NULL,
+  PRIMARY KEY (day, worker_id)
+);
+
+CREATE TABLE RollupOrdersDaily (
+  day DATE NOT NULL,
+  orders INT NOT NULL,
+  cancelled_orders INT NOT NULL,
+  PRIMARY KEY (day)
+);
+
+/* עבודת ביטול לכל טיסה מבוטלת: ההזמנות מבוטלות ברקע בחלקים, עם מעקב התקדמות */
+CREATE TABLE FlightCancellationJob (
+  flight_id INT NOT NULL,
+  status VARCHAR(20) NOT NULL,
+  total_orders INT NOT NULL,
+  processed_orders INT NOT NULL,
+  error VARCHAR(1000) NULL,
+  created_at DATETIME NOT NULL,
+  updated_at DATETIME NOT NULL,
+  finished_at DATETIME NULL,
+  PRIMARY KEY (flight_id),
+  FOREIGN KEY (flight_id) REFERENCES Flight(flight_id),
+  CHECK (status IN ('pending', 'running', 'done', 'failed')),
+  INDEX idx_cancellation_job_status (status)
+);
+
+/* פעילות חודשית לכל מטוס (חודש = היום הראשון בחודש ההמראה), מתעדכנת ביצירת / ביטול טיסה */
+CREATE TABLE PlaneMonthActivity (
+  plane_id INT NOT NULL,
+  month DATE NOT NULL,
+  performed_flights INT NOT NULL,
+  cancelled_flights INT NOT NULL,
+  active_days INT NOT NULL,
+  dominant_route VARCHAR(511) NULL,
+  PRIMARY KEY (plane_id, month),
+  FOREIGN KEY (plane_id) REFERENCES Plane(plane_id),
+  INDEX idx_plane_month_activity_month (month)
+);
+
+/* מספר הטיסות לכל נתיב של מטוס בחודש; route_rank = 1 הוא המסלול הדומיננטי */
+CREATE TABLE PlaneMonthRoute (
+  plane_id INT NOT NULL,
+  month DATE NOT NULL,
+  origin_airport VARCHAR(255) NOT NULL,
+  destination_airport VARCHAR(255) NOT NULL,
+  performed_flights INT NOT NULL,
+  cancelled_flights INT NOT NULL,
+  route_rank INT NOT NULL,
+  PRIMARY KEY (plane_id, month, origin_airport, destination_airport)
+);
+
+/* ימי פעילות של מטוס בחודש: כמה טיסות שלא בוטלו ממריאות או נוחתות בכל יום */
+CREATE TABLE PlaneActiveDay (
+  plane_id INT NOT NULL,
+  month DATE NOT NULL,
+  day DATE NOT NULL,
+  flights INT NOT NULL,
+  PRIMARY KEY (plane_id, month, day)
+);
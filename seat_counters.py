@@ -0,0 +1,97 @@
+_RECOUNT_SQL = """
+    SELECT
+      fs.flight_id,
+      s.class_type,
+      SUM(CASE WHEN LOWER(fs.status) = 'available' THEN 1 ELSE 0 END) AS available_seats,
+      SUM(CASE WHEN LOWER(fs.status) <> 'available' THEN 1 ELSE 0 END) AS booked_seats
+    FROM FlightSeat fs
+    JOIN Seat s ON s.seat_id = fs.seat_id
+    {where}
+    GROUP BY fs.flight_id, s.class_type
+"""
+
+
+def recount_flight(cursor, flight_id):
+    '''
+    מחשבת מחדש את המונים של טיסה אחת מתוך FlightSeat (ביצירת טיסה ובביטול טיסה)
+    '''
+    cursor.execute("DELETE FROM FlightClassAvailability WHERE flight_id=%s", (flight_id,))
+    cursor.execute(
+        "INSERT INTO FlightClassAvailability (flight_id, class_type, available_seats, booked_seats) "
+        + _RECOUNT_SQL.format(where="WHERE fs.flight_id=%s"),
+        (flight_id,),
+    )
+
+
+def apply_booking(cursor, flight_id, counts_by_class):
+    '''
+    מעדכנת את המונים אחרי הזמנה - חייבת לרוץ באותה טרנזקציה של סימון המושבים
+    counts_by_class: {"Regular": 2, "Business": 1}
+    '''
+    _shift(cursor, flight_id, counts_by_class, sign=1)
+
+
+def apply_release(cursor, flight_id, counts_by_class):
+    '''
+    מעדכנת את המונים אחרי ביטול הזמנה ושחרור המושבים שלה
+    '''
+    _shift(cursor, flight_id, counts_by_class, sign=-1)
+
+
+def _shift(cursor, flight_id, counts_by_class, sign):
+    for class_type, n in counts_by_class.items():
+        if not n:
+            continue
+        cursor.execute(
+            """
+            UPDATE FlightClassAvailability
+            SET available_seats = available_seats - %s,
+                booked_seats = booked_seats + %s
+            WHERE flight_id=%s AND class_type=%s
+            """,
+            (sign * n, sign * n, flight_id, class_type),
+        )
+
+
+def count_by_class(rows):
+    '''
+    סופרת שורות מושבים לפי class_type
+    '''
+    counts = {}
+    for r in rows:
+        counts[r["class_type"]] = counts.get(r["class_type"], 0) + 1
+    return counts
+
+
+def reconcile(cursor, fix=False):
+    '''
+    משווה את המונים מול FlightSeat ומחזירה רשימת אי-התאמות
+    fix=True - מתקנת את המונים לפי הספירה בפועל
+    '''
+    cursor.execute(_RECOUNT_SQL.format(where=""))
+    actual = {(r["flight_id"], r["class_type"]): r for r in cursor.fetchall()}
+
+    cursor.execute(
+        "SELECT flight_id, class_type, available_seats, booked_seats FROM FlightClassAvailability"
+    )
+    stored = {(r["flight_id"], r["class_type"]): r for r in cursor.fetchall()}
+
+    mismatches = []
+    for key in sorted(set(actual) | set(stored)):
+        a = actual.get(key) or {"available_seats": 0, "booked_seats": 0}
+        s = stored.get(key) or {"available_seats": 0, "booked_seats": 0}
+        if (int(a["available_seats"]), int(a["booked_seats"])) != (int(s["available_seats"]), int(s["booked_seats"])):
+            mismatches.append({
+                "flight_id": key[0],
+                "class_type": key[1],
+                "stored_available": int(s["available_seats"]),
+                "stored_booked": int(s["booked_seats"]),
+                "actual_available": int(a["available_seats"]),
+                "actual_booked": int(a["booked_seats"]),
+            })
+
+    if fix:
+        for flight_id in sorted({m["flight_id"] for m in mismatches}):
+            recount_flight(cursor, flight_id)
+
+    return mismatches
@@ -0,0 +1,191 @@
+from cache import TTLCache
+
+# מבנה המושבים של מטוס כמעט לא משתנה - נשמר לזמן ארוך
+LAYOUT_TTL = 3600
+# זמינות המושבים מתעדכנת write-through; התוקף הקצר מגן מפני עדכונים של תהליכים אחרים
+AVAILABILITY_TTL = 30
+
+CLASS_ORDER = ("Regular", "Business")
+
+layout_cache = TTLCache(ttl=LAYOUT_TTL)
+availability_cache = TTLCache(ttl=AVAILABILITY_TTL)
+
+
+def _layout_key(plane_id):
+    return f"layout:{int(plane_id)}"
+
+
+def _availability_key(flight_id):
+    return f"avail:{int(flight_id)}"
+
+
+def _layout_from_rows(rows):
+    '''
+    בונה את מבנה המטוס: רשימת מושבים ממוינת, ומידות הגריד לכל מחלקה
+    '''
+    seats = []
+    grid = {}
+    for r in rows:
+        seats.append((r["seat_id"], r["row_num"], r["column_number"], r["class_type"]))
+        if r["class_type"] not in grid:
+            grid[r["class_type"]] = {
+                "rows": r["rows_number"] or 0,
+                "cols": r["columns_number"] or 6,
+            }
+    return {"seats": seats, "grid": grid}
+
+
+def _availability_from_rows(layout, rows):
+    '''
+    בונה את מפת הזמינות של טיסה - flight_seat_id לכל מושב במבנה, וביט זמינות לכל מושב
+    מושבים שאינם שייכים למטוס של הטיסה מתעלמים מהם
+    '''
+    index_by_seat = {seat[0]: i for i, seat in enumerate(layout["seats"])}
+    flight_seat_ids = [None] * len(layout["seats"])
+    bits = bytearray((len(layout["seats"]) + 7) // 8)
+    for r in rows:
+        i = index_by_seat.get(r["seat_id"])
+        if i is None:
+            continue
+        flight_seat_ids[i] = r["flight_seat_id"]
+        if str(r["status"]).lower() == "available":
+            bits[i >> 3] |= 1 << (i & 7)
+    return {"flight_seat_ids": flight_seat_ids, "bits": bits}
+
+
+def _load_layout_and_availability(flight_id, plane_id):
+    from main import db_cur
+
+    with db_cur() as cursor:
+        cursor.execute(
+            """
+            SELECT
+              s.seat_id,
+              s.row_num,
+              s.column_number,
+              s.class_type,
+              c.rows_number,
+              c.columns_number,
+              fs.flight_seat_id,
+              fs.status
+            FROM Seat s
+            LEFT JOIN Class c
+              ON c.plane_id = s.plane_id
+             AND c.class_type = s.class_type
+            LEFT JOIN FlightSeat fs
+              ON fs.seat_id = s.seat_id
+             AND fs.flight_id = %s
+            WHERE s.plane_id=%s
+            ORDER BY s.row_num, s.column_number
+            """,
+            (flight_id, plane_id),
+        )
+        rows = cursor.fetchall()
+
+    layout = _layout_from_rows(rows)
+    availability = _availability_from_rows(
+        layout, [r for r in rows if r["flight_seat_id"] is not None]
+    )
+    return layout, availability
+
+
+def _load_availability(flight_id, layout):
+    from main import db_cur
+
+    with db_cur() as cursor:
+        cursor.execute(
+            "SELECT flight_seat_id, seat_id, status FROM FlightSeat WHERE flight_id=%s",
+            (flight_id,),
+        )
+        rows = cursor.fetchall()
+    return _availability_from_rows(layout, rows)
+
+
+def get_seat_map(flight_id, plane_id):
+    '''
+    מחזירה (seats_by_class, grid_by_class) של טיסה -
+    מבנה המטוס מהמטמון + שכבת זמינות (bitmap) של הטיסה
+    '''
+    layout = layout_cache.get(_layout_key(plane_id))
+    availability = availability_cache.get(_availability_key(flight_id))
+
+    if layout is None:
+        layout, availability = _load_layout_and_availability(flight_id, plane_id)
+        layout_cache.set(_layout_key(plane_id), layout)
+        availability_cache.set(_availability_key(flight_id), availability)
+    elif availability is None:
+        availability = _load_availability(flight_id, layout)
+        availability_cache.set(_availability_key(flight_id), availability)
+
+    return _overlay(layout, availability)
+
+
+def _overlay(layout, availability):
+    bits = availability["bits"]
+    flight_seat_ids = availability["flight_seat_ids"]
+
+    by_class = {}
+    for i, (seat_id, row_num, column_number, class_type) in enumerate(layout["seats"]):
+        fsid = flight_seat_ids[i]
+        if fsid is None:
+            continue
+        available = bits[i >> 3] & (1 << (i & 7))
+        by_class.setdefault(class_type, []).append({
+            "flight_seat_id": fsid,
+            "status": "available" if available else "booked",
+            "row_num": row_num,
+            "column_number": column_number,
+            "class_type": class_type,
+        })
+
+    seats_by_class = {}
+    grid_by_class = {}
+    for class_type in CLASS_ORDER:
+        if by_class.get(class_type):
+            seats_by_class[class_type] = by_class[class_type]
+            grid_by_class[class_type] = dict(layout["grid"][class_type])
+    return seats_by_class, grid_by_class
+
+
+def _set_bits(flight_id, flight_seat_ids, available):
+    wanted = {int(x) for x in flight_seat_ids}
+
+    def apply(availability):
+        bits = bytearray(availability["bits"])
+        for i, fsid in enumerate(availability["flight_seat_ids"]):
+            if fsid in wanted:
+                if available:
+                    bits[i >> 3] |= 1 << (i & 7)
+                else:
+                    bits[i >> 3] &= ~(1 << (i & 7)) & 0xFF
+        return {"flight_seat_ids": availability["flight_seat_ids"], "bits": bits}
+
+    availability_cache.update(_availability_key(flight_id), apply)
+
+
+def mark_booked(flight_id, flight_seat_ids):
+    '''
+    write-through אחרי הזמנה: מסמנת את המושבים כתפוסים במפת הזמינות השמורה
+    '''
+    _set_bits(flight_id, flight_seat_ids, available=False)
+
+
+def mark_available(flight_id, flight_seat_ids):
+    '''
+    write-through אחרי ביטול הזמנה: מחזירה את המושבים לזמינות במפת הזמינות השמורה
+    '''
+    _set_bits(flight_id, flight_seat_ids, available=True)
+
+
+def invalidate_flight(flight_id):
+    '''
+    מוחקת את מפת הזמינות השמורה של טיסה (למשל אחרי ביטול טיסה)
+    '''
+    availability_cache.delete(_availability_key(flight_id))
+
+
+def invalidate_plane(plane_id):
+    '''
+    מוחקת את מבנה המטוס השמור (אחרי שינוי במושבים / מחלקות של המטוס)
+    '''
+    layout_cache.delete(_layout_key(plane_id))
@@ -262,24 +262,24 @@ SELECT flight_seat_id INTO @fs5 FROM FlightSeat WHERE flight_id=@f5 AND seat_id=
 SELECT flight_seat_id INTO @fs6 FROM FlightSeat WHERE flight_id=@f6 AND seat_id=@s_pl2_2_1;
 
 -- Orders (original 4 + 2 new)
-INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment) VALUES
-(@f1,'elli.brinker@example.com',CURDATE(),'paid',500.00); SET @o1 = LAST_INSERT_ID();
+INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment, departure_dt) VALUES
+(@f1,'elli.brinker@example.com',CURDATE(),'paid',500.00, (SELECT departure_dt FROM Flight WHERE flight_id=@f1)); SET @o1 = LAST_INSERT_ID();
 
-INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment) VALUES
-(@f1,'guest1@example.com',CURDATE(),'paid',500.00); SET @o2 = LAST_INSERT_ID();
+INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment, departure_dt) VALUES
+(@f1,'guest1@example.com',CURDATE(),'paid',500.00, (SELECT departure_dt FROM Flight WHERE flight_id=@f1)); SET @o2 = LAST_INSERT_ID();
 
-INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment) VALUES
-(@f2,'stav.abraham@example.com',CURDATE(),'paid',600.00); SET @o3 = LAST_INSERT_ID();
+INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment, departure_dt) VALUES
+(@f2,'stav.abraham@example.com',CURDATE(),'paid',600.00, (SELECT departure_dt FROM Flight WHERE flight_id=@f2)); SET @o3 = LAST_INSERT_ID();
 
-INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment) VALUES
-(@f2,'guest2@example.com',CURDATE(),'paid',600.00); SET @o4 = LAST_INSERT_ID();
+INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment, departure_dt) VALUES
+(@f2,'guest2@example.com',CURDATE(),'paid',600.00, (SELECT departure_dt FROM Flight WHERE flight_id=@f2)); SET @o4 = LAST_INSERT_ID();
 
 -- NEW orders
-INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment) VALUES
-(@f5,'elli.brinker@example.com',CURDATE(),'paid',350.00); SET @o5 = LAST_INSERT_ID();
+INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment, departure_dt) VALUES
+(@f5,'elli.brinker@example.com',CURDATE(),'paid',350.00, (SELECT departure_dt FROM Flight WHERE flight_id=@f5)); SET @o5 = LAST_INSERT_ID();
 
-INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment) VALUES
-(@f6,'guest1@example.com',CURDATE(),'paid',900.00); SET @o6 = LAST_INSERT_ID();
+INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment, departure_dt) VALUES
+(@f6,'guest1@example.com',CURDATE(),'paid',900.00, (SELECT departure_dt FROM Flight WHERE flight_id=@f6)); SET @o6 = LAST_INSERT_ID();
 
 INSERT INTO OrderItem (order_id, flight_seat_id) VALUES
 (@o1, @fs1),
@@ -324,8 +324,8 @@ WHERE flight_id = @f1 AND seat_id = @s_pl1_b_3_1
 ORDER BY flight_seat_id DESC
 LIMIT 1;
 
-INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment)
-VALUES (@f1, 'guest2@example.com', CURDATE(), 'paid', 900.00);
+INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment, departure_dt)
+VALUES (@f1, 'guest2@example.com', CURDATE(), 'paid', 900.00, (SELECT departure_dt FROM Flight WHERE flight_id=@f1));
 SET @o7 = LAST_INSERT_ID();
 
 INSERT INTO OrderItem (order_id, flight_seat_id)
@@ -355,8 +355,8 @@ WHERE flight_id = @f2 AND seat_id = @s_pl2_b_3_1
 ORDER BY flight_seat_id DESC
 LIMIT 1;
 
-INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment)
-VALUES (@f2, 'guest1@example.com', CURDATE(), 'paid', 1100.00);
+INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment, departure_dt)
+VALUES (@f2, 'guest1@example.com', CURDATE(), 'paid', 1100.00, (SELECT departure_dt FROM Flight WHERE flight_id=@f2));
 SET @o8 = LAST_INSERT_ID();
 
 INSERT INTO OrderItem (order_id, flight_seat_id)
@@ -399,8 +399,8 @@ ORDER BY flight_seat_id DESC
 LIMIT 1;
 
 -- 5) Order + item
-INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment)
-VALUES (@f7, 'stav.abraham@example.com', CURDATE(), 'paid', 400.00);
+INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment, departure_dt)
+VALUES (@f7, 'stav.abraham@example.com', CURDATE(), 'paid', 400.00, (SELECT departure_dt FROM Flight WHERE flight_id=@f7));
 SET @o9 = LAST_INSERT_ID();
 
 INSERT INTO OrderItem (order_id, flight_seat_id)
@@ -441,8 +441,8 @@ WHERE flight_id = @f1 AND seat_id = @s_pl1_r_4_1
 ORDER BY flight_seat_id DESC
 LIMIT 1;
 
-INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment)
-VALUES (@f1, 'guest1@example.com', '2025-09-05', 'customer cancelled', 25.00);
+INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment, departure_dt)
+VALUES (@f1, 'guest1@example.com', '2025-09-05', 'customer cancelled', 25.00, (SELECT departure_dt FROM Flight WHERE flight_id=@f1));
 SET @o10 = LAST_INSERT_ID();
 
 INSERT INTO OrderItem (order_id, flight_seat_id)
@@ -475,8 +475,8 @@ WHERE flight_id = @f2 AND seat_id = @s_pl2_r_4_1
 ORDER BY flight_seat_id DESC
 LIMIT 1;
 
-INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment)
-VALUES (@f2, 'guest2@example.com', '2025-10-10', 'paid', 600.00);
+INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment, departure_dt)
+VALUES (@f2, 'guest2@example.com', '2025-10-10', 'paid', 600.00, (SELECT departure_dt FROM Flight WHERE flight_id=@f2));
 SET @o11 = LAST_INSERT_ID();
 
 INSERT INTO OrderItem (order_id, flight_seat_id)
@@ -509,8 +509,8 @@ WHERE flight_id = @f5 AND seat_id = @s_pl7_r_3_1
 ORDER BY flight_seat_id DESC
 LIMIT 1;
 
-INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment)
-VALUES (@f5, 'elli.brinker@example.com', '2025-11-12', 'system_cancelled', 0.00);
+INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment, departure_dt)
+VALUES (@f5, 'elli.brinker@example.com', '2025-11-12', 'system_cancelled', 0.00, (SELECT departure_dt FROM Flight WHERE flight_id=@f5));
 SET @o12 = LAST_INSERT_ID();
 
 INSERT INTO OrderItem (order_id, flight_seat_id)
@@ -543,8 +543,8 @@ WHERE flight_id = @f6 AND seat_id = @s_pl8_r_3_1
 ORDER BY flight_seat_id DESC
 LIMIT 1;
 
-INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment)
-VALUES (@f6, 'stav.abraham@example.com', '2025-12-20', 'paid', 900.00);
+INSERT INTO FlightOrder (flight_id, email, execution_date, status, total_payment, departure_dt)
+VALUES (@f6, 'stav.abraham@example.com', '2025-12-20', 'paid', 900.00, (SELECT departure_dt FROM Flight WHERE flight_id=@f6));
 SET @o13 = LAST_INSERT_ID();
 
 INSERT INTO OrderItem (order_id, flight_seat_id)
@@ -553,3 +553,97 @@ VALUES (@o13, @fs13);
 UPDATE FlightSeat
 SET status = 'booked'
 WHERE flight_seat_id = @fs13;
+
+
+-- =========================================================
+-- Seat counters (FlightClassAvailability) from the seeded FlightSeat rows
+-- (same recount as `flask --app main reconcile-seat-counters --fix`)
+-- =========================================================
+INSERT INTO FlightClassAvailability (flight_id, class_type, available_seats, booked_seats)
+SELECT
+  fs.flight_id,
+  s.class_type,
+  SUM(CASE WHEN LOWER(fs.status) = 'available' THEN 1 ELSE 0 END),
+  SUM(CASE WHEN LOWER(fs.status) <> 'available' THEN 1 ELSE 0 END)
+FROM FlightSeat fs
+JOIN Seat s ON s.seat_id = fs.seat_id
+GROUP BY fs.flight_id, s.class_type;
+
+
+-- =========================================================
+-- Resource timeline (ResourceTimeline) from the seeded flights and crew placements
+-- (same rebuild as `flask --app main rebuild-resource-timeline`)
+-- =========================================================
+INSERT INTO ResourceTimeline
+  (resource_type, resource_id, flight_id, start_dt, end_dt, origin_airport, destination_airport)
+SELECT 'plane', f.plane_id, f.flight_id, f.departure_dt,
+       DATE_ADD(f.departure_dt, INTERVAL a.duration MINUTE),
+       f.origin_airport, f.destination_airport
+FROM Flight f
+JOIN Airway a
+  ON a.origin_airport = f.origin_airport
+ AND a.destination_airport = f.destination_airport
+WHERE f.status <> 'cancelled'
+UNION ALL
+SELECT 'crew', fcp.id, f.flight_id, f.departure_dt,
+       DATE_ADD(f.departure_dt, INTERVAL a.duration MINUTE),
+       f.origin_airport, f.destination_airport
+FROM FlightCrewPlacement fcp
+JOIN Flight f ON f.flight_id = fcp.flight_id
+JOIN Airway a
+  ON a.origin_airport = f.origin_airport
+ AND a.destination_airport = f.destination_airport
+WHERE f.status <> 'cancelled';
+
+
+-- =========================================================
+-- Report rollups: mark every seeded day as dirty; the first report run
+-- (or `flask --app main refresh-report-rollups`) computes the rollups
+-- =========================================================
+INSERT INTO ReportRollupDirty (day)
+SELECT departure_date FROM Flight
+UNION
+SELECT execution_date FROM FlightOrder;
+
+
+-- =========================================================
+-- Monthly plane activity from the seeded flights
+-- (same rebuild as `flask --app main rebuild-plane-activity`)
+-- =========================================================
+INSERT INTO PlaneMonthRoute
+  (plane_id, month, origin_airport, destination_airport, performed_flights, cancelled_flights, route_rank)
+SELECT plane_id, DATE_FORMAT(departure_date, '%Y-%m-01'), origin_airport, destination_airport,
+       SUM(CASE WHEN status <> 'cancelled' THEN 1 ELSE 0 END),
+       SUM(CASE WHEN status = 'cancelled' THEN 1 ELSE 0 END),
+       ROW_NUMBER() OVER (
+         PARTITION BY plane_id, DATE_FORMAT(departure_date, '%Y-%m-01')
+         ORDER BY SUM(CASE WHEN status <> 'cancelled' THEN 1 ELSE 0 END) DESC, origin_airport, destination_airport
+       )
+FROM Flight
+GROUP BY plane_id, DATE_FORMAT(departure_date, '%Y-%m-01'), origin_airport, destination_airport;
+
+INSERT INTO PlaneActiveDay (plane_id, month, day, flights)
+SELECT d.plane_id, d.month, d.day, COUNT(*)
+FROM (
+  SELECT f.plane_id, DATE_FORMAT(f.departure_date, '%Y-%m-01') AS month, f.departure_date AS day
+  FROM Flight f
+  WHERE f.status <> 'cancelled'
+  UNION ALL
+  SELECT f.plane_id, DATE_FORMAT(f.departure_date, '%Y-%m-01'),
+         DATE(DATE_ADD(f.departure_dt, INTERVAL a.duration MINUTE))
+  FROM Flight f
+  JOIN Airway a
+    ON a.origin_airport = f.origin_airport
+   AND a.destination_airport = f.destination_airport
+  WHERE f.status <> 'cancelled'
+    AND DATE(DATE_ADD(f.departure_dt, INTERVAL a.duration MINUTE)) <> f.departure_date
+) d
+GROUP BY d.plane_id, d.month, d.day;
+
+INSERT INTO PlaneMonthActivity (plane_id, month, performed_flights, cancelled_flights, active_days, dominant_route)
+SELECT r.plane_id, r.month, SUM(r.performed_flights), SUM(r.cancelled_flights),
+       (SELECT COUNT(*) FROM PlaneActiveDay d WHERE d.plane_id = r.plane_id AND d.month = r.month),
+       MAX(CASE WHEN r.route_rank = 1 AND r.performed_flights > 0
+                THEN CONCAT(r.origin_airport, '-', r.destination_airport) END)
+FROM PlaneMonthRoute r
+GROUP BY r.plane_id, r.month;
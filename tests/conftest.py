@@ -59,4 +59,15 @@ def fake_db(monkeypatch):
         return FakeDBCur(cursor)
 
     monkeypatch.setattr(main, "db_cur", fake_db_cur)
-    return cursor
\ No newline at end of file
+    return cursor
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    import seatmap
+    import flights
+    import orders
+    orders.order_cache.clear()
+    seatmap.layout_cache.clear()
+    seatmap.availability_cache.clear()
+    flights.search_cache.clear()
+    yield
@@ -0,0 +1,58 @@
+from airways import AirwayIndex, is_long_duration
+
+
+ROWS = [
+    {"origin_airport": "TLV", "destination_airport": "ATH", "duration": 120},
+    {"origin_airport": "TLV", "destination_airport": "JFK", "duration": 660},
+    {"origin_airport": "ATH", "destination_airport": "TLV", "duration": 120},
+]
+
+
+def make_index(rows, fingerprint, check_interval=300):
+    calls = {"rows": 0, "fingerprint": 0}
+
+    def load_rows():
+        calls["rows"] += 1
+        return rows
+
+    def load_fingerprint():
+        calls["fingerprint"] += 1
+        return fingerprint[0]
+
+    return AirwayIndex(load_rows, load_fingerprint, check_interval=check_interval), calls
+
+
+def test_lookups():
+    index, _ = make_index(ROWS, ["v1"])
+    assert index.duration("TLV", "ATH") == 120
+    assert index.exists("ATH", "TLV")
+    assert not index.exists("ATH", "JFK")
+    assert index.destinations("TLV") == {"ATH", "JFK"}
+    assert index.is_long("TLV", "JFK") and not index.is_long("TLV", "ATH")
+
+
+def test_loaded_once_within_check_interval():
+    index, calls = make_index(ROWS, ["v1"])
+    for _ in range(5):
+        index.duration("TLV", "ATH")
+    assert calls == {"rows": 1, "fingerprint": 1}
+
+
+def test_reloads_only_when_fingerprint_changes():
+    fingerprint = ["v1"]
+    rows = list(ROWS)
+    index, calls = make_index(rows, fingerprint, check_interval=0)
+
+    index.duration("TLV", "ATH")
+    index.duration("TLV", "ATH")
+    assert calls["rows"] == 1 and index.version == 1
+
+    rows.append({"origin_airport": "ATH", "destination_airport": "JFK", "duration": 600})
+    fingerprint[0] = "v2"
+    assert index.exists("ATH", "JFK")
+    assert calls["rows"] == 2 and index.version == 2
+
+
+def test_long_flight_threshold():
+    assert not is_long_duration(360)
+    assert is_long_duration(361)
@@ -0,0 +1,379 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import availability
+
+
+START = datetime(2030, 5, 1, 10, 0)
+END = START + timedelta(hours=3)
+
+
+class ScriptedCursor:
+    """Answers the three availability queries from in-memory rows."""
+
+    def __init__(self, state_rows, planes, crew):
+        self.state_rows = state_rows
+        self.planes = planes
+        self.crew = crew
+        self.queries = []
+        self._rows = []
+
+    def execute(self, query, params=()):
+        self.queries.append((query, params))
+        if "FROM ResourceTimeline" in query:
+            self._rows = self.state_rows
+        elif "FROM Plane p" in query:
+            long_only = params[0] == 1
+            self._rows = [p for p in self.planes if not long_only or p["is_big"]]
+        elif "FROM Worker w" in query:
+            self._rows = self.crew
+        else:
+            raise AssertionError(query)
+
+    def fetchall(self):
+        return self._rows
+
+
+PLANES = [
+    {"plane_id": 1, "manufacturer": "Boeing", "purchase_date": None, "is_big": 1},
+    {"plane_id": 2, "manufacturer": "Airbus", "purchase_date": None, "is_big": 0},
+    {"plane_id": 3, "manufacturer": "Dassault", "purchase_date": None, "is_big": 1},
+    {"plane_id": 4, "manufacturer": "Boeing", "purchase_date": None, "is_big": 0},
+]
+CREW = [
+    {"id": 11, "first_name": "A", "last_name": "A", "is_pilot": 1, "is_attendant": 0},
+    {"id": 12, "first_name": "B", "last_name": "B", "is_pilot": 1, "is_attendant": 0},
+    {"id": 21, "first_name": "C", "last_name": "C", "is_pilot": 0, "is_attendant": 1},
+    {"id": 22, "first_name": "D", "last_name": "D", "is_pilot": 0, "is_attendant": 1},
+]
+STATE = [
+    {"kind": "plane", "resource_id": 1, "last_loc": "TLV", "busy": 0},
+    {"kind": "plane", "resource_id": 2, "last_loc": "TLV", "busy": 0},
+    {"kind": "plane", "resource_id": 2, "last_loc": None, "busy": 1},   # באוויר בזמן החלון
+    {"kind": "plane", "resource_id": 3, "last_loc": "ATH", "busy": 0},  # לא בשדה המוצא
+    # מטוס 4 לא טס אף פעם - נחשב בבסיס
+    {"kind": "crew", "resource_id": 11, "last_loc": "TLV", "busy": 0},
+    {"kind": "crew", "resource_id": 12, "last_loc": None, "busy": 1},
+    {"kind": "crew", "resource_id": 22, "last_loc": "ATH", "busy": 0},
+]
+
+
+def test_available_resources_filters_busy_and_location():
+    cursor = ScriptedCursor(STATE, PLANES, CREW)
+    planes, pilots, attendants = availability.available_resources(cursor, False, START, END, "TLV")
+
+    assert [p["plane_id"] for p in planes] == [1, 4]
+    assert planes[1]["last_loc"] is None
+    assert [p["id"] for p in pilots] == [11]
+    assert [a["id"] for a in attendants] == [21]
+    assert "is_pilot" not in pilots[0]
+    assert len(cursor.queries) == 3
+
+
+def test_available_resources_away_from_base():
+    cursor = ScriptedCursor(STATE, PLANES, CREW)
+    planes, pilots, attendants = availability.available_resources(cursor, True, START, END, "ATH")
+
+    assert [p["plane_id"] for p in planes] == [3]
+    assert pilots == []
+    assert [a["id"] for a in attendants] == [22]
+    assert "long_flight_training = 1" in cursor.queries[2][0]
+
+
+def test_state_query_parameters():
+    cursor = ScriptedCursor([], [], [])
+    availability.resource_state(cursor, START, END)
+    query, params = cursor.queries[0]
+    assert params == (START, START, END)
+    assert "MAX(end_dt) AS last_end" in query
+    assert "DATE_ADD" not in query
+
+
+def _timeline_rows():
+    t = datetime(2030, 5, 1)
+    return [
+        {"kind": "plane", "resource_id": 1, "start_dt": t + timedelta(hours=8), "end_dt": t + timedelta(hours=10), "flight_id": 100},
+        {"kind": "crew", "resource_id": 11, "start_dt": t + timedelta(hours=8), "end_dt": t + timedelta(hours=10), "flight_id": 100},
+        {"kind": "plane", "resource_id": 1, "start_dt": t + timedelta(hours=2), "end_dt": t + timedelta(hours=20), "flight_id": 101},
+        {"kind": "crew", "resource_id": 12, "start_dt": t + timedelta(hours=12), "end_dt": t + timedelta(hours=14), "flight_id": 102},
+    ]
+
+
+def make_schedule_index(rows, fingerprint):
+    calls = {"rows": 0, "fingerprint": 0}
+
+    def load_rows():
+        calls["rows"] += 1
+        return rows
+
+    def load_fingerprint():
+        calls["fingerprint"] += 1
+        return fingerprint[0]
+
+    return availability.ScheduleIndex(load_rows, load_fingerprint, check_interval=300), calls
+
+
+def test_schedule_index_batched_overlap():
+    index, calls = make_schedule_index(_timeline_rows(), [(4, 102)])
+    t = datetime(2030, 5, 1)
+    resources = [("plane", 1), ("crew", 11), ("crew", 12), ("crew", 13)]
+
+    # 10:00-12:00 - נוגע בקצוות בלבד, אבל מטוס 1 באוויר עד 20:00 (טיסה 101)
+    assert index.overlapping(resources, t + timedelta(hours=10), t + timedelta(hours=12)) == {("plane", 1)}
+    assert index.overlapping(resources, t + timedelta(hours=9), t + timedelta(hours=13)) == {
+        ("plane", 1), ("crew", 11), ("crew", 12),
+    }
+    assert index.overlapping(resources, t + timedelta(hours=21), t + timedelta(hours=22)) == set()
+    assert calls == {"rows": 1, "fingerprint": 1}
+
+
+def test_schedule_index_write_through_and_reload():
+    # טביעת האצבע של המסד: (מספר שורות ב-ResourceTimeline, flight_id מקסימלי)
+    fingerprint = [(4, 102)]
+    index, calls = make_schedule_index(_timeline_rows(), fingerprint)
+    t = datetime(2030, 5, 1)
+    window = (t + timedelta(hours=21), t + timedelta(hours=22))
+
+    assert index.overlapping([("crew", 13)], *window) == set()
+    index.add_flight(200, 5, [13], t + timedelta(hours=20), t + timedelta(hours=23))
+    fingerprint[0] = (6, 200)
+    assert index.overlapping([("crew", 13), ("plane", 5)], *window) == {("crew", 13), ("plane", 5)}
+
+    index.remove_flight(101)
+    fingerprint[0] = (5, 200)
+    assert index.overlapping([("plane", 1)], t + timedelta(hours=15), t + timedelta(hours=16)) == set()
+
+    # max_age=0 בודק טביעת אצבע - אחרי העדכונים שלנו היא תואמת, ואין טעינה מחדש
+    index.overlapping([("plane", 1)], *window, max_age=0)
+    assert calls == {"rows": 1, "fingerprint": 2}
+    # שינוי בתהליך אחר גורם לטעינה מחדש
+    fingerprint[0] = (7, 201)
+    index.overlapping([("plane", 1)], *window, max_age=0)
+    assert calls == {"rows": 2, "fingerprint": 3}
+
+
+def test_schedule_index_cancelling_the_newest_flight_reloads_once():
+    rows = _timeline_rows()
+    fingerprint = [(4, 102)]
+    index, calls = make_schedule_index(rows, fingerprint)
+    t = datetime(2030, 5, 1)
+
+    index.overlapping([("crew", 12)], t, t + timedelta(hours=1))
+    index.remove_flight(102)
+    rows[:] = [r for r in rows if r["flight_id"] != 102]
+    fingerprint[0] = (3, 101)
+    assert index.overlapping([("crew", 12)], t + timedelta(hours=12), t + timedelta(hours=13), max_age=0) == set()
+    assert calls["rows"] == 2
+    index.overlapping([("crew", 12)], t, t + timedelta(hours=1), max_age=0)
+    assert calls["rows"] == 2
+
+
+class CrewCursor:
+    def __init__(self, people, last_locs):
+        self.people = people
+        self.last_locs = last_locs
+        self.queries = []
+        self._rows = []
+
+    def execute(self, query, params=()):
+        self.queries.append((query, params))
+        if "FROM Worker w" in query:
+            self._rows = [p for p in self.people if p["id"] in params]
+        elif "FROM ResourceTimeline" in query:
+            pairs = set(zip(params[:-1:2], params[1:-1:2]))
+            self._rows = [
+                {"kind": k, "resource_id": rid, "last_loc": loc}
+                for (k, rid), loc in self.last_locs.items() if (k, rid) in pairs
+            ]
+        else:
+            raise AssertionError(query)
+
+    def fetchall(self):
+        return self._rows
+
+
+class FakeIndex:
+    def __init__(self, busy):
+        self.busy = busy
+        self.calls = []
+
+    def overlapping(self, resources, start_dt, end_dt, max_age=None):
+        self.calls.append((list(resources), max_age))
+        return {r for r in resources if r in self.busy}
+
+
+def person(wid, pilot=0, attendant=0, manager=0, trained=1):
+    return {"id": wid, "is_pilot": pilot, "is_attendant": attendant,
+            "is_manager": manager, "long_flight_training": trained}
+
+
+def test_validate_crew_reports_every_violation_in_constant_queries():
+    people = [
+        person(1, pilot=1), person(2, pilot=1, trained=0), person(3, attendant=1, manager=1),
+        person(4, attendant=1), person(5, attendant=1), person(6, pilot=1),
+    ]
+    cursor = CrewCursor(people, {("plane", 9): "TLV", ("crew", 5): "ATH", ("crew", 1): "TLV"})
+    index = FakeIndex({("crew", 4)})
+
+    errors = availability.validate_crew(
+        cursor, 9, ["1", "2", "6", "4"], ["3", "4", "5", "x"], True, START, END, "TLV", index=index,
+    )
+
+    assert errors == [
+        "Pilot 2 is not trained for long flights.",
+        "Worker 4 is not a Pilot.",
+        "Worker 3 is a Manager and cannot be assigned as Attendant.",
+        "Worker 4 is selected more than once.",
+        "Worker x is not a Flight Attendant.",
+        "Pilot 4 is not available at this time (overlap).",
+        "Flight attendant 4 is not available at this time (overlap).",
+        "Flight attendant 5 is not at TLV at departure time (last known location: ATH).",
+    ]
+    assert len(cursor.queries) == 2
+    assert index.calls[0][1] == 0
+
+
+def test_validate_crew_ok_and_plane_location():
+    cursor = CrewCursor([person(1, pilot=1), person(2, attendant=1)], {("plane", 9): "ATH"})
+    assert availability.validate_crew(cursor, 9, ["1"], ["2"], False, START, END, "ATH", index=FakeIndex(set())) == [
+        "Pilot 1 is not at ATH at departure time (last known location: None).",
+        "Flight attendant 2 is not at ATH at departure time (last known location: None).",
+    ]
+    assert availability.validate_crew(cursor, 9, ["1"], ["2"], False, START, END, "TLV", index=FakeIndex(set())) == [
+        "Selected plane is not at TLV at departure time (last known location: ATH).",
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Benchmark against a real MySQL (opt-in, see test_search_plan.py):
+#   500 planes, 5,000 crew, 200,000 flights
+# ---------------------------------------------------------------------------
+
+MYSQL_ENV = {
+    "host": os.environ.get("FLYTAU_TEST_MYSQL_HOST"),
+    "user": os.environ.get("FLYTAU_TEST_MYSQL_USER"),
+    "password": os.environ.get("FLYTAU_TEST_MYSQL_PASSWORD", ""),
+    "database": os.environ.get("FLYTAU_TEST_MYSQL_DATABASE"),
+}
+N_PLANES = 500
+N_CREW = 5_000
+N_FLIGHTS = 200_000
+PLANE_BASE = 100_000
+CREW_BASE = 900_000_000
+
+requires_mysql = pytest.mark.skipif(
+    not (MYSQL_ENV["host"] and MYSQL_ENV["user"] and MYSQL_ENV["database"]),
+    reason="set FLYTAU_TEST_MYSQL_* to run the availability benchmark",
+)
+
+
+def _seq(n):
+    return f"WITH RECURSIVE seq (n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM seq WHERE n < {n - 1})"
+
+
+@pytest.fixture(scope="module")
+def bench_cursor():
+    import mysql.connector
+
+    conn = mysql.connector.connect(autocommit=True, **MYSQL_ENV)
+    cursor = conn.cursor(dictionary=True, buffered=True)
+    cursor.execute("SET SESSION cte_max_recursion_depth = %s", (N_FLIGHTS + 1,))
+
+    cursor.execute("SELECT COUNT(*) AS n FROM Flight WHERE plane_id > %s", (PLANE_BASE,))
+    if cursor.fetchone()["n"] < N_FLIGHTS:
+        cursor.executemany(
+            "INSERT IGNORE INTO Airway (origin_airport, destination_airport, duration) VALUES (%s, %s, %s)",
+            [("TLV", "BNC", 180), ("BNC", "TLV", 180)],
+        )
+        cursor.execute(
+            f"INSERT IGNORE INTO Plane (plane_id, manufacturer, purchase_date) "
+            f"{_seq(N_PLANES)} SELECT {PLANE_BASE} + n + 1, 'Boeing', '2020-01-01' FROM seq"
+        )
+        cursor.execute(
+            f"INSERT IGNORE INTO BigPlane (plane_id) {_seq(N_PLANES)} "
+            f"SELECT {PLANE_BASE} + n + 1 FROM seq WHERE n % 2 = 0"
+        )
+        cursor.execute(
+            f"INSERT IGNORE INTO Worker (id, first_name, last_name) {_seq(N_CREW)} "
+            f"SELECT {CREW_BASE} + n, 'Bench', CONCAT('Crew', n) FROM seq"
+        )
+        cursor.execute(
+            f"INSERT IGNORE INTO AirCrew (id, long_flight_training) {_seq(N_CREW)} "
+            f"SELECT {CREW_BASE} + n, n % 3 = 0 FROM seq"
+        )
+        cursor.execute(
+            f"INSERT IGNORE INTO Pilot (id) {_seq(N_CREW)} SELECT {CREW_BASE} + n FROM seq WHERE n % 3 = 0"
+        )
+        cursor.execute(
+            f"INSERT IGNORE INTO FlightAttendant (id) {_seq(N_CREW)} SELECT {CREW_BASE} + n FROM seq WHERE n % 3 <> 0"
+        )
+        # כל מטוס עושה הלוך-חזור TLV-BNC; כל טיסה מקבלת 5 אנשי צוות ברוטציה
+        cursor.execute(
+            f"""
+            INSERT INTO Flight (flight_id, plane_id, origin_airport, destination_airport, departure_date, departure_time, status)
+            {_seq(N_FLIGHTS)}
+            SELECT
+              {PLANE_BASE * 10} + n,
+              {PLANE_BASE} + (n % {N_PLANES}) + 1,
+              IF((n DIV {N_PLANES}) % 2 = 0, 'TLV', 'BNC'),
+              IF((n DIV {N_PLANES}) % 2 = 0, 'BNC', 'TLV'),
+              DATE_ADD('2024-01-01', INTERVAL (n DIV {N_PLANES}) DAY),
+              '08:00:00',
+              'open'
+            FROM seq
+            """
+        )
+        for k in range(5):
+            cursor.execute(
+                f"""
+                INSERT IGNORE INTO FlightCrewPlacement (flight_id, id)
+                {_seq(N_FLIGHTS)}
+                SELECT {PLANE_BASE * 10} + n, {CREW_BASE} + ((n * 5 + {k}) % {N_CREW})
+                FROM seq
+                """
+            )
+        cursor.execute("ANALYZE TABLE Flight, FlightCrewPlacement")
+
+    cursor.execute("SELECT COUNT(*) AS n FROM ResourceTimeline WHERE resource_id > %s", (PLANE_BASE,))
+    if cursor.fetchone()["n"] < N_FLIGHTS:
+        availability.rebuild_timeline(cursor)
+        cursor.execute("ANALYZE TABLE ResourceTimeline")
+
+    yield cursor
+    cursor.close()
+    conn.close()
+
+
+@requires_mysql
+def test_availability_benchmark(bench_cursor):
+    start_dt = datetime(2024, 1, 1) + timedelta(days=N_FLIGHTS // N_PLANES // 2, hours=9)
+    end_dt = start_dt + timedelta(hours=3)
+
+    t0 = time.perf_counter()
+    planes, pilots, attendants = availability.available_resources(bench_cursor, False, start_dt, end_dt, "TLV")
+    elapsed = time.perf_counter() - t0
+    print(f"\navailability: {elapsed * 1000:.0f} ms, "
+          f"{len(planes)} planes / {len(pilots)} pilots / {len(attendants)} attendants")
+
+    # באמצע הסימולציה כל המטוסים באוויר (08:00-11:00)
+    assert not any(p["plane_id"] > PLANE_BASE for p in planes)
+    assert elapsed < 5.0
+
+
+@requires_mysql
+def test_last_location_is_an_index_seek(bench_cursor):
+    bench_cursor.execute(
+        """
+        EXPLAIN FORMAT=JSON
+        SELECT destination_airport FROM ResourceTimeline
+        WHERE resource_type='plane' AND resource_id=%s AND end_dt <= %s
+        ORDER BY end_dt DESC LIMIT 1
+        """,
+        (PLANE_BASE + 1, datetime(2024, 6, 1)),
+    )
+    plan = bench_cursor.fetchone()["EXPLAIN"]
+    assert "idx_timeline_resource_end" in plan
+    assert "filesort" not in plan
@@ -0,0 +1,312 @@
+import random
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import main
+import flights
+import orders
+
+DEPARTURE = datetime(2030, 5, 1, 10, 0)
+
+
+class FakeDeadlock(Exception):
+    errno = 1213
+
+
+class FakeSeatStore:
+    """
+    In-memory FlightSeat/FlightOrder/OrderItem with per-row locks taken by
+    SELECT ... FOR UPDATE and released on commit/rollback.
+    """
+
+    def __init__(self, flight_id, n_seats, plane_id=1, deadlock_rate=0.0):
+        self.flight_id = flight_id
+        self.plane_id = plane_id
+        self.deadlock_rate = deadlock_rate
+        self.seats = {
+            fsid: {"status": "available", "class_type": "Regular" if fsid > 2 else "Business"}
+            for fsid in range(1, n_seats + 1)
+        }
+        self.row_locks = {fsid: threading.Lock() for fsid in self.seats}
+        self.counters = {"Regular": [0, 0], "Business": [0, 0]}  # [available, booked]
+        for seat in self.seats.values():
+            self.counters[seat["class_type"]][0] += 1
+        self.orders = {}
+        self.items = []
+        self.rollup_marks = []
+        self._meta = threading.Lock()
+        self._next_order = 1
+        self.deadlocks = 0
+        self.flight_status = "active"
+        self.departure_dt = DEPARTURE
+
+    @contextmanager
+    def tx(self):
+        cur = FakeTxCursor(self)
+        try:
+            yield cur
+            cur.commit()
+        except BaseException:
+            cur.rollback()
+            raise
+
+
+class FakeTxCursor:
+    def __init__(self, store):
+        self.store = store
+        self.held = []
+        self.undo = []
+        self.pending_orders = {}
+        self.pending_items = []
+        self.pending_counters = []
+        self.pending_marks = []
+        self._rows = []
+        self.rowcount = -1
+        self.lastrowid = None
+
+    def execute(self, query, params=()):
+        store = self.store
+        if "FOR SHARE" in query:
+            assert params == (store.flight_id,)
+            self._rows = [{"status": store.flight_status, "departure_dt": store.departure_dt}]
+        elif "FOR UPDATE" in query:
+            ids = [int(x) for x in params[1:]]
+            for fsid in ids:
+                if fsid in store.row_locks:
+                    if random.random() < store.deadlock_rate:
+                        with store._meta:
+                            store.deadlocks += 1
+                        raise FakeDeadlock("Deadlock found when trying to get lock")
+                    store.row_locks[fsid].acquire()
+                    self.held.append(fsid)
+            self._rows = [
+                {
+                    "flight_seat_id": fsid,
+                    "status": store.seats[fsid]["status"],
+                    "class_type": store.seats[fsid]["class_type"],
+                    "plane_id": store.plane_id,
+                    "row_num": (fsid - 1) // 6 + 1,
+                    "column_number": (fsid - 1) % 6 + 1,
+                }
+                for fsid in ids
+                if fsid in store.seats and params[0] == store.flight_id
+            ]
+        elif query.strip().startswith("UPDATE FlightSeat"):
+            ids = [int(x) for x in params[1:]]
+            self.rowcount = 0
+            for fsid in ids:
+                seat = store.seats.get(fsid)
+                if seat and seat["status"] == "available":
+                    self.undo.append(fsid)
+                    seat["status"] = "booked"
+                    self.rowcount += 1
+        elif query.strip().startswith("UPDATE FlightClassAvailability"):
+            delta_available, delta_booked, flight_id, class_type = params
+            assert flight_id == store.flight_id
+            self.pending_counters.append((class_type, -delta_available, delta_booked))
+        elif "classes_sold_out" in query:
+            sold_out = sum(
+                1 for class_type in params[:-1]
+                if not any(seat["status"] == "available" and seat["class_type"] == class_type
+                           for seat in store.seats.values())
+            )
+            self._rows = [{
+                "flight_id": store.flight_id, "origin_airport": "TLV", "destination_airport": "ATH",
+                "departure_date": DEPARTURE.date(), "departure_time": timedelta(hours=DEPARTURE.hour),
+                "departure_dt": DEPARTURE, "classes_sold_out": sold_out,
+            }]
+        elif "INSERT INTO FlightOrder" in query:
+            with store._meta:
+                order_id = store._next_order
+                store._next_order += 1
+            self.pending_orders[order_id] = params
+            self.lastrowid = order_id
+        elif "INSERT INTO ReportRollupDirty" in query:
+            self.pending_marks.append(params[0])
+        else:
+            raise AssertionError(f"unexpected query: {query}")
+
+    def executemany(self, query, seq):
+        assert "INSERT INTO OrderItem" in query
+        self.pending_items.extend(seq)
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def _release(self):
+        for fsid in self.held:
+            self.store.row_locks[fsid].release()
+        self.held = []
+
+    def commit(self):
+        with self.store._meta:
+            self.store.orders.update(self.pending_orders)
+            self.store.items.extend(self.pending_items)
+            self.store.rollup_marks.extend(self.pending_marks)
+            for class_type, d_avail, d_booked in self.pending_counters:
+                self.store.counters[class_type][0] += d_avail
+                self.store.counters[class_type][1] += d_booked
+        self._release()
+
+    def rollback(self):
+        for fsid in self.undo:
+            self.store.seats[fsid]["status"] = "available"
+        self.undo = []
+        self._release()
+
+
+@pytest.fixture
+def seat_store(monkeypatch):
+    store = FakeSeatStore(flight_id=7, n_seats=40, deadlock_rate=0.05)
+    monkeypatch.setattr(main, "db_tx", store.tx)
+    monkeypatch.setattr(flights.time, "sleep", lambda s: None)
+    return store
+
+
+def test_concurrent_booking_never_oversells(seat_store):
+    results = []
+    lock = threading.Lock()
+    start = threading.Barrier(32)
+
+    def customer(n):
+        rnd = random.Random(n)
+        start.wait()
+        for _ in range(20):
+            wanted = rnd.sample(range(1, 41), rnd.randint(1, 3))
+            try:
+                order_id, _ = flights.book_seats(
+                    7, f"c{n}@example.com", wanted, plane_id=1,
+                    regular_price=100, business_price=300,
+                )
+                outcome = ("ok", order_id, sorted(wanted))
+            except flights.SeatsUnavailable:
+                outcome = ("taken", None, sorted(wanted))
+            except FakeDeadlock:
+                outcome = ("deadlock", None, sorted(wanted))
+            with lock:
+                results.append(outcome)
+
+    threads = [threading.Thread(target=customer, args=(n,)) for n in range(32)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    sold = [fsid for _, fsid in seat_store.items]
+    assert len(sold) == len(set(sold)), "a seat was sold twice"
+
+    booked = {fsid for fsid, s in seat_store.seats.items() if s["status"] == "booked"}
+    assert booked == set(sold)
+
+    for class_type, (available, booked_count) in seat_store.counters.items():
+        seats = [s for s in seat_store.seats.values() if s["class_type"] == class_type]
+        assert booked_count == sum(1 for s in seats if s["status"] == "booked")
+        assert available == sum(1 for s in seats if s["status"] == "available")
+
+    ok_orders = {oid for kind, oid, _ in results if kind == "ok"}
+    assert ok_orders == set(seat_store.orders)
+    assert any(kind == "taken" for kind, _, _ in results)
+
+
+def test_taken_seat_reports_seat_ids(seat_store):
+    seat_store.deadlock_rate = 0
+    flights.book_seats(7, "a@example.com", [5, 6], plane_id=1, regular_price=100, business_price=None)
+    with pytest.raises(flights.SeatsUnavailable) as exc:
+        flights.book_seats(7, "b@example.com", [6, 7], plane_id=1, regular_price=100, business_price=None)
+    assert exc.value.flight_seat_ids == {6}
+    assert seat_store.seats[7]["status"] == "available"
+
+
+def test_total_payment_by_class(seat_store):
+    seat_store.deadlock_rate = 0
+    order_id, total = flights.book_seats(
+        7, "a@example.com", [1, 3], plane_id=1, regular_price=100, business_price=300
+    )
+    assert total == 400.0
+    assert sorted(fsid for oid, fsid in seat_store.items if oid == order_id) == [1, 3]
+    # ימי ההמראה והביצוע של ההזמנה מסומנים לחישוב מחדש של טבלאות הסיכום
+    assert seat_store.rollup_marks == [order_id]
+
+
+def test_deadlock_is_retried(seat_store, monkeypatch):
+    seat_store.deadlock_rate = 0
+    calls = {"n": 0}
+    real_tx = seat_store.tx
+
+    @contextmanager
+    def flaky_tx():
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise FakeDeadlock()
+        with real_tx() as cur:
+            yield cur
+
+    monkeypatch.setattr(main, "db_tx", flaky_tx)
+    order_id, _ = flights.book_seats(7, "a@example.com", [9], plane_id=1, regular_price=100, business_price=None)
+    assert calls["n"] == 2
+    assert order_id in seat_store.orders
+
+
+def test_selling_out_a_class_invalidates_route_search(seat_store, monkeypatch):
+    seat_store.deadlock_rate = 0
+    invalidated = []
+    monkeypatch.setattr(flights, "invalidate_route_search", lambda o, d: invalidated.append((o, d)))
+
+    flights.book_seats(7, "a@example.com", [1, 3], plane_id=1, regular_price=100, business_price=300)
+    assert invalidated == []
+
+    # Business נמכרה - Regular עדיין פתוחה, אבל הזמינות לפי מחלקה בחיפוש השתנתה
+    flights.book_seats(7, "a@example.com", [2], plane_id=1, regular_price=100, business_price=300)
+    assert invalidated == [("TLV", "ATH")]
+
+    flights.book_seats(7, "a@example.com", range(4, 40), plane_id=1, regular_price=100, business_price=None)
+    assert invalidated == [("TLV", "ATH")]
+
+    flights.book_seats(7, "a@example.com", [40], plane_id=1, regular_price=100, business_price=None)
+    assert invalidated == [("TLV", "ATH")] * 2
+
+
+def test_booking_populates_the_order_read_model(seat_store, client, monkeypatch):
+    seat_store.deadlock_rate = 0
+    order_id, _ = flights.book_seats(7, "a@example.com", [8, 1], plane_id=1, regular_price=100, business_price=300)
+
+    order = orders.order_cache.get(f"order:{order_id}")
+    assert order["status"] == "paid" and order["total_payment"] == 400.0
+    assert order["departure_dt"] == DEPARTURE and order["execution_date"] == date.today()
+    assert [(s["row_num"], s["column_number"], s["class_type"]) for s in order["seats"]] == [
+        (1, 1, "Business"), (2, 2, "Regular"),
+    ]
+
+    def no_db():
+        raise AssertionError("confirmation page should not query the database")
+
+    monkeypatch.setattr(main, "db_cur", no_db)
+    html = client.get(f"/order_success?order_id={order_id}&email=A@example.com").get_data(as_text=True)
+    assert "Row 2, Col 2" in html
+    # אימייל אחר לא מקבל את ההזמנה מהמטמון
+    assert orders.get_order(order_id, "b@example.com") is None
+
+
+
+@pytest.mark.parametrize("change, message", [
+    ({"flight_status": "cancelled"}, "cancelled"),
+    ({"departure_dt": datetime(2020, 1, 1)}, "departed"),
+])
+def test_flight_closed_after_precheck_is_caught_in_the_transaction(seat_store, change, message):
+    seat_store.deadlock_rate = 0
+    # דף המושבים בדק את הטיסה כשהייתה פתוחה; לפני הטרנזקציה היא בוטלה / המריאה
+    assert seat_store.flight_status == "active"
+    for attr, value in change.items():
+        setattr(seat_store, attr, value)
+
+    with pytest.raises(flights.FlightClosed, match=message):
+        flights.book_seats(7, "a@example.com", [3, 4], plane_id=1, regular_price=100, business_price=None)
+
+    assert seat_store.orders == {} and seat_store.items == []
+    assert all(seat["status"] == "available" for seat in seat_store.seats.values())
@@ -0,0 +1,57 @@
+import threading
+import time
+
+from cache import TTLCache
+
+
+def test_get_or_compute_is_single_flight():
+    cache = TTLCache(ttl=60)
+    calls = []
+    start = threading.Barrier(16)
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.05)
+        return ["result"]
+
+    results = []
+
+    def worker():
+        start.wait()
+        results.append(cache.get_or_compute("k", slow))
+
+    threads = [threading.Thread(target=worker) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [["result"]] * 16
+    assert cache.stats()["coalesced"] >= 1
+
+
+def test_entries_expire():
+    cache = TTLCache(ttl=0.01)
+    cache.set("k", "v")
+    assert cache.get("k") == "v"
+    time.sleep(0.02)
+    assert cache.get("k") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "coalesced": 0}
+
+
+def test_bump_namespace_changes_version():
+    cache = TTLCache()
+    assert cache.namespace_version("route:TLV:ATH") == 0
+    cache.bump_namespace("route:TLV:ATH")
+    assert cache.namespace_version("route:TLV:ATH") == 1
+    assert cache.namespace_version("route:TLV:ROM") == 0
+
+
+def test_update_keeps_expiry():
+    cache = TTLCache(ttl=0.02)
+    cache.set("k", 1)
+    time.sleep(0.015)
+    cache.update("k", lambda v: v + 1)
+    time.sleep(0.01)
+    assert cache.get("k") is None
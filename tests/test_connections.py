@@ -0,0 +1,105 @@
+import random
+import time
+from datetime import datetime, timedelta
+
+from connections import find_itineraries, usable_routes
+
+
+T0 = datetime(2030, 5, 1)
+
+
+def leg(flight_id, origin, dest, dep_hours, duration_min, price=100):
+    dep = T0 + timedelta(hours=dep_hours)
+    return {
+        "flight_id": flight_id,
+        "origin_airport": origin,
+        "destination_airport": dest,
+        "departure_dt": dep,
+        "arrival_dt": dep + timedelta(minutes=duration_min),
+        "regular_price": price,
+    }
+
+
+def ids(itinerary):
+    return [l["flight_id"] for l in itinerary["legs"]]
+
+
+def test_usable_routes_prunes_dead_ends():
+    routes = [("TLV", "ATH"), ("ATH", "ROM"), ("TLV", "LCA"), ("LCA", "NCE"), ("ROM", "TLV"), ("NCE", "ATH")]
+    assert sorted(usable_routes(routes, "TLV", "ROM", max_stops=1)) == [("ATH", "ROM"), ("TLV", "ATH")]
+    assert ("LCA", "NCE") in usable_routes(routes, "TLV", "ROM", max_stops=3)
+
+
+def test_minimum_connection_time_is_enforced():
+    legs = [
+        leg(1, "TLV", "ATH", 8, 120),      # נוחתת ב-10:00
+        leg(2, "ATH", "ROM", 10.5, 120),   # 30 דקות בלבד - לא חוקי
+        leg(3, "ATH", "ROM", 11, 120),     # שעה - חוקי
+    ]
+    result = find_itineraries(legs, "TLV", "ROM", T0, T0 + timedelta(days=1))
+    assert [ids(it) for it in result] == [[1, 3]]
+    assert result[0]["stops"] == 1
+    assert result[0]["airports"] == ["TLV", "ATH", "ROM"]
+    assert result[0]["duration_min"] == 300
+
+
+def test_ranked_by_duration_then_price_and_two_stops():
+    legs = [
+        leg(1, "TLV", "ATH", 8, 120, price=100),
+        leg(2, "ATH", "ROM", 11, 120, price=100),   # 1->2: 5 שעות
+        leg(3, "ATH", "ROM", 11, 120, price=50),    # 1->3: 5 שעות, זולה יותר
+        leg(4, "TLV", "LCA", 6, 60, price=10),
+        leg(5, "LCA", "NCE", 8, 180, price=10),
+        leg(6, "NCE", "ROM", 12, 60, price=10),     # 4->5->6: 7 שעות
+        leg(7, "TLV", "ROM", 9, 180),               # ישירה - לא נכללת (min_stops=1)
+    ]
+    result = find_itineraries(legs, "TLV", "ROM", T0, T0 + timedelta(days=1))
+    assert [ids(it) for it in result] == [[1, 3], [1, 2], [4, 5, 6]]
+
+    assert [ids(it) for it in find_itineraries(legs, "TLV", "ROM", T0, T0 + timedelta(days=1), max_stops=1)] == [[1, 3], [1, 2]]
+
+
+def test_first_leg_must_depart_in_window_and_no_loops():
+    legs = [
+        leg(1, "TLV", "ATH", 30, 120),          # מחוץ לחלון היום הראשון
+        leg(2, "ATH", "ROM", 35, 120),         # 25 שעות אחרי נחיתת 3 - מעל המקסימום
+        leg(3, "TLV", "ATH", 8, 120),
+        leg(4, "ATH", "TLV", 11, 120),
+        leg(5, "TLV", "ROM", 14, 180),
+    ]
+    result = find_itineraries(legs, "TLV", "ROM", T0, T0 + timedelta(days=1))
+    assert result == []
+
+
+def test_limit_keeps_best():
+    legs = [leg(1, "TLV", "ATH", 8, 120)]
+    legs += [leg(10 + i, "ATH", "ROM", 11 + i, 120) for i in range(8)]
+    result = find_itineraries(legs, "TLV", "ROM", T0, T0 + timedelta(days=1), limit=3)
+    assert [ids(it) for it in result] == [[1, 10], [1, 11], [1, 12]]
+
+
+def _year_schedule(n_airports=25, routes_per_airport=6, flights_per_day=3, seed=1):
+    rnd = random.Random(seed)
+    airports = [f"A{i:02d}" for i in range(n_airports)]
+    legs = []
+    fid = 0
+    for a in airports:
+        for b in rnd.sample([x for x in airports if x != a], routes_per_airport):
+            duration = rnd.randint(60, 600)
+            for day in range(365):
+                for k in range(flights_per_day):
+                    fid += 1
+                    legs.append(leg(fid, a, b, day * 24 + rnd.uniform(0, 24), duration, rnd.randint(80, 900)))
+    return airports, legs
+
+
+def test_year_of_schedule_is_fast():
+    airports, legs = _year_schedule()
+    assert len(legs) > 150_000
+
+    start = time.perf_counter()
+    for origin, dest in [("A00", "A13"), ("A05", "A21"), ("A17", "A02")]:
+        find_itineraries(legs, origin, dest, T0 + timedelta(days=100), T0 + timedelta(days=101))
+    elapsed = time.perf_counter() - start
+    # כולל בניית האינדקס לפי שדה על כל השנה - בפועל load_legs מביא רק את החלון הרלוונטי
+    assert elapsed < 3.0, elapsed
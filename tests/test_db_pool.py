@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+
+from db_pool import ConnectionPool, PoolTimeout
+
+
+class FakeConn:
+    def __init__(self):
+        self.closed = False
+        self.alive = True
+        self.in_transaction = False
+        self.rolled_back = False
+
+    def is_connected(self):
+        return self.alive
+
+    def rollback(self):
+        self.rolled_back = True
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_connections_are_reused():
+    pool = ConnectionPool(FakeConn, size=2, max_overflow=0)
+    c1 = pool.acquire()
+    pool.release(c1)
+    c2 = pool.acquire()
+    assert c1 is c2
+    assert pool.stats()["created"] == 1
+
+
+def test_overflow_connection_is_closed_on_release():
+    pool = ConnectionPool(FakeConn, size=1, max_overflow=1)
+    c1 = pool.acquire()
+    c2 = pool.acquire()
+    pool.release(c2)
+    assert c2.closed
+    pool.release(c1)
+    assert not c1.closed
+    assert pool.stats()["open"] == 1
+
+
+def test_checkout_timeout():
+    pool = ConnectionPool(FakeConn, size=1, max_overflow=0, timeout=0.05)
+    pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    stats = pool.stats()
+    assert stats["waits"] == 1
+    assert stats["timeouts"] == 1
+
+
+def test_waiter_gets_released_connection():
+    pool = ConnectionPool(FakeConn, size=1, max_overflow=0, timeout=2)
+    c1 = pool.acquire()
+    got = []
+    t = threading.Thread(target=lambda: got.append(pool.acquire()))
+    t.start()
+    pool.release(c1)
+    t.join()
+    assert got == [c1]
+
+
+def test_dead_connection_is_recycled_on_borrow():
+    pool = ConnectionPool(FakeConn, size=1, max_overflow=0)
+    c1 = pool.acquire()
+    c1.alive = False
+    pool.release(c1)
+    c2 = pool.acquire()
+    assert c2 is not c1 and c1.closed
+    assert pool.stats()["recycled"] == 1
+
+
+def test_expired_connection_is_recycled():
+    pool = ConnectionPool(FakeConn, size=1, max_overflow=0, max_lifetime=1e-9)
+    c1 = pool.acquire()
+    pool.release(c1)
+    c2 = pool.acquire()
+    assert c2 is not c1
+
+
+def test_open_transaction_is_rolled_back_on_release():
+    pool = ConnectionPool(FakeConn, size=1, max_overflow=0)
+    c1 = pool.acquire()
+    c1.in_transaction = True
+    pool.release(c1)
+    assert c1.rolled_back
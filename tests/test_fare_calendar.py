@@ -0,0 +1,54 @@
+from datetime import date, timedelta
+
+import flights
+
+
+def test_fare_calendar_one_query_for_the_month(client, fake_db):
+    fake_db.set_all([
+        {"day": date(2030, 2, 3), "flights": 2, "regular_price": 120, "business_price": None,
+         "regular_seats": 15, "business_seats": 0},
+        {"day": date(2030, 2, 10), "flights": 1, "regular_price": 90, "business_price": 400,
+         "regular_seats": 3, "business_seats": 2},
+    ])
+
+    resp = client.get("/fare_calendar?origin=TLV&destination=ATH&month=2030-02")
+    assert resp.status_code == 200
+    data = resp.get_json()
+
+    assert data["month"] == "2030-02"
+    assert len(data["days"]) == 28
+    assert data["days"][2] == {
+        "date": "2030-02-03", "flights": 2, "regular_price": 120.0, "business_price": None,
+        "regular_seats": 15, "business_seats": 0,
+    }
+    assert data["days"][0]["flights"] == 0 and data["days"][0]["regular_price"] is None
+
+    params = fake_db.last_params
+    assert params[:2] == ("TLV", "ATH")
+    assert params[3] - params[2] == timedelta(days=28)
+    assert "GROUP BY DATE(f.departure_dt)" in fake_db.last_query
+
+
+def test_fare_calendar_is_cached_per_route_version(client, fake_db, monkeypatch):
+    calls = []
+    real = flights.get_fare_calendar
+
+    def counting(*args):
+        calls.append(args)
+        return real(*args)
+
+    monkeypatch.setattr(flights, "get_fare_calendar", counting)
+    url = "/fare_calendar?origin=TLV&destination=ATH&month=2030-02"
+    client.get(url)
+    client.get(url)
+    assert len(calls) == 1
+
+    flights.invalidate_route_search("TLV", "ATH")
+    client.get(url)
+    assert len(calls) == 2
+
+
+def test_fare_calendar_validation(client):
+    resp = client.get("/fare_calendar?origin=TLV&destination=TLV&month=2030-13")
+    assert resp.status_code == 400
+    assert resp.get_json()["errors"] == ["Origin and destination cannot be the same", "Invalid month"]
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+import admin
+
+
+def _flight(flight_id, dep, status="active"):
+    return {
+        "flight_id": flight_id, "origin_airport": "TLV", "destination_airport": "ATH",
+        "departure_date": dep.date(), "departure_time": timedelta(hours=dep.hour, minutes=dep.minute),
+        "departure_dt": dep, "db_status": "open", "available_seats": 3, "total_seats": 10,
+        "manager_status": status,
+    }
+
+
+def _login(client):
+    with client.session_transaction() as sess:
+        sess["is_manager"] = True
+
+
+def test_board_pages_by_departure_and_id(client, fake_db, monkeypatch):
+    monkeypatch.setattr(admin, "FLIGHT_BOARD_PAGE_SIZE", 2)
+    dep = datetime(2030, 5, 1, 10, 0)
+    # LIMIT page_size + 1 - השורה השלישית רק מסמנת שיש עמוד הבא
+    fake_db.set_all([_flight(5, dep), _flight(9, dep), _flight(12, dep + timedelta(hours=1))])
+    _login(client)
+
+    resp = client.get("/admin/flights?origin=TLV&status=active&after=2030-05-01T08:00:00_3")
+
+    assert resp.status_code == 200
+    html = resp.get_data(as_text=True)
+    assert "Showing: <b>2</b>" in html
+    assert "/admin/flights?origin=TLV&amp;status=active&amp;after=2030-05-01T10%3A00%3A00_9" in html
+    assert "First page" in html
+
+    q = " ".join(fake_db.last_query.split())
+    inner, outer = q.split(") f LEFT JOIN FlightClassAvailability")
+    # הסינון לפי סטטוס והדפדוף קורים על Flight, לפני החיבור למונים וה-GROUP BY
+    assert "EXISTS (SELECT 1 FROM FlightClassAvailability x" in inner
+    assert "(f.departure_dt > %s OR (f.departure_dt = %s AND f.flight_id > %s))" in inner
+    assert inner.rstrip().endswith("ORDER BY f.departure_dt, f.flight_id LIMIT %s")
+    assert "HAVING" not in outer
+    after = datetime(2030, 5, 1, 8, 0)
+    assert fake_db.last_params == ("TLV", after, after, 3, 3)
+
+
+def test_board_last_page_has_no_next_link(client, fake_db):
+    fake_db.set_all([_flight(5, datetime(2030, 5, 1, 10, 0))])
+    _login(client)
+
+    html = client.get("/admin/flights?status=bogus").get_data(as_text=True)
+
+    assert "Next page" not in html and "First page" not in html
+    q = " ".join(fake_db.last_query.split())
+    assert "WHERE 1=1 ORDER BY" in q
+    assert fake_db.last_params == (admin.FLIGHT_BOARD_PAGE_SIZE + 1,)
+
+
+def test_board_json_page(client, fake_db):
+    dep = datetime(2030, 5, 1, 10, 30)
+    fake_db.set_all([_flight(5, dep, "full"), _flight(6, dep)])
+    _login(client)
+
+    data = client.get("/admin/flights/page?limit=1&status=full").get_json()
+
+    assert data == {
+        "flights": [{
+            "flight_id": 5, "origin_airport": "TLV", "destination_airport": "ATH",
+            "departure_date": "2030-05-01", "departure_time": "10:30", "status": "full",
+            "db_status": "open", "available_seats": 3, "total_seats": 10,
+        }],
+        "next": "2030-05-01T10:30:00_5",
+    }
+    assert "NOT EXISTS" in fake_db.last_query
+
+
+def test_board_json_rejects_bad_params(client, fake_db):
+    _login(client)
+    resp = client.get("/admin/flights/page?after=yesterday&limit=500&status=late")
+    assert resp.status_code == 400
+    assert resp.get_json()["errors"] == [
+        "Invalid cursor",
+        f"limit must be between 1 and {admin.FLIGHT_BOARD_MAX_PAGE_SIZE}",
+        "Invalid status",
+    ]
+    assert fake_db.last_query is None
+
+
+def test_board_requires_manager(client, fake_db):
+    assert client.get("/admin/flights/page").status_code == 302
@@ -0,0 +1,246 @@
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import main
+import orders
+import flight_cancellation
+
+
+class JobStore:
+    """FlightOrder rows and one FlightCancellationJob row, enough for run_job."""
+
+    def __init__(self, n_orders, fail_on_chunk=None):
+        self.orders = {oid: "paid" for oid in range(1, n_orders + 1)}
+        self.job = {"status": "pending", "processed_orders": 0, "total_orders": n_orders, "error": None}
+        self.chunks = []
+        self.finished = 0
+        self.fail_on_chunk = fail_on_chunk
+
+
+class JobCursor:
+    def __init__(self, store):
+        self.store = store
+        self._rows = []
+        self.rowcount = 0
+
+    def execute(self, query, params=()):
+        q = " ".join(query.split())
+        store, job = self.store, self.store.job
+        self._rows = []
+        if q.startswith("UPDATE FlightCancellationJob SET status='running'"):
+            self.rowcount = int(job["status"] != "done")
+            if self.rowcount:
+                job["status"] = "running"
+        elif q.startswith("SELECT order_id FROM FlightOrder"):
+            if store.fail_on_chunk == len(store.chunks):
+                raise RuntimeError("Lock wait timeout exceeded")
+            active = sorted(oid for oid, st in store.orders.items() if st == "paid")
+            self._rows = [{"order_id": oid} for oid in active[:params[1]]]
+            store.chunks.append([r["order_id"] for r in self._rows])
+        elif q.startswith("UPDATE FlightOrder"):
+            for oid in params:
+                store.orders[oid] = "system_cancelled"
+        elif q.startswith("UPDATE FlightCancellationJob SET processed_orders"):
+            job["processed_orders"] += params[0]
+        elif q.startswith("UPDATE FlightCancellationJob SET status='done'"):
+            job["status"], job["total_orders"] = "done", job["processed_orders"]
+            store.finished += 1
+        elif q.startswith("UPDATE FlightCancellationJob SET status='failed'"):
+            job["status"], job["error"] = "failed", params[0]
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+
+@pytest.fixture
+def job_store(monkeypatch):
+    holder = {}
+
+    @contextmanager
+    def fake_tx():
+        yield JobCursor(holder["store"])
+
+    monkeypatch.setattr(main, "db_tx", fake_tx)
+    monkeypatch.setattr(flight_cancellation.seat_counters, "recount_flight", lambda cursor, flight_id: None)
+    return holder
+
+
+def test_job_cancels_orders_in_chunks(job_store, monkeypatch):
+    store = job_store["store"] = JobStore(5)
+    forgotten = []
+    monkeypatch.setattr(orders, "forget", lambda ids: forgotten.extend(ids))
+
+    assert flight_cancellation.run_job(9, chunk_size=2) is True
+
+    assert store.chunks == [[1, 2], [3, 4], [5]]
+    assert set(store.orders.values()) == {"system_cancelled"}
+    assert store.job == {"status": "done", "processed_orders": 5, "total_orders": 5, "error": None}
+    assert forgotten == [1, 2, 3, 4, 5]
+
+    # עבודה שהסתיימה לא רצה שוב
+    assert flight_cancellation.run_job(9, chunk_size=2) is False
+    assert store.finished == 1
+
+
+def test_failed_job_resumes_without_double_processing(job_store):
+    store = job_store["store"] = JobStore(5, fail_on_chunk=1)
+
+    assert flight_cancellation.run_job(9, chunk_size=2) is False
+    assert store.job["status"] == "failed"
+    assert store.job["error"] == "Lock wait timeout exceeded"
+    assert store.job["processed_orders"] == 2
+
+    store.fail_on_chunk = None
+    assert flight_cancellation.run_job(9, chunk_size=2) is True
+    assert store.job["processed_orders"] == 5
+    assert store.job["status"] == "done"
+
+
+def test_worker_runs_queued_jobs_in_order():
+    ran = []
+    worker = flight_cancellation.CancellationWorker(run=ran.append)
+    for flight_id in (3, 1, 2):
+        worker.enqueue(flight_id)
+    worker.join()
+    assert ran == [3, 1, 2]
+
+
+class StartCursor:
+    def __init__(self, already_cancelled=False):
+        self.already_cancelled = already_cancelled
+        self.queries = []
+        self.rowcount = 0
+        self._rows = []
+
+    def execute(self, query, params=()):
+        q = " ".join(query.split())
+        self.queries.append((q, params))
+        self._rows = []
+        if q.startswith("UPDATE Flight SET status='cancelled'"):
+            self.rowcount = 0 if self.already_cancelled else 1
+        elif q.startswith("SELECT order_id FROM FlightOrder"):
+            self._rows = [{"order_id": n} for n in range(100, 142)]
+        elif "AS arrival_date" in q:
+            self._rows = [{"plane_id": 4, "departure_date": date(2030, 5, 2), "origin_airport": "TLV",
+                           "destination_airport": "ATH", "arrival_date": date(2030, 5, 2)}]
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return self._rows
+
+
+def test_start_cancellation_is_short_and_idempotent():
+    cursor = StartCursor()
+    assert flight_cancellation.start_cancellation(cursor, 9) == list(range(100, 142))
+
+    queries = [q for q, _ in cursor.queries]
+    # הבקשה לא נוגעת בהזמנות או במושבים - רק סופרת אותן לעבודה
+    assert not any(q.startswith(("UPDATE FlightOrder", "UPDATE FlightSeat")) for q in queries)
+    assert "DELETE FROM ResourceTimeline WHERE flight_id=%s" in queries
+    job_insert = next(p for q, p in cursor.queries if q.startswith("INSERT IGNORE INTO FlightCancellationJob"))
+    assert job_insert == (9, 42)
+
+    again = StartCursor(already_cancelled=True)
+    assert flight_cancellation.start_cancellation(again, 9) is None
+    assert len(again.queries) == 1
+
+
+def test_cancel_route_enqueues_and_reports_status(client, fake_db, monkeypatch):
+    dep = datetime.now() + timedelta(days=10)
+    fake_db.set_one({
+        "flight_id": 9, "origin_airport": "TLV", "destination_airport": "ATH",
+        "departure_date": dep.date(), "departure_time": timedelta(hours=dep.hour), "status": "open",
+        "available_seats": 5,
+    })
+    started, queued = [], []
+
+    @contextmanager
+    def fake_tx():
+        yield "tx-cursor"
+
+    monkeypatch.setattr(main, "db_tx", fake_tx)
+    monkeypatch.setattr(flight_cancellation, "start_cancellation",
+                        lambda cursor, flight_id: started.append(flight_id) or [11, 12])
+    monkeypatch.setattr(flight_cancellation.worker, "enqueue", queued.append)
+    with client.session_transaction() as sess:
+        sess["is_manager"] = True
+
+    cached = {"order_id": 11, "email": "a@b.com", "status": "paid", "total_payment": 300}
+    orders.order_cache.set("order:11", cached)
+    orders.order_cache.set("order:13", dict(cached, order_id=13))
+
+    resp = client.post("/admin/flights/cancel/9")
+    assert resp.status_code == 302 and resp.headers["Location"].endswith("/admin/flights/cancel/9")
+    assert started == [9] and queued == [9]
+    # ההזמנות של הטיסה יצאו מהמטמון כבר בבקשה, לפני שהעבודה הגיעה אליהן
+    assert orders.order_cache.get("order:11") is None
+    assert orders.order_cache.get("order:13") is not None
+    orders.order_cache.clear()
+
+    fake_db.set_one({
+        "flight_id": 9, "status": "running", "total_orders": 400, "processed_orders": 100, "error": None,
+        "created_at": datetime(2030, 1, 1, 12), "updated_at": datetime(2030, 1, 1, 12), "finished_at": None,
+    })
+    data = client.get("/admin/flights/cancel/9/status").get_json()
+    assert data == {
+        "flight_id": 9, "status": "running", "total_orders": 400, "processed_orders": 100,
+        "error": None, "created_at": "2030-01-01T12:00:00", "finished_at": None,
+    }
+
+    fake_db.set_one(None)
+    assert client.get("/admin/flights/cancel/9/status").status_code == 404
+
+
+def test_retry_requeues_only_failed_jobs(client, monkeypatch):
+    queued = []
+    states = {9: "failed", 10: "running"}
+
+    class RetryCursor:
+        rowcount = 0
+
+        def execute(self, query, params=()):
+            flight_id = params[0]
+            self.rowcount = int(states[flight_id] == "failed")
+            if self.rowcount:
+                states[flight_id] = "pending"
+
+    @contextmanager
+    def fake_tx():
+        yield RetryCursor()
+
+    monkeypatch.setattr(main, "db_tx", fake_tx)
+    monkeypatch.setattr(flight_cancellation.worker, "enqueue", queued.append)
+    with client.session_transaction() as sess:
+        sess["is_manager"] = True
+
+    assert client.post("/admin/flights/cancel/9/retry").status_code == 302
+    assert client.post("/admin/flights/cancel/10/retry").status_code == 302
+    assert queued == [9] and states == {9: "pending", 10: "running"}
+
+
+def test_customer_cannot_self_cancel_order_of_cancelled_flight(client, fake_db, monkeypatch):
+    # שורת מודל הקריאה כבר מחזירה system_cancelled להזמנה של טיסה שבוטלה
+    fake_db.set_all([{
+        "order_id": 11, "flight_id": 9, "email": "a@b.com", "execution_date": date(2030, 1, 1),
+        "status": "system_cancelled", "total_payment": 0, "origin_airport": "TLV",
+        "destination_airport": "ATH", "departure_date": date(2031, 1, 1), "departure_time": timedelta(hours=10),
+        "departure_dt": datetime(2031, 1, 1, 10), "flight_seat_id": None, "row_num": None,
+        "column_number": None, "class_type": None,
+    }])
+
+    @contextmanager
+    def no_tx():
+        raise AssertionError("no write expected")
+        yield
+
+    monkeypatch.setattr(main, "db_tx", no_tx)
+    resp = client.post("/cancel_order", data={"order_id": "11", "email": "a@b.com"})
+    assert resp.status_code == 302
+    assert "THEN 'system_cancelled'" in fake_db.last_query
@@ -0,0 +1,106 @@
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import main
+
+
+class OrdersCursor:
+    def __init__(self, orders=(), seats=(), counts=()):
+        self.orders = list(orders)
+        self.seats = list(seats)
+        self.counts = list(counts)
+        self.queries = []
+        self._rows = []
+
+    def execute(self, query, params=None):
+        q = " ".join(query.split())
+        self.queries.append((q, params))
+        if "FROM RegisteredCustomer" in q:
+            self._rows = [{"1": 1}]
+        elif "GROUP BY tab" in q:
+            self._rows = self.counts
+        elif "FROM OrderItem" in q:
+            self._rows = [s for s in self.seats if s["order_id"] in params]
+        else:
+            self._rows = self.orders
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return self._rows
+
+
+def _order(order_id, dep):
+    return {
+        "order_id": order_id, "flight_id": 3, "email": "a@b.com", "execution_date": date(2030, 1, 1),
+        "status": "paid", "total_payment": 100, "origin_airport": "TLV", "destination_airport": "ATH",
+        "departure_date": dep.date(), "departure_time": timedelta(hours=dep.hour), "departure_dt": dep,
+    }
+
+
+@pytest.fixture
+def orders_db(monkeypatch, client):
+    holder = {}
+
+    @contextmanager
+    def fake_db_cur():
+        yield holder["cursor"]
+
+    monkeypatch.setattr(main, "db_cur", fake_db_cur)
+    with client.session_transaction() as sess:
+        sess["user_email"] = "a@b.com"
+    return holder
+
+
+def test_orders_page_fetches_seats_for_the_page_only(client, orders_db, monkeypatch):
+    monkeypatch.setattr(main, "ORDERS_PAGE_SIZE", 2)
+    dep = datetime(2030, 5, 1, 10)
+    cursor = orders_db["cursor"] = OrdersCursor(
+        orders=[_order(30, dep), _order(20, dep), _order(10, dep - timedelta(days=1))],
+        seats=[{"order_id": oid, "row_num": 1, "column_number": 2, "class_type": "Regular"} for oid in (30, 20, 10)],
+        counts=[{"tab": "paid", "n": 2}, {"tab": "done", "n": 5}, {"tab": "customer_cancelled", "n": 1}],
+    )
+
+    html = client.get("/my_orders?status=paid&after=2030-06-01T09:00:00_44").get_data(as_text=True)
+
+    assert "Order #30" in html and "Order #20" in html and "Order #10" not in html
+    assert "Active (2)" in html and "All (8)" in html and "System Cancelled (0)" in html
+    assert "/my_orders?status=paid&amp;after=2030-05-01T10%3A00%3A00_20" in html
+    assert "Newest orders" in html
+
+    page_q, page_params = next((q, p) for q, p in cursor.queries if "ORDER BY fo.departure_dt DESC" in q)
+    assert "(fo.departure_dt < %s OR (fo.departure_dt = %s AND fo.order_id < %s))" in page_q
+    assert page_q.endswith("ORDER BY fo.departure_dt DESC, fo.order_id DESC LIMIT %s")
+    assert page_params[0] == "a@b.com"
+    assert page_params[2:] == (datetime(2030, 6, 1, 9), datetime(2030, 6, 1, 9), 44, 3)
+    seat_params = next(p for q, p in cursor.queries if "FROM OrderItem" in q)
+    assert seat_params == (30, 20)
+
+
+def test_orders_first_page_without_more_rows(client, orders_db):
+    orders_db["cursor"] = OrdersCursor(orders=[_order(7, datetime(2030, 5, 1, 10))])
+    html = client.get("/my_orders").get_data(as_text=True)
+    assert "Order #7" in html
+    assert "Older orders" not in html and "Newest orders" not in html
+
+
+def test_order_counts_in_one_grouped_query(client, orders_db):
+    cursor = orders_db["cursor"] = OrdersCursor(counts=[
+        {"tab": "done", "n": 4}, {"tab": "system_cancelled", "n": 2},
+    ])
+
+    data = client.get("/my_orders/counts").get_json()
+
+    assert data == {"all": 6, "paid": 0, "done": 4, "customer_cancelled": 0, "system_cancelled": 2}
+    grouped = [q for q, _ in cursor.queries if "GROUP BY" in q]
+    assert len(grouped) == 1
+    assert "WHEN fo.status='paid' AND f.status <> 'cancelled' AND fo.departure_dt < %s THEN 'done'" in grouped[0]
+    # הזמנות פעילות של טיסה שבוטלה נספרות כ-system_cancelled עוד לפני שעבודת הביטול עיבדה אותן
+    assert "WHEN f.status = 'cancelled' AND LOWER(fo.status) IN ('paid','active') THEN 'system_cancelled'" in grouped[0]
+
+
+def test_order_counts_require_login(client):
+    assert client.get("/my_orders/counts").status_code == 401
@@ -0,0 +1,45 @@
+from datetime import date, datetime, timedelta
+
+import orders
+
+
+def _row(**seat):
+    row = {
+        "order_id": 11, "flight_id": 3, "email": "a@b.com", "execution_date": date(2030, 1, 2),
+        "status": "paid", "total_payment": 200, "origin_airport": "TLV", "destination_airport": "ATH",
+        "departure_date": date(2030, 5, 1), "departure_time": timedelta(hours=10),
+        "departure_dt": datetime(2030, 5, 1, 10),
+        "flight_seat_id": None, "row_num": None, "column_number": None, "class_type": None,
+    }
+    row.update(seat)
+    return row
+
+
+def test_order_lookup_reads_order_and_seats_in_one_query(client, fake_db):
+    fake_db.set_all([
+        _row(flight_seat_id=5, row_num=1, column_number=2, class_type="Business"),
+        _row(flight_seat_id=9, row_num=4, column_number=1, class_type="Regular"),
+    ])
+
+    html = client.post("/order_lookup", data={"email": "a@b.com", "order_id": "11"}).get_data(as_text=True)
+
+    assert "TLV" in html and "ATH" in html
+    assert fake_db.last_params == (11, "a@b.com")
+    assert "LEFT JOIN OrderItem oi ON oi.order_id = fo.order_id" in fake_db.last_query
+
+    # הקריאה הבאה מגיעה מהמטמון
+    fake_db.set_all([])
+    order = orders.get_order(11, "a@b.com")
+    assert [s["flight_seat_id"] for s in order["seats"]] == [5, 9]
+
+
+def test_order_without_items_has_no_seats(fake_db):
+    fake_db.set_all([_row()])
+    assert orders.get_order(11, "a@b.com")["seats"] == []
+
+
+def test_unknown_order_is_not_cached(client, fake_db):
+    fake_db.set_all([])
+    html = client.post("/order_lookup", data={"email": "a@b.com", "order_id": "11"}).get_data(as_text=True)
+    assert "Order not found." in html
+    assert orders.order_cache.get("order:11") is None
@@ -0,0 +1,330 @@
+import os
+import re
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import pytest
+
+import main
+import report_rollups
+
+
+class ScriptedCursor:
+    def __init__(self, results):
+        self.results = dict(results)
+        self.queries = []
+        self.many = []
+        self._last = []
+
+    def execute(self, query, params=None):
+        q = " ".join(query.split())
+        self.queries.append((q, params))
+        self._last = next((rows for marker, rows in self.results.items() if marker in q and q.startswith("SELECT")), [])
+
+    def executemany(self, query, seq):
+        self.many.append((" ".join(query.split()), list(seq)))
+
+    def fetchall(self):
+        return self._last
+
+    def fetchone(self):
+        return self._last[0] if self._last else None
+
+
+D1, D2 = date(2030, 5, 1), date(2030, 5, 2)
+
+
+def test_compute_then_store_rewrites_every_rollup_for_the_given_days():
+    cursor = ScriptedCursor({
+        "total_seats": [{"flight_id": 9, "day": D1, "total_seats": 100, "taken_seats": 40}],
+        "AS cancelled_orders": [{"day": D2, "orders": 5, "cancelled_orders": 1}],
+    })
+
+    computed = report_rollups.compute_days(cursor, [D1, D2])
+    # שאילתות המקור הן קריאות בלבד, מסוננות לפי הימים לפני האגרגציה
+    assert all(q.startswith("SELECT") and "FOR UPDATE" not in q for q, _ in cursor.queries)
+    crew_select = next((q, p) for q, p in cursor.queries if "fcp.id AS worker_id" in q)
+    assert crew_select[1] == (report_rollups.LONG_FLIGHT_MIN, report_rollups.LONG_FLIGHT_MIN, D1, D2)
+
+    cursor = ScriptedCursor({})
+    cursor.rowcount = 3
+    report_rollups.store_days(cursor, [D1, D2], computed, [4, 7, 9])
+    deletes = [q for q, _ in cursor.queries if q.startswith("DELETE")]
+    assert deletes == [
+        "DELETE FROM ReportRollupDirty WHERE mark_id IN (%s,%s,%s)",
+        "DELETE FROM RollupFlightOccupancy WHERE day IN (%s,%s)",
+        "DELETE FROM RollupRevenueDaily WHERE day IN (%s,%s)",
+        "DELETE FROM RollupCrewMinutesDaily WHERE day IN (%s,%s)",
+        "DELETE FROM RollupOrdersDaily WHERE day IN (%s,%s)",
+    ]
+    assert cursor.many == [
+        ("INSERT INTO RollupFlightOccupancy (flight_id, day, total_seats, taken_seats) VALUES (%s, %s, %s, %s)",
+         [(9, D1, 100, 40)]),
+        ("INSERT INTO RollupOrdersDaily (day, orders, cancelled_orders) VALUES (%s, %s, %s)", [(D2, 5, 1)]),
+    ]
+
+
+def test_store_refuses_marks_already_claimed_by_another_refresh():
+    cursor = ScriptedCursor({})
+    cursor.rowcount = 1
+    with pytest.raises(report_rollups.MarksClaimed):
+        report_rollups.store_days(cursor, [D1], {t: [] for t in report_rollups._ROLLUPS}, [4, 7])
+    assert len(cursor.queries) == 1
+
+
+def test_refresh_reads_without_locks_and_writes_in_a_short_transaction(monkeypatch):
+    read = ScriptedCursor({"FROM ReportRollupDirty": [{"mark_id": 7, "day": D2}, {"mark_id": 8, "day": D1}]})
+    write = ScriptedCursor({})
+    write.rowcount = 2
+    opened = []
+
+    @contextmanager
+    def fake_cur():
+        opened.append("cur")
+        yield read
+
+    @contextmanager
+    def fake_tx():
+        opened.append("tx")
+        yield write
+
+    monkeypatch.setattr(main, "db_cur", fake_cur)
+    monkeypatch.setattr(main, "db_tx", fake_tx)
+
+    assert report_rollups.refresh_dirty(D1, D2) == 2
+    assert opened == ["cur", "tx"]
+    marks_q, params = read.queries[0]
+    assert "FOR UPDATE" not in marks_q
+    assert params == (D1, D2, report_rollups.REFRESH_BATCH_DAYS)
+    # הטרנזקציה רק מוחקת את הסימונים שנקראו וכותבת תוצאות - בלי שאילתות מקור
+    assert write.queries[0] == ("DELETE FROM ReportRollupDirty WHERE mark_id IN (%s,%s)", (7, 8))
+    assert all(not q.startswith("SELECT") for q, _ in write.queries)
+
+
+def test_refresh_without_marks_opens_no_transaction(monkeypatch):
+    @contextmanager
+    def fake_cur():
+        yield ScriptedCursor({})
+
+    def no_tx():
+        raise AssertionError("nothing to write")
+
+    monkeypatch.setattr(main, "db_cur", fake_cur)
+    monkeypatch.setattr(main, "db_tx", no_tx)
+    assert report_rollups.refresh_pending(D1, D2) == 0
+
+
+def _activity_cursor(departure, arrival):
+    return ScriptedCursor({"AS arrival_date": [{
+        "plane_id": 4, "departure_date": departure, "origin_airport": "TLV",
+        "destination_airport": "JFK", "arrival_date": arrival,
+    }]})
+
+
+def test_activity_add_flight_counts_departure_and_arrival_days():
+    cursor = _activity_cursor(date(2030, 5, 31), date(2030, 6, 1))
+    report_rollups.activity_add_flight(cursor, 77)
+
+    writes = [(q.split(" (")[0].split(" SET")[0], p) for q, p in cursor.queries if not q.startswith("SELECT")]
+    month = date(2030, 5, 1)
+    assert writes == [
+        # השורה החודשית קודם - היא הנעילה שמסדרת עדכונים מקבילים לאותו מטוס וחודש
+        ("INSERT INTO PlaneMonthActivity", (4, month, 1, 0)),
+        ("INSERT INTO PlaneMonthRoute", (4, month, "TLV", "JFK", 1, 0)),
+        # יום הנחיתה שייך לחודש ההמראה של הטיסה
+        ("INSERT INTO PlaneActiveDay", (4, month, date(2030, 5, 31), 1)),
+        ("INSERT INTO PlaneActiveDay", (4, month, date(2030, 6, 1), 1)),
+        ("DELETE FROM PlaneActiveDay WHERE plane_id=%s AND month=%s AND flights <= 0", (4, month)),
+        ("UPDATE PlaneMonthRoute r JOIN", (4, month)),
+        ("UPDATE PlaneMonthActivity a", (4, month)),
+    ]
+    rank = next(q for q, _ in cursor.queries if q.startswith("UPDATE PlaneMonthRoute"))
+    assert "ROW_NUMBER() OVER ( PARTITION BY plane_id, month ORDER BY performed_flights DESC" in rank
+
+
+def test_activity_cancel_flight_moves_performed_to_cancelled():
+    cursor = _activity_cursor(date(2030, 5, 2), date(2030, 5, 2))
+    report_rollups.activity_cancel_flight(cursor, 77)
+
+    params = [p for q, p in cursor.queries if q.startswith("INSERT")]
+    assert params == [
+        (4, date(2030, 5, 1), -1, 1),
+        (4, date(2030, 5, 1), "TLV", "JFK", -1, 1),
+        (4, date(2030, 5, 1), date(2030, 5, 2), -1),
+    ]
+
+
+def test_activity_ignores_unknown_flight():
+    cursor = ScriptedCursor({})
+    report_rollups.activity_add_flight(cursor, 77)
+    assert len(cursor.queries) == 1
+
+
+def _first_report_query():
+    sql = open(os.path.join(os.path.dirname(__file__), "..", "reports_queries.sql"), encoding="utf-8").read()
+    body = sql.split("=========================================================\n2)")[0]
+    return body[body.index("SELECT ROUND"):]
+
+
+@pytest.mark.parametrize("sql", [
+    _first_report_query(),
+    report_rollups._ROLLUPS["RollupFlightOccupancy"][0],
+], ids=["reports_queries.sql", "rollup_refresh"])
+def test_occupancy_filters_flights_before_aggregating_seats(sql):
+    # הסינון לפי תאריך וסטטוס נמצא לפני ה-GROUP BY של המושבים, ולא עוטף עמודות מאונדקסות
+    inner = sql[:sql.index("GROUP BY")]
+    assert "FROM Flight f" in inner and "JOIN FlightSeat fs" in inner
+    assert "f.departure_date" in inner.split("WHERE", 1)[1]
+    assert not re.search(r"LOWER\(\s*f\.status", sql)
+
+
+# ---------------------------------------------------------------------------
+# Occupancy benchmark against a real MySQL (opt-in, see test_search_plan.py):
+#   one week of flights out of FLYTAU_TEST_OCCUPANCY_FLIGHTS (default 250,000)
+#   flights x 200 seats = 50M FlightSeat rows
+# ---------------------------------------------------------------------------
+
+MYSQL_ENV = {
+    "host": os.environ.get("FLYTAU_TEST_MYSQL_HOST"),
+    "user": os.environ.get("FLYTAU_TEST_MYSQL_USER"),
+    "password": os.environ.get("FLYTAU_TEST_MYSQL_PASSWORD", ""),
+    "database": os.environ.get("FLYTAU_TEST_MYSQL_DATABASE"),
+}
+N_FLIGHTS = int(os.environ.get("FLYTAU_TEST_OCCUPANCY_FLIGHTS", 250_000))
+FLIGHTS_PER_DAY = 100
+SEAT_ROWS, SEAT_COLS = 40, 5
+BENCH_PLANE = 300_000
+BENCH_FLIGHT_BASE = 30_000_000
+INSERT_CHUNK = 5_000
+
+requires_mysql = pytest.mark.skipif(
+    not (MYSQL_ENV["host"] and MYSQL_ENV["user"] and MYSQL_ENV["database"]),
+    reason="set FLYTAU_TEST_MYSQL_* to run the occupancy benchmark",
+)
+
+# הגרסה הקודמת: אגרגציה של כל FlightSeat, ורק אחר כך סינון לפי תאריך
+LEGACY_OCCUPANCY_SQL = """
+    SELECT ROUND(AVG(t.occ_pct), 2) AS avg_occupancy_percent
+    FROM (
+      SELECT
+        fs.flight_id,
+        SUM(CASE WHEN LOWER(fs.status) <> 'available' THEN 1 ELSE 0 END) * 100.0 / COUNT(*) AS occ_pct
+      FROM FlightSeat fs
+      GROUP BY fs.flight_id
+    ) AS t
+    JOIN Flight AS f ON f.flight_id = t.flight_id
+    WHERE LOWER(f.status) <> 'cancelled'
+      AND f.departure_date BETWEEN %s AND %s
+"""
+
+
+def _seq(n):
+    return f"WITH RECURSIVE seq (n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM seq WHERE n < {n - 1})"
+
+
+@pytest.fixture(scope="module")
+def occupancy_cursor():
+    import mysql.connector
+
+    conn = mysql.connector.connect(autocommit=True, **MYSQL_ENV)
+    cursor = conn.cursor(dictionary=True, buffered=True)
+    cursor.execute("SET SESSION cte_max_recursion_depth = %s", (N_FLIGHTS + 1,))
+
+    cursor.execute("SELECT COUNT(*) AS n FROM Flight WHERE plane_id = %s", (BENCH_PLANE,))
+    if cursor.fetchone()["n"] < N_FLIGHTS:
+        cursor.execute("INSERT IGNORE INTO Airway (origin_airport, destination_airport, duration) VALUES ('TLV', 'OCC', 120)")
+        cursor.execute(
+            "INSERT IGNORE INTO Plane (plane_id, manufacturer, purchase_date) VALUES (%s, 'Airbus', '2020-01-01')",
+            (BENCH_PLANE,),
+        )
+        cursor.execute(
+            "INSERT IGNORE INTO Class (plane_id, class_type, rows_number, columns_number) VALUES (%s, 'Regular', %s, %s)",
+            (BENCH_PLANE, SEAT_ROWS, SEAT_COLS),
+        )
+        cursor.execute(
+            f"INSERT IGNORE INTO Seat (row_num, column_number, plane_id, class_type) {_seq(SEAT_ROWS * SEAT_COLS)} "
+            f"SELECT n DIV {SEAT_COLS} + 1, n % {SEAT_COLS} + 1, {BENCH_PLANE}, 'Regular' FROM seq"
+        )
+        cursor.execute(
+            f"""
+            INSERT IGNORE INTO Flight
+              (flight_id, plane_id, origin_airport, destination_airport, departure_date, departure_time, status)
+            {_seq(N_FLIGHTS)}
+            SELECT {BENCH_FLIGHT_BASE} + n, {BENCH_PLANE}, 'TLV', 'OCC',
+                   DATE_ADD('2015-01-01', INTERVAL n DIV {FLIGHTS_PER_DAY} DAY),
+                   SEC_TO_TIME((n % {FLIGHTS_PER_DAY}) * 600),
+                   IF(n % 25 = 0, 'cancelled', 'open')
+            FROM seq
+            """
+        )
+        # FlightSeat בנתחים, כדי שכל טרנזקציה תישאר קטנה
+        for lo in range(0, N_FLIGHTS, INSERT_CHUNK):
+            cursor.execute(
+                """
+                INSERT IGNORE INTO FlightSeat (flight_id, seat_id, status)
+                SELECT f.flight_id, s.seat_id,
+                       IF((f.flight_id * 31 + s.seat_id) % 100 < 70, 'booked', 'available')
+                FROM Flight f
+                JOIN Seat s ON s.plane_id = f.plane_id
+                WHERE f.flight_id BETWEEN %s AND %s
+                """,
+                (BENCH_FLIGHT_BASE + lo, BENCH_FLIGHT_BASE + lo + INSERT_CHUNK - 1),
+            )
+        cursor.execute("ANALYZE TABLE Flight, FlightSeat")
+
+    try:
+        yield cursor
+    finally:
+        _drop_bench_rows(cursor)
+        cursor.close()
+        conn.close()
+
+
+def _drop_bench_rows(cursor):
+    '''
+    מוחקת את נתוני הבנצ'מרק מהמסד המשותף (לפי סדר המפתחות הזרים), FlightSeat בנתחים
+    '''
+    for lo in range(0, N_FLIGHTS, INSERT_CHUNK):
+        cursor.execute(
+            "DELETE FROM FlightSeat WHERE flight_id BETWEEN %s AND %s",
+            (BENCH_FLIGHT_BASE + lo, BENCH_FLIGHT_BASE + lo + INSERT_CHUNK - 1),
+        )
+    cursor.execute("DELETE FROM Flight WHERE plane_id = %s", (BENCH_PLANE,))
+    cursor.execute("DELETE FROM Seat WHERE plane_id = %s", (BENCH_PLANE,))
+    cursor.execute("DELETE FROM Class WHERE plane_id = %s", (BENCH_PLANE,))
+    cursor.execute("DELETE FROM Plane WHERE plane_id = %s", (BENCH_PLANE,))
+    cursor.execute("DELETE FROM Airway WHERE origin_airport = 'TLV' AND destination_airport = 'OCC'")
+
+
+@requires_mysql
+def test_occupancy_benchmark_old_vs_pruned(occupancy_cursor):
+    first = date(2015, 1, 1) + timedelta(days=N_FLIGHTS // FLIGHTS_PER_DAY // 2)
+    days = [first + timedelta(days=i) for i in range(7)]
+
+    t0 = time.perf_counter()
+    occupancy_cursor.execute(LEGACY_OCCUPANCY_SQL, (days[0], days[-1]))
+    legacy = occupancy_cursor.fetchone()["avg_occupancy_percent"]
+    legacy_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    occupancy_cursor.execute(
+        report_rollups._ROLLUPS["RollupFlightOccupancy"][0].format(days=",".join(["%s"] * len(days))), tuple(days)
+    )
+    rows = occupancy_cursor.fetchall()
+    pruned_s = time.perf_counter() - t0
+    pruned = round(sum(r["taken_seats"] * 100.0 / r["total_seats"] for r in rows) / len(rows), 2)
+
+    print(f"\noccupancy, one week of {N_FLIGHTS} flights: legacy {legacy_s * 1000:.0f} ms, "
+          f"pruned {pruned_s * 1000:.0f} ms ({len(rows)} flights)")
+    assert float(legacy) == pytest.approx(pruned, abs=0.01)
+    assert pruned_s < legacy_s
+
+
+@requires_mysql
+def test_pruned_occupancy_reads_flights_by_departure_date(occupancy_cursor):
+    sql = report_rollups._ROLLUPS["RollupFlightOccupancy"][0].format(days="%s")
+    occupancy_cursor.execute("EXPLAIN FORMAT=JSON " + sql, (date(2016, 1, 1),))
+    plan = occupancy_cursor.fetchone()["EXPLAIN"]
+    assert "idx_flight_departure_date" in plan
+    assert "idx_flightseat_flight_status" in plan or '"key": "flight_id"' in plan
@@ -0,0 +1,168 @@
+import csv
+import io
+from contextlib import contextmanager
+from decimal import Decimal
+
+import pytest
+
+import main
+import report_rollups
+import reports
+
+
+class StreamCursor:
+    """Unbuffered-style cursor: rows only come out through fetchmany."""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.queries = []
+        self.fetches = 0
+
+    def execute(self, query, params=None):
+        self.queries.append((" ".join(query.split()), params))
+
+    def fetchmany(self, size):
+        self.fetches += 1
+        chunk, self.rows = self.rows[:size], self.rows[size:]
+        return chunk
+
+
+CREW_ROWS = [
+    {"worker_id": 7, "full_name": "Dana Levi", "role": "Pilot",
+     "short_minutes": Decimal("120"), "long_minutes": Decimal("700"), "total_minutes": Decimal("820")},
+    {"worker_id": 8, "full_name": "Avi Cohen", "role": "Flight Attendant",
+     "short_minutes": Decimal("240"), "long_minutes": Decimal("0"), "total_minutes": Decimal("240")},
+]
+
+
+def test_iter_rows_streams_typed_values():
+    cursor = StreamCursor(CREW_ROWS)
+    rows = reports.iter_rows(cursor, "crew_hours_long_short", "2030-01-01", "2030-12-31")
+
+    first = next(rows)
+    assert first == {"worker_id": 7, "full_name": "Dana Levi", "role": "Pilot",
+                     "short_minutes": 120, "long_minutes": 700, "total_minutes": 820}
+    assert type(first["total_minutes"]) is int
+    assert cursor.queries[0][1] == ("2030-01-01", "2030-12-31")
+    assert len(list(rows)) == 1
+
+
+def test_csv_chunks_are_incremental():
+    columns = reports.REPORTS["crew_hours_long_short"]["columns"]
+    rows = ({"worker_id": i, "full_name": f"W{i}", "role": "Pilot",
+             "short_minutes": i, "long_minutes": 0, "total_minutes": i} for i in range(25))
+    chunks = list(reports.csv_chunks(rows, columns, chunk_rows=10))
+
+    assert len(chunks) == 3
+    parsed = list(csv.reader(io.StringIO("".join(chunks))))
+    assert parsed[0][0] == "Worker ID"
+    assert parsed[1] == ["0", "W0", "Pilot", "0", "0", "0"]
+    assert len(parsed) == 26
+
+
+def test_parquet_chunks_keep_numeric_types():
+    pq = pytest.importorskip("pyarrow.parquet")
+    columns = reports.REPORTS["crew_hours_long_short"]["columns"]
+    rows = reports.iter_rows(StreamCursor(CREW_ROWS * 3), "crew_hours_long_short", "a", "b")
+    data = b"".join(reports.parquet_chunks(rows, columns, row_group=4))
+
+    table = pq.read_table(io.BytesIO(data))
+    assert table.num_rows == 6
+    assert str(table.schema.field("total_minutes").type) == "int64"
+    assert table.column("full_name").to_pylist()[:2] == ["Dana Levi", "Avi Cohen"]
+
+
+def test_export_route_streams_csv(client, monkeypatch):
+    cursor = StreamCursor(CREW_ROWS)
+    seen = {}
+
+    @contextmanager
+    def fake_db_cur(buffered=True):
+        seen["buffered"] = buffered
+        yield cursor
+
+    monkeypatch.setattr(main, "db_cur", fake_db_cur)
+    monkeypatch.setattr(report_rollups, "refresh_pending", lambda date_from, date_to: 0)
+    with client.session_transaction() as sess:
+        sess["is_manager"] = True
+
+    resp = client.get("/admin/reports/export?report=crew_hours_long_short"
+                      "&date_from=2030-01-01&date_to=2030-12-31&format=csv")
+
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    assert resp.headers["Content-Disposition"].endswith('crew_hours_long_short_2030-01-01_2030-12-31.csv"')
+    body = resp.get_data(as_text=True).splitlines()
+    assert body[1] == "7,Dana Levi,Pilot,120,700,820"
+    assert seen["buffered"] is False
+
+
+def test_month_range_widens_to_whole_months():
+    assert reports.month_range("2030-05-10", "2030-05-12") == ("2030-05-01", "2030-05-31")
+    assert reports.month_range("2032-01-31", "2032-02-03") == ("2032-01-01", "2032-02-29")
+    assert reports.report_range("crew_hours_long_short", "2030-05-10", "2030-05-12") == ("2030-05-10", "2030-05-12")
+
+
+def test_plane_activity_export_covers_whole_months(client, monkeypatch):
+    cursor = StreamCursor([])
+
+    @contextmanager
+    def fake_db_cur(buffered=True):
+        yield cursor
+
+    monkeypatch.setattr(main, "db_cur", fake_db_cur)
+    monkeypatch.setattr(report_rollups, "refresh_pending", lambda date_from, date_to: 0)
+    with client.session_transaction() as sess:
+        sess["is_manager"] = True
+
+    resp = client.get("/admin/reports/export?report=monthly_plane_activity"
+                      "&date_from=2030-05-10&date_to=2030-05-12&format=csv")
+    resp.get_data()
+
+    assert resp.headers["Content-Disposition"].endswith('monthly_plane_activity_2030-05-01_2030-05-31.csv"')
+    assert cursor.queries[0][1] == ("2030-05-01", "2030-05-31")
+
+
+def test_export_drains_result_when_a_row_fails(client, monkeypatch):
+    bad = dict(CREW_ROWS[0], worker_id="not-a-number")
+    cursor = StreamCursor([CREW_ROWS[0], bad] + CREW_ROWS * 1500)
+
+    @contextmanager
+    def fake_db_cur(buffered=True):
+        yield cursor
+
+    monkeypatch.setattr(main, "db_cur", fake_db_cur)
+    monkeypatch.setattr(report_rollups, "refresh_pending", lambda date_from, date_to: 0)
+    with client.session_transaction() as sess:
+        sess["is_manager"] = True
+
+    with pytest.raises(ValueError):
+        client.get("/admin/reports/export?report=crew_hours_long_short"
+                   "&date_from=2030-01-01&date_to=2030-12-31&format=csv").get_data()
+    # השגיאה המקורית עולה, ושארית התוצאה נקראה כך שהסמן נסגר נקי
+    assert cursor.rows == []
+
+
+def test_unbuffered_cursor_left_unread_closes_its_connection(monkeypatch):
+    released = []
+
+    class UnreadCursor:
+        def close(self):
+            raise RuntimeError("Unread result found")
+
+    class Conn:
+        def cursor(self, dictionary, buffered):
+            return UnreadCursor()
+
+    class Pool:
+        def acquire(self):
+            return Conn()
+
+        def release(self, conn, discard=False):
+            released.append(discard)
+
+    monkeypatch.setattr(main, "get_pool", lambda: Pool())
+    with pytest.raises(KeyError):
+        with main.db_cur(buffered=False):
+            raise KeyError("real error")
+    assert released == [True]
@@ -0,0 +1,172 @@
+from contextlib import contextmanager
+from datetime import datetime, date
+
+import pytest
+
+import main
+import schedule_import
+import scheduling
+from airways import AirwayIndex
+
+
+ROWS = [
+    {"origin_airport": "TLV", "destination_airport": "ATH", "duration": 120},
+    {"origin_airport": "ATH", "destination_airport": "TLV", "duration": 120},
+    {"origin_airport": "TLV", "destination_airport": "JFK", "duration": 660},
+]
+
+CSV = """origin,destination,weekdays,departure_time,start_date,end_date,plane_size,regular_price,business_price
+TLV,ATH,Mon|Thu,08:00,2030-05-06,2030-05-19,small,150,
+ATH,TLV,1;4,13:00,2030-05-06,2030-05-19,any,150,400
+"""
+
+
+@pytest.fixture(autouse=True)
+def airways(monkeypatch):
+    index = AirwayIndex(lambda: ROWS, lambda: "v1")
+    monkeypatch.setattr(schedule_import, "airway_index", index)
+
+
+def crew(cid, pilot, trained=0):
+    return {"id": cid, "is_pilot": int(pilot), "is_attendant": int(not pilot), "long_flight_training": trained}
+
+
+def planner(n_planes=1, big=False, pilots=2, attendants=3, timeline=()):
+    planes = [{"plane_id": i, "is_big": int(big)} for i in range(1, n_planes + 1)]
+    people = [crew(100 + i, True) for i in range(pilots)] + [crew(200 + i, False) for i in range(attendants)]
+    return scheduling.ResourcePlanner(planes, people, list(timeline))
+
+
+def test_parse_csv_patterns():
+    patterns = schedule_import.parse_patterns(CSV, "csv")
+    assert [p["weekdays"] for p in patterns] == [{0, 3}, {0, 3}]
+    assert patterns[0]["big"] is False and patterns[0]["business_price"] is None
+    assert patterns[1]["big"] is None and patterns[1]["business_price"] == 400.0
+    assert patterns[0]["start_date"] == date(2030, 5, 6)
+
+
+def test_parse_reports_every_bad_pattern():
+    text = '[{"origin": "TLV", "destination": "TLV"}, {"origin": "TLV", "destination": "ATH", "weekdays": ["Funday"],' \
+           ' "departure_time": "08:00", "start_date": "2030-05-06", "end_date": "2030-05-19", "regular_price": 1}]'
+    with pytest.raises(schedule_import.ScheduleImportError) as exc:
+        schedule_import.parse_patterns(text, "json")
+    assert len(exc.value.errors) == 2
+    assert exc.value.errors[0].startswith("Pattern 1:")
+    assert "Funday" in exc.value.errors[1]
+
+
+def test_expand_sorts_by_departure_and_flags_unknown_routes():
+    patterns = schedule_import.parse_patterns(CSV, "csv")
+    patterns.append(dict(patterns[0], destination="CDG"))
+    flights, conflicts = schedule_import.expand_patterns(patterns, now=datetime(2030, 1, 1))
+
+    assert len(flights) == 8
+    assert [f["start_dt"] for f in flights] == sorted(f["start_dt"] for f in flights)
+    assert flights[0]["end_dt"] == datetime(2030, 5, 6, 10, 0)
+    assert conflicts == [{"pattern": 3, "date": None, "reason": "No airway TLV-CDG"}]
+
+
+def test_planner_chains_plane_and_crew_across_round_trips():
+    flights, _ = schedule_import.expand_patterns(schedule_import.parse_patterns(CSV, "csv"), now=datetime(2030, 1, 1))
+    planned, conflicts = schedule_import.plan_flights(planner(), flights)
+
+    # מטוס אחד וצוות אחד מספיקים: הלוך בבוקר, חזור בצהריים
+    assert conflicts == []
+    assert len(planned) == 8
+    assert {f["plane_id"] for f in planned} == {1}
+    assert planned[0]["crew_ids"] == [100, 101, 200, 201, 202]
+
+
+def test_planner_reports_conflicts_instead_of_double_booking():
+    text = CSV.replace("13:00", "09:00")   # החזור ממריא לפני שהמטוס נחת באתונה
+    flights, _ = schedule_import.expand_patterns(schedule_import.parse_patterns(text, "csv"), now=datetime(2030, 1, 1))
+    planned, conflicts = schedule_import.plan_flights(planner(), flights)
+
+    # כל טיסה שנכשלת משאירה את המטוס ביעד הקודם, והטיסה הבאה משם כבר מסתדרת
+    assert [f["origin"] for f in planned] == ["TLV", "ATH", "TLV", "ATH"]
+    assert [c["reason"] for c in conflicts] == [
+        "No plane available at ATH", "No Small plane available at TLV",
+        "No plane available at ATH", "No Small plane available at TLV",
+    ]
+
+
+def test_long_flight_needs_big_plane_and_trained_crew():
+    p = planner(big=True)
+    with pytest.raises(scheduling.NoResources, match="pilots"):
+        p.assign("TLV", datetime(2030, 5, 6, 8), datetime(2030, 5, 6, 19), is_long=True)
+    with pytest.raises(scheduling.NoResources, match="Big"):
+        planner().assign("TLV", datetime(2030, 5, 6, 8), datetime(2030, 5, 6, 19), is_long=True)
+
+
+class SlotCursor:
+    '''
+    עונה על שאילתת המשבצות הקיימות של existing_slots
+    '''
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+
+    def execute(self, query, params=()):
+        pass
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_dry_run_does_not_write(monkeypatch):
+    @contextmanager
+    def fake_cur():
+        yield SlotCursor()
+
+    def no_tx():
+        raise AssertionError("dry run must not open a transaction")
+
+    expand = schedule_import.expand_patterns
+    monkeypatch.setattr(main, "db_cur", fake_cur)
+    monkeypatch.setattr(main, "db_tx", no_tx)
+    monkeypatch.setattr(schedule_import.availability, "schedule_fingerprint", lambda cursor: (0, None))
+    monkeypatch.setattr(scheduling.ResourcePlanner, "load", classmethod(lambda cls, cursor, s, e: planner()))
+    monkeypatch.setattr(schedule_import, "expand_patterns", lambda ps: expand(ps, now=datetime(2030, 1, 1)))
+
+    report = schedule_import.run_import(schedule_import.parse_patterns(CSV, "csv"), dry_run=True)
+    assert report["planned"] == 8
+    assert report["created"] == 0 and report["conflicts"] == []
+
+
+def test_rerun_skips_existing_slots_and_refreshes_saved_batches(monkeypatch):
+    # TLV-ATH ב-6/5 כבר נוצרה בייבוא קודם שנעצר
+    done = {"origin_airport": "TLV", "destination_airport": "ATH", "departure_dt": datetime(2030, 5, 6, 8)}
+    inserted, invalidated = [], []
+
+    @contextmanager
+    def fake_cur():
+        yield SlotCursor([done])
+
+    @contextmanager
+    def fake_tx():
+        yield SlotCursor()
+
+    def insert_flight(cursor, plane_id, origin, destination, departure_date, *args, **kwargs):
+        if len(inserted) == 2:
+            raise RuntimeError("lost connection")
+        inserted.append((origin, destination, departure_date))
+        return len(inserted)
+
+    expand = schedule_import.expand_patterns
+    monkeypatch.setattr(main, "db_cur", fake_cur)
+    monkeypatch.setattr(main, "db_tx", fake_tx)
+    monkeypatch.setattr(schedule_import, "IMPORT_BATCH_SIZE", 2)
+    monkeypatch.setattr(schedule_import.availability, "schedule_fingerprint", lambda cursor: (0, None))
+    monkeypatch.setattr(schedule_import.availability.schedule_index, "add_flight", lambda *a: None)
+    monkeypatch.setattr(scheduling, "lock_resources", lambda *a: None)
+    monkeypatch.setattr(scheduling, "insert_flight", insert_flight)
+    monkeypatch.setattr(scheduling.ResourcePlanner, "load", classmethod(lambda cls, cursor, s, e: planner()))
+    monkeypatch.setattr(schedule_import, "expand_patterns", lambda ps: expand(ps, now=datetime(2030, 1, 1)))
+    monkeypatch.setattr("flights.invalidate_route_search", lambda o, d: invalidated.append((o, d)))
+
+    with pytest.raises(RuntimeError):
+        schedule_import.run_import(schedule_import.parse_patterns(CSV, "csv"))
+
+    assert ("TLV", "ATH", "2030-05-06") not in inserted
+    assert len(inserted) == 2
+    # האצווה הראשונה נשמרה לפני הכשל - הנתיבים שלה עדיין מתרעננים בחיפוש
+    assert set(invalidated) == {(o, d) for o, d, _ in inserted}
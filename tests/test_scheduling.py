@@ -0,0 +1,171 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+
+import main
+import flights
+import availability
+import scheduling
+
+
+START = datetime(2030, 5, 1, 10, 0)
+END = START + timedelta(hours=2)
+
+
+class FlightTxCursor:
+    def __init__(self, busy=(), last_locs=None, seats=120):
+        self.busy = list(busy)
+        self.last_locs = last_locs or {}
+        self.seats = seats
+        self.queries = []
+        self._rows = []
+        self.rowcount = -1
+        self.lastrowid = None
+
+    def execute(self, query, params=()):
+        q = " ".join(query.split())
+        self.queries.append((q, params))
+        self._rows = []
+        if "FOR UPDATE" in q:
+            return
+        if q.startswith("SELECT DISTINCT resource_type"):
+            self._rows = [{"resource_type": k, "resource_id": r} for k, r in self.busy]
+        elif "MAX(end_dt) AS last_end" in q:
+            self._rows = [{"kind": k, "resource_id": r, "last_loc": loc} for (k, r), loc in self.last_locs.items()]
+        elif q.startswith("INSERT INTO Flight "):
+            self.lastrowid = 501
+        elif q.startswith("INSERT INTO FlightSeat"):
+            self.rowcount = self.seats
+        elif "AS arrival_date" in q:
+            self._rows = [{"plane_id": 7, "departure_date": START.date(), "origin_airport": "TLV",
+                           "destination_airport": "ATH", "arrival_date": END.date()}]
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+
+@pytest.fixture
+def tx(monkeypatch):
+    state = {"cursor": FlightTxCursor(), "commits": 0, "rollbacks": 0, "fail": []}
+
+    @contextmanager
+    def fake_tx():
+        if state["fail"]:
+            raise state["fail"].pop(0)
+        try:
+            yield state["cursor"]
+            state["commits"] += 1
+        except BaseException:
+            state["rollbacks"] += 1
+            raise
+
+    monkeypatch.setattr(main, "db_tx", fake_tx)
+    monkeypatch.setattr(scheduling.time, "sleep", lambda s: None)
+    monkeypatch.setattr(availability.schedule_index, "_by_resource", None)
+    return state
+
+
+def create(**overrides):
+    kwargs = dict(
+        plane_id=7, origin="TLV", destination="ATH", departure_date="2030-05-01", departure_time="10:00",
+        prices={"Regular": 100.0, "Business": None}, crew_ids=[12, 11, 30], start_dt=START, end_dt=END,
+    )
+    kwargs.update(overrides)
+    return scheduling.create_flight(**kwargs)
+
+
+def test_flight_created_in_one_transaction_with_bulk_inserts(tx):
+    assert create() == 501
+    assert tx["commits"] == 1
+
+    queries = [q for q, _ in tx["cursor"].queries]
+    # נעילות לפני הבדיקה, והבדיקה לפני הכתיבה
+    assert queries[0].startswith("SELECT plane_id FROM Plane WHERE plane_id IN (%s)")
+    assert queries[0].endswith("FOR UPDATE")
+    assert "ORDER BY id FOR UPDATE" in queries[1]
+    assert tx["cursor"].queries[1][1] == (11, 12, 30)
+    assert queries[2].startswith("SELECT DISTINCT resource_type")
+
+    inserts = [(q, p) for q, p in tx["cursor"].queries if q.startswith("INSERT")]
+    assert [q.split(" (")[0] for q, _ in inserts] == [
+        "INSERT INTO Flight",
+        "INSERT INTO FlightPricing",
+        "INSERT INTO FlightCrewPlacement",
+        "INSERT INTO FlightSeat",
+        "INSERT INTO FlightClassAvailability",
+        "INSERT INTO ResourceTimeline",
+        "INSERT INTO ReportRollupDirty",
+        "INSERT INTO PlaneMonthActivity",
+        "INSERT INTO PlaneMonthRoute",
+        "INSERT INTO PlaneActiveDay",
+    ]
+    assert inserts[1][1] == (501, "Regular", 100.0)
+    assert inserts[2][1] == (501, 12, 501, 11, 501, 30)
+
+
+def test_conflict_found_under_lock_rolls_back(tx):
+    tx["cursor"] = FlightTxCursor(busy=[("crew", 11)], last_locs={("plane", 7): "ROM"})
+    with pytest.raises(scheduling.ResourceConflict) as exc:
+        create()
+    assert exc.value.errors == [
+        "Selected plane is not at TLV at departure time (last known location: ROM).",
+        "Crew member 11 was assigned to another flight at this time.",
+    ]
+    assert tx["rollbacks"] == 1 and tx["commits"] == 0
+    assert not any(q.startswith("INSERT") for q, _ in tx["cursor"].queries)
+
+
+def test_plane_without_seats_rolls_back(tx):
+    tx["cursor"] = FlightTxCursor(seats=0)
+    with pytest.raises(scheduling.PlaneHasNoSeats):
+        create()
+    assert tx["rollbacks"] == 1
+
+
+def test_deadlock_is_retried(tx):
+    class Deadlock(Exception):
+        errno = flights.RETRYABLE_DB_ERRNOS[0]
+
+    tx["fail"].append(Deadlock())
+    assert create() == 501
+    assert tx["commits"] == 1
+
+
+def _planner(minutes=None, timeline=()):
+    planes = [{"plane_id": 1, "is_big": 1}, {"plane_id": 2, "is_big": 0}, {"plane_id": 3, "is_big": 0}]
+    crew = [{"id": i, "is_pilot": 1, "is_attendant": 0, "long_flight_training": int(i == 1)} for i in (1, 2, 3)]
+    crew += [{"id": i, "is_pilot": 0, "is_attendant": 1, "long_flight_training": 0} for i in (10, 11, 12, 13)]
+    return scheduling.ResourcePlanner(planes, crew, list(timeline), minutes)
+
+
+def test_planner_prefers_least_flown_crew_and_small_planes():
+    planner = _planner(minutes={("crew", 2): 600, ("crew", 10): 50, ("plane", 2): 900})
+    plane_id, is_big, crew_ids = planner.assign("TLV", START, END, is_long=False)
+    assert (plane_id, is_big) == (3, False)
+    assert crew_ids == [1, 3, 11, 12, 13]
+
+
+def test_planner_balances_minutes_across_a_batch():
+    planner = _planner()
+    used = []
+    for day in range(6):
+        start = START + timedelta(days=day)
+        plane_id, _, crew_ids = planner.assign("TLV", start, start + timedelta(hours=2), is_long=False)
+        # חוזרים לתל אביב מיד, כדי שכולם יהיו זמינים למחרת
+        planner.reserve(plane_id, crew_ids, start, start + timedelta(hours=2), "TLV")
+        used += crew_ids
+
+    pilot_counts = {cid: used.count(cid) for cid in (1, 2, 3)}
+    attendant_counts = {cid: used.count(cid) for cid in (10, 11, 12, 13)}
+    assert set(pilot_counts.values()) == {4}
+    assert sorted(attendant_counts.values()) == [4, 4, 5, 5]
+
+
+def test_planner_long_flight_uses_big_plane_and_trained_crew_only():
+    planner = _planner()
+    with pytest.raises(scheduling.NoResources, match="Only 1 of 3 pilots"):
+        planner.assign("TLV", START, START + timedelta(hours=8), is_long=True)
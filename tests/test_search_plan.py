@@ -0,0 +1,112 @@
+import json
+import os
+import re
+from datetime import date, timedelta
+
+import pytest
+
+import flights
+
+
+def _where_clause(sql):
+    return sql.split("WHERE", 1)[1]
+
+
+def test_search_predicates_do_not_wrap_indexed_columns():
+    sql, params = flights._bookable_flights_query("TLV", "ATH", "2030-05-01")
+    where = _where_clause(sql)
+
+    assert not re.search(r"LOWER\(\s*f\.status", where)
+    assert not re.search(r"TIMESTAMP\(\s*f\.departure_date", where)
+    assert "f.departure_dt >= %s AND f.departure_dt < %s" in where
+    assert params[:2] == ("TLV", "ATH")
+    assert params[3] - params[2] == timedelta(days=1)
+
+
+# ---------------------------------------------------------------------------
+# EXPLAIN regression against a real MySQL (opt-in):
+#   FLYTAU_TEST_MYSQL_HOST / _USER / _PASSWORD / _DATABASE
+# The database must already contain the tables from schema.sql.
+# ---------------------------------------------------------------------------
+
+MYSQL_ENV = {
+    "host": os.environ.get("FLYTAU_TEST_MYSQL_HOST"),
+    "user": os.environ.get("FLYTAU_TEST_MYSQL_USER"),
+    "password": os.environ.get("FLYTAU_TEST_MYSQL_PASSWORD", ""),
+    "database": os.environ.get("FLYTAU_TEST_MYSQL_DATABASE"),
+}
+N_FLIGHTS = 1_000_000
+N_ROUTES = 100
+
+requires_mysql = pytest.mark.skipif(
+    not (MYSQL_ENV["host"] and MYSQL_ENV["user"] and MYSQL_ENV["database"]),
+    reason="set FLYTAU_TEST_MYSQL_* to run the EXPLAIN regression test",
+)
+
+
+@pytest.fixture(scope="module")
+def mysql_cursor():
+    import mysql.connector
+
+    conn = mysql.connector.connect(autocommit=True, **MYSQL_ENV)
+    cursor = conn.cursor(dictionary=True, buffered=True)
+
+    cursor.execute("SELECT COUNT(*) AS n FROM Flight")
+    if cursor.fetchone()["n"] < N_FLIGHTS:
+        cursor.execute("INSERT IGNORE INTO Plane (plane_id, manufacturer, purchase_date) VALUES (1, 'Boeing', '2020-01-01')")
+        cursor.executemany(
+            "INSERT IGNORE INTO Airway (origin_airport, destination_airport, duration) VALUES (%s, %s, %s)",
+            [(f"O{i:02d}", f"D{i:02d}", 120) for i in range(N_ROUTES)],
+        )
+        cursor.execute("SET SESSION cte_max_recursion_depth = %s", (N_FLIGHTS + 1,))
+        cursor.execute(
+            f"""
+            INSERT INTO Flight (plane_id, origin_airport, destination_airport, departure_date, departure_time, status)
+            WITH RECURSIVE seq (n) AS (
+              SELECT 0 UNION ALL SELECT n + 1 FROM seq WHERE n < {N_FLIGHTS - 1}
+            )
+            SELECT
+              1,
+              CONCAT('O', LPAD(n % {N_ROUTES}, 2, '0')),
+              CONCAT('D', LPAD(n % {N_ROUTES}, 2, '0')),
+              DATE_ADD('2020-01-01', INTERVAL (n DIV {N_ROUTES}) % 3650 DAY),
+              SEC_TO_TIME((n * 37) % 86400),
+              IF(n % 20 = 0, 'cancelled', 'open')
+            FROM seq
+            """
+        )
+        cursor.execute("ANALYZE TABLE Flight")
+
+    yield cursor
+    cursor.close()
+    conn.close()
+
+
+def _flight_table_plan(plan):
+    """Find the access plan node for alias f in EXPLAIN FORMAT=JSON output."""
+    if isinstance(plan, dict):
+        if plan.get("table_name") == "f":
+            return plan
+        for value in plan.values():
+            found = _flight_table_plan(value)
+            if found:
+                return found
+    elif isinstance(plan, list):
+        for value in plan:
+            found = _flight_table_plan(value)
+            if found:
+                return found
+    return None
+
+
+@requires_mysql
+@pytest.mark.parametrize("departure_date", [None, (date.today() + timedelta(days=30)).isoformat()])
+def test_search_uses_route_departure_index(mysql_cursor, departure_date):
+    sql, params = flights._bookable_flights_query("O07", "D07", departure_date)
+    mysql_cursor.execute("EXPLAIN FORMAT=JSON " + sql, params)
+    plan = json.loads(mysql_cursor.fetchone()["EXPLAIN"])
+
+    node = _flight_table_plan(plan)
+    assert node is not None
+    assert node["access_type"] == "range", node
+    assert node["key"] == "idx_flight_route_departure", node
@@ -0,0 +1,39 @@
+import seat_counters
+
+
+class ScriptedCursor:
+    def __init__(self, results):
+        self.results = list(results)
+        self.queries = []
+        self._last = []
+
+    def execute(self, query, params=None):
+        self.queries.append((" ".join(query.split()), params))
+        self._last = self.results.pop(0) if self.results else []
+
+    def fetchall(self):
+        return self._last
+
+
+def test_count_by_class():
+    rows = [{"class_type": "Regular"}, {"class_type": "Business"}, {"class_type": "Regular"}]
+    assert seat_counters.count_by_class(rows) == {"Regular": 2, "Business": 1}
+
+
+def test_reconcile_reports_and_fixes_mismatches():
+    actual = [
+        {"flight_id": 1, "class_type": "Regular", "available_seats": 10, "booked_seats": 2},
+        {"flight_id": 2, "class_type": "Regular", "available_seats": 5, "booked_seats": 0},
+    ]
+    stored = [
+        {"flight_id": 1, "class_type": "Regular", "available_seats": 10, "booked_seats": 2},
+        {"flight_id": 2, "class_type": "Regular", "available_seats": 4, "booked_seats": 1},
+    ]
+    cursor = ScriptedCursor([actual, stored])
+
+    mismatches = seat_counters.reconcile(cursor, fix=True)
+
+    assert [(m["flight_id"], m["actual_available"], m["stored_available"]) for m in mismatches] == [(2, 5, 4)]
+    fixes = cursor.queries[2:]
+    assert fixes[0] == ("DELETE FROM FlightClassAvailability WHERE flight_id=%s", (2,))
+    assert fixes[1][0].startswith("INSERT INTO FlightClassAvailability")
@@ -0,0 +1,114 @@
+from contextlib import contextmanager
+from datetime import date, timedelta, time
+
+import pytest
+
+import main
+import flights
+import seatmap
+
+
+WRITE_VERBS = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+class RecordingCursor:
+    def __init__(self, flight, seat_rows):
+        self.flight = flight
+        self.seat_rows = seat_rows
+        self.queries = []
+        self._result = []
+
+    def execute(self, query, params=None):
+        self.queries.append(" ".join(query.split()))
+        if "FROM Flight f" in query:
+            self._result = [self.flight]
+        elif "FROM Seat s" in query or "FROM FlightSeat" in query:
+            self._result = self.seat_rows
+        else:
+            self._result = []
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def fetchall(self):
+        return self._result
+
+
+def _seat(fsid, row, col, class_type, status="available"):
+    rows, cols = (2, 2) if class_type == "Business" else (10, 6)
+    return {
+        "seat_id": fsid + 100, "flight_seat_id": fsid, "status": status, "row_num": row, "column_number": col,
+        "class_type": class_type, "rows_number": rows, "columns_number": cols,
+    }
+
+
+@pytest.fixture
+def recording_db(monkeypatch):
+    flight = {
+        "flight_id": 1, "origin_airport": "TLV", "destination_airport": "ATH",
+        "departure_date": date.today() + timedelta(days=10), "departure_time": time(10, 0),
+        "status": "open", "plane_id": 3, "regular_price": 100, "business_price": 300,
+    }
+    seats = [
+        _seat(10, 1, 1, "Business"),
+        _seat(11, 1, 2, "Business", "booked"),
+        _seat(12, 3, 1, "Regular"),
+    ]
+    cursor = RecordingCursor(flight, seats)
+
+    @contextmanager
+    def fake_db_cur():
+        yield cursor
+
+    monkeypatch.setattr(main, "db_cur", fake_db_cur)
+    return cursor
+
+
+def test_seat_map_is_one_read_only_query(recording_db):
+    seats_by_class, grid_by_class = flights._get_seats_and_grids_by_class(1, 3)
+
+    assert len(recording_db.queries) == 1
+    assert recording_db.queries[0].startswith("SELECT")
+    assert [s["flight_seat_id"] for s in seats_by_class["Business"]] == [10, 11]
+    assert [s["flight_seat_id"] for s in seats_by_class["Regular"]] == [12]
+    assert grid_by_class == {"Regular": {"rows": 10, "cols": 6}, "Business": {"rows": 2, "cols": 2}}
+
+
+def test_select_seats_get_issues_no_writes(client, recording_db):
+    resp = client.get("/select_seats?flight_id=1")
+
+    assert resp.status_code == 200
+    assert not any(q.upper().startswith(WRITE_VERBS) for q in recording_db.queries)
+    # flight header + seat map
+    assert len(recording_db.queries) == 2
+
+
+def test_seat_map_is_served_from_cache(recording_db):
+    flights._get_seats_and_grids_by_class(1, 3)
+    recording_db.queries.clear()
+
+    seats_by_class, _ = flights._get_seats_and_grids_by_class(1, 3)
+
+    assert recording_db.queries == []
+    assert seats_by_class["Regular"][0]["status"] == "available"
+
+
+def test_write_through_updates_cached_bitmap(recording_db):
+    flights._get_seats_and_grids_by_class(1, 3)
+
+    seatmap.mark_booked(1, [12])
+    seatmap.mark_available(1, [11])
+    seats_by_class, _ = flights._get_seats_and_grids_by_class(1, 3)
+
+    assert seats_by_class["Regular"][0]["status"] == "booked"
+    assert seats_by_class["Business"][1]["status"] == "available"
+
+
+def test_layout_is_shared_between_flights_of_same_plane(recording_db):
+    flights._get_seats_and_grids_by_class(1, 3)
+    recording_db.queries.clear()
+
+    flights._get_seats_and_grids_by_class(2, 3)
+
+    assert len(recording_db.queries) == 1
+    assert "FROM FlightSeat WHERE flight_id" in recording_db.queries[0]